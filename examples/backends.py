@@ -0,0 +1,82 @@
+# Inference backend selection for the example scripts
+# --backend pytorch runs the .pt weights as trained. onnx (ONNX Runtime) and openvino run an export of the weights,
+# which is much faster on CPU-only machines. Exports are made next to the weights on first use
+# (ex. OK_CV/<name>/weights/best.onnx, best_openvino_model/), or ahead of time with training/export.py
+# --server sends frames to a running inference_server.py instead, which keeps the model loaded between runs
+
+
+import os
+import ast
+import math
+
+BACKENDS = ["pytorch", "onnx", "openvino"]
+# export of <weights>.pt for each backend, as named by Ultralytics
+EXPORTS = {"onnx": ".onnx", "openvino": "_openvino_model"}
+
+
+def add_backend_args(parser):
+    # --backend, --device and --server options shared by the example scripts
+    parser.add_argument("--backend", dest = "backend",
+            help = "Inference backend: pytorch, onnx or openvino. Default pytorch", default = "pytorch", choices = BACKENDS, type = str)
+    parser.add_argument("--device", dest = "device",
+            help = "Device to run, ex. 0 for CUDA, cpu or mps for MacOS. Default 0 for pytorch, cpu for onnx and openvino", default = None, type = str)
+    parser.add_argument("--server", dest = "server",
+            help = "URL of a running inference_server.py to send frames to, ex. http://127.0.0.1:8765. Default load the model here", default = None, type = str)
+
+
+def resolve_device(device, backend):
+    # device for model.predict/track, the CUDA device number as an int
+    if device is None:
+        device = "0" if backend == "pytorch" else "cpu"
+    return int(device) if device.isdigit() else device
+
+
+def exported_path(weights, backend):
+    # path of the export of a .pt file for a backend
+    if backend == "pytorch":
+        return weights
+    return os.path.splitext(weights)[0] + EXPORTS[backend]
+
+
+def export_imgsz(path):
+    # [height, width] an export was made for from its Ultralytics metadata, None if dynamic or not readable
+    try:
+        if os.path.isdir(path):
+            import yaml
+            with open(os.path.join(path, "metadata.yaml"), 'r') as f:
+                meta = yaml.safe_load(f)
+        else:
+            # only the model proto is read, the weights are not loaded
+            import onnx
+            props = {prop.key: prop.value for prop in onnx.load(path, load_external_data=False).metadata_props}
+            meta = {key: ast.literal_eval(props[key]) for key in ["imgsz", "args"] if key in props}
+    except Exception:
+        return None
+    if (meta.get("args") or {}).get("dynamic"):
+        return None
+    return list(meta["imgsz"]) if meta.get("imgsz") is not None else None
+
+
+def needs_export(path, imgsz=640):
+    # True if there is no export at path or it was made for another image size (rounded up to stride 32, as Ultralytics)
+    if not os.path.exists(path):
+        return True
+    size = export_imgsz(path)
+    return size is not None and size != [math.ceil(imgsz / 32) * 32] * 2
+
+
+def load_model(weights, backend="pytorch", imgsz=640, server=None):
+    # YOLO model for a backend, .pt weights are exported first if there is no export yet or it is for another imgsz
+    # weights that are already an export (ex. best.onnx) are loaded as they are
+    # with a server URL, a client with the same predict()/track()/names that runs the model on the server
+    if server is not None:
+        from inference_client import InferenceClient
+        return InferenceClient(server, weights, backend, imgsz)
+    from ultralytics import YOLO
+    if backend == "pytorch" or not weights.endswith(".pt"):
+        return YOLO(weights)
+    path = exported_path(weights, backend)
+    if needs_export(path, imgsz):
+        print("Exporting %s for %s at imgsz %i, this is only done once"%(weights, backend, imgsz))
+        path = YOLO(weights).export(format=backend, imgsz=imgsz)
+    return YOLO(path)
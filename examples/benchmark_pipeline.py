@@ -0,0 +1,154 @@
+# Benchmark the multi-process shared memory pipeline (shm_pipeline.py) against the single loop of
+# run_tracker_video.py (while cap.isOpened(): read, track, draw, write) on a synthetic video made locally
+# Without --model the detector is a CPU stand-in (blob detection with nearest-centroid track IDs, --work blurs of
+# the frame set its cost), so it runs anywhere without a model or GPU. Both modes use the same detector and TrackCounter.
+
+
+import os
+import time
+import argparse
+import cv2
+import numpy as np
+from shm_pipeline import YoloTracker, run_pipeline
+from track_counter import TrackCounter
+from backends import add_backend_args
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Benchmark the process pipeline against the single loop tracker')
+
+    parser.add_argument("--video", dest = "video",
+                help = "Synthetic video to write (made if missing). Default synthetic.avi", default = "synthetic.avi", type = str)
+    parser.add_argument("--frames", dest = "frames",
+                help = "Number of frames in the synthetic video. Default 300", default = 300, type = int)
+    parser.add_argument("--width", dest = "width",
+                help = "Width of the synthetic video. Default 1920", default = 1920, type = int)
+    parser.add_argument("--height", dest = "height",
+                help = "Height of the synthetic video. Default 1080", default = 1080, type = int)
+    parser.add_argument("--objects", dest = "objects",
+                help = "Number of moving objects in the synthetic video. Default 12", default = 12, type = int)
+    parser.add_argument("--work", dest = "work",
+                help = "Blurs of each frame the stand-in detector does, sets its cost. Default 4", default = 4, type = int)
+    parser.add_argument("--model", dest = "model",
+                help = "Benchmark a YOLO model instead of the stand-in detector. Default None", default = None, type = str)
+    add_backend_args(parser)
+    parser.add_argument("--slots", dest = "slots",
+                help = "Number of frames in the shared memory ring. Default 8", default = 8, type = int)
+    parser.add_argument("--save", dest = "save",
+                help = "Also draw and encode the output video in both modes", action = "store_true")
+
+    return parser.parse_args()
+
+
+def make_video(path, n_frames, width, height, n_objects, seed=1):
+    # textured background with bright circles moving in straight lines, bouncing off the edges
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 200, (height, width, 3), dtype=np.uint8), (5,5), 0)
+    radius = max(8, min(width, height)//40)
+    pos = rng.uniform([radius, radius], [width-radius, height-radius], (n_objects, 2))
+    vel = rng.uniform(-8, 8, (n_objects, 2))
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (width, height))
+    for i in range(n_frames):
+        frame = background.copy()
+        for x, y in pos:
+            cv2.circle(frame, (int(x), int(y)), radius, (255,255,255), -1)
+        out.write(frame)
+        pos += vel
+        bounce = (pos < radius) | (pos > np.array([width, height]) - radius)
+        vel[bounce] *= -1
+        pos = np.clip(pos, radius, np.array([width, height]) - radius)
+    out.release()
+
+
+class BlobTracker():
+    # stand-in for model.track: bright blobs as boxes, each given the ID of the nearest blob in the last frame
+    def __init__(self, work=4, max_dist=40):
+
+        self.work = work
+        self.max_dist = max_dist
+        self.last = np.zeros((0, 2))
+        self.last_ids = np.zeros(0, dtype=np.int64)
+        self.next_id = 1
+
+    def __call__(self, frame):
+        for i in range(self.work):
+            cv2.GaussianBlur(frame, (15,15), 0)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY)
+        n, labels, stats, centroids = cv2.connectedComponentsWithStats(mask)
+        keep = np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] > 50) + 1
+        boxes = np.column_stack([centroids[keep], stats[keep, cv2.CC_STAT_WIDTH], stats[keep, cv2.CC_STAT_HEIGHT]]).astype(np.float32)
+
+        ids = np.zeros(len(keep), dtype=np.int64)
+        taken = set()
+        for i, (x, y) in enumerate(centroids[keep]):
+            if len(self.last) > 0:
+                dist = np.hypot(self.last[:, 0] - x, self.last[:, 1] - y)
+                j = int(np.argmin(dist))
+                if dist[j] < self.max_dist and j not in taken:
+                    ids[i] = self.last_ids[j]
+                    taken.add(j)
+                    continue
+            ids[i] = self.next_id
+            self.next_id += 1
+        self.last = centroids[keep]
+        self.last_ids = ids
+        return boxes, ids, np.ones(len(keep), dtype=np.float32)
+
+
+def run_single(video_path, detector, save_path=None, track_len=5):
+    # the current design: one loop reads, tracks, draws and writes each frame in turn
+    start = time.time()
+    counter = TrackCounter(track_len)
+    cap = cv2.VideoCapture(video_path)
+    out = None
+    if save_path is not None:
+        out = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'XVID'), cap.get(cv2.CAP_PROP_FPS),
+                              (int(cap.get(3)), int(cap.get(4))))
+    n_frames = 0
+    while cap.isOpened():
+        success, frame = cap.read()
+        if not success:
+            break
+        boxes, track_ids = detector(frame)[0:2]
+        counter.update(boxes, track_ids)
+        if out is not None:
+            counter.draw(frame, boxes, track_ids)
+            out.write(frame)
+        n_frames += 1
+    cap.release()
+    if out is not None:
+        out.release()
+    return n_frames, counter.count, time.time() - start
+
+
+def main():
+    args = arg_parse()
+
+    if not os.path.isfile(args.video):
+        print("Writing %i frame synthetic video to %s"%(args.frames, args.video))
+        make_video(args.video, args.frames, args.width, args.height, args.objects)
+
+    def detector():
+        if args.model is not None:
+            return YoloTracker(args.model, device=args.device, backend=args.backend, server=args.server)
+        return BlobTracker(args.work)
+
+    stem = os.path.splitext(args.video)[0]
+    results = {}
+    results["single loop"] = run_single(args.video, detector(), stem + "-single.avi" if args.save else None)
+    results["process pipeline"] = run_pipeline(args.video, detector(), stem + "-pipeline.avi" if args.save else None,
+                                               slots=args.slots)
+
+    print("\nmode, frames, count, seconds, frames/s")
+    for mode, (n_frames, count, seconds) in results.items():
+        print("%s, %i, %i, %.2f, %.1f"%(mode, n_frames, count, seconds, n_frames/max(seconds, 1e-9)))
+    single = results["single loop"]
+    pipeline = results["process pipeline"]
+    print("\nSpeed up: %.2fx"%((pipeline[0]/max(pipeline[2], 1e-9)) / (single[0]/max(single[2], 1e-9))))
+    if single[0:2] != pipeline[0:2]:
+        print("WARNING: frames or counts differ between the modes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Raw per-frame detections of a video, saved so tracking and counting can be rerun without the detector
+# DetectionRecorder takes the detections of each frame inside model.track, before the tracker sees them, and saves
+# them to a compressed .npz of columns (frame, xyxy, conf, cls) plus the list of frames that were run.
+# retrack() feeds them back to a new Ultralytics tracker frame by frame, as model.track does, so the tracks match the
+# live run exactly as long as the tracker only uses the boxes: bytetrack.yaml, or botsort with gmc_method: none and
+# with_reid: False. The default botsort.yaml also uses the video frames (camera motion), which are not stored
+# detect_video() records a video with model.predict alone, for when only re-tracking is wanted (ex. sweep_tracker.py)
+
+
+import os
+import json
+import numpy as np
+import yaml
+from frame_source import FrameSource
+
+
+class DetectionRecorder():
+    # registers a callback on a local YOLO model that runs before the tracker's, record() stores what it took
+    # without a model, set pending before each record()
+    def __init__(self, model=None):
+
+        if model is not None and not hasattr(model, "add_callback"):
+            raise ValueError("detections can only be recorded with a local model, not an inference server")
+        self.pending = None
+        self.frames = []
+        self.rows = []
+        if model is not None:
+            model.add_callback("on_predict_postprocess_end", self.capture)
+
+    def capture(self, predictor):
+        # (N, 6) xyxy, conf, cls as the tracker gets them
+        self.pending = predictor.results[0].boxes.data.cpu().numpy().copy()
+
+    def record(self, frame_no):
+        # store the detections of the frame model.track just ran on
+        self.frames.append(frame_no)
+        if self.pending is not None and len(self.pending) > 0:
+            self.rows.append((frame_no, self.pending))
+        self.pending = None
+
+    def save(self, path, conf, tracker, fps, shape, names, **meta):
+        # meta (ex. video, model, stride) is stored as json with the other settings
+        data = np.concatenate([rows for _, rows in self.rows]) if len(self.rows) > 0 else np.zeros((0, 6), dtype=np.float32)
+        frame = np.concatenate([np.full(len(rows), frame_no, dtype=np.int32) for frame_no, rows in self.rows]) \
+            if len(self.rows) > 0 else np.zeros(0, dtype=np.int32)
+        meta = dict(meta, conf=conf, tracker=tracker, fps=fps, shape=list(shape[0:2]),
+                    names={int(k): v for k, v in names.items()})
+        np.savez_compressed(path,
+                            frames=np.asarray(self.frames, dtype=np.int32),
+                            frame=frame,
+                            xyxy=data[:, 0:4].astype(np.float32),
+                            conf=data[:, 4].astype(np.float32),
+                            cls=data[:, 5].astype(np.int16),
+                            meta=json.dumps(meta))
+        print("Saved %i detections of %i frames to %s"%(len(frame), len(self.frames), path))
+
+
+def detect_video(model, video_path, save_path, conf, device=None, buffer=8, stride=1, meta=None):
+    # run the detector alone on every stride-th frame of a video and save its detections, meta as in save()
+    # the detector runs as inside model.track, so they are the ones the tracker would get
+    recorder = DetectionRecorder()
+    source = FrameSource(video_path, buffer, stride=stride)
+    for frame_no, frame in source:
+        recorder.pending = model.predict(frame, conf=conf, device=device, verbose=False)[0].boxes.data.cpu().numpy()
+        recorder.record(frame_no)
+    source.release()
+    meta = dict({"video": os.path.abspath(video_path), "stride": stride}, **(meta or {}))
+    recorder.save(save_path, conf, "botsort.yaml", source.fps, (source.height, source.width), model.names, **meta)
+
+
+def load_detections(path):
+    # dict of the saved columns, with meta decoded and names keyed by int
+    with np.load(path) as f:
+        detections = {key: f[key] for key in f.files}
+    detections["meta"] = json.loads(str(detections["meta"]))
+    detections["meta"]["names"] = {int(k): v for k, v in detections["meta"]["names"].items()}
+    return detections
+
+
+def make_tracker(tracker, settings=None):
+    # new Ultralytics tracker from a tracker yaml, as model.track makes it (frame_rate 30)
+    # settings (ex. {"track_buffer": 60}) replace values of the yaml
+    # returns (tracker, None) or (tracker, warning) if it uses the video frames and can not be reproduced exactly
+    from ultralytics.trackers.track import TRACKER_MAP
+    from ultralytics.utils import IterableSimpleNamespace
+    from ultralytics.utils.checks import check_yaml
+    with open(check_yaml(tracker), 'r') as stream:
+        cfg = IterableSimpleNamespace(**dict(yaml.safe_load(stream), **(settings or {})))
+    warning = None
+    if cfg.tracker_type == "botsort" and (str(getattr(cfg, "gmc_method", None)).lower() != "none" or getattr(cfg, "with_reid", False)):
+        warning = "%s uses the video frames (gmc_method %s, with_reid %s), tracks will not match the live run exactly. "\
+                  "Record with --tracker bytetrack.yaml for exact results"%(tracker, cfg.gmc_method, getattr(cfg, "with_reid", False))
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=30), warning
+
+
+def retrack(detections, conf=None, tracker=None, settings=None, warn=True):
+    # (frame number, tracks) of each frame that was run, tracks as Ultralytics' tracker returns them:
+    # (M, 8) x0, y0, x1, y1, track ID, conf, cls, detection index
+    # conf above the recorded conf drops detections as the detector would have (strictly greater)
+    from ultralytics.engine.results import Boxes
+    meta = detections["meta"]
+    if conf is not None and conf < meta["conf"]:
+        raise ValueError("conf %g is below the recorded conf %g"%(conf, meta["conf"]))
+    tracker, warning = make_tracker(tracker or meta["tracker"], settings)
+    if warning is not None and warn:
+        print("WARNING: " + warning)
+
+    keep = detections["conf"] > conf if conf is not None and conf > meta["conf"] else np.ones(len(detections["conf"]), dtype=bool)
+    frame = detections["frame"][keep]
+    data = np.concatenate([detections["xyxy"][keep], detections["conf"][keep, None],
+                           detections["cls"][keep, None].astype(np.float32)], axis=1)
+    frames = detections["frames"]
+    # rows of each frame, frames are stored in order
+    bounds = np.searchsorted(frame, np.stack([frames, frames + 1]), side="left")
+    for frame_no, lo, hi in zip(frames.tolist(), bounds[0], bounds[1]):
+        yield frame_no, tracker.update(Boxes(data[lo:hi], tuple(meta["shape"])))
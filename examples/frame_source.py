@@ -0,0 +1,131 @@
+# Threaded video frame source for the example video scripts
+# A decoder thread reads frames into a preallocated ring buffer while the main thread runs the model, so decoding
+# the next frame overlaps with model.track on the current one. read() returns a view into the ring buffer that
+# stays valid until the next read(). Stalls (read() having to wait for the decoder) are counted for tuning --buffer.
+# start/end (seconds) select a window of the video and stride keeps every Nth frame. Skipped frames are only
+# grabbed, not decoded, and the window start is a seek. Frame numbers are always the frame's position in the video.
+
+
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class FrameSource():
+    def __init__(self, path, buffer=8, start=0, end=None, stride=1):
+
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError("could not open video %s"%path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_total = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.stride = max(1, stride)
+        self.start_frame = int(round(start*self.fps)) if start else 0
+        self.end_frame = int(round(end*self.fps)) if end is not None else None
+        if self.end_frame is not None and self.end_frame <= self.start_frame:
+            raise ValueError("end (%.2fs) must be after start (%.2fs)"%(end, start))
+        self.seek(self.start_frame)
+
+        # the first frame sets the ring buffer size, CAP_PROP width/height can be wrong for rotated videos
+        success, first = self.cap.read()
+        if not success:
+            raise IOError("could not read frame %i from %s"%(self.start_frame, path))
+        self.height, self.width = first.shape[0:2]
+        self.frames = np.empty((max(2, buffer),) + first.shape, dtype=first.dtype)
+        self.frames[0] = first
+
+        # slot numbers free to decode into, and (slot, frame number) ready to be read, None at the end of the video
+        self.free = queue.Queue()
+        for slot in range(1, len(self.frames)):
+            self.free.put(slot)
+        self.ready = queue.Queue()
+        self.ready.put((0, self.start_frame))
+        self.current = None
+        self.stopped = False
+
+        # frames read, reads that waited for the decoder and seconds spent waiting
+        self.count = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+
+        self.thread = threading.Thread(target=self._decode, daemon=True)
+        self.thread.start()
+
+    def seek(self, frame_no):
+        # move to a frame number, falls back to grabbing from the start if the backend lands on another frame
+        if frame_no <= 0:
+            return
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
+        if int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) != frame_no:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            for i in range(frame_no):
+                if not self.cap.grab():
+                    break
+
+    def skip(self):
+        # grab the frames between two kept frames without decoding them
+        for i in range(self.stride - 1):
+            if not self.cap.grab():
+                return False
+        return True
+
+    def _decode(self):
+        frame_no = self.start_frame
+        while True:
+            slot = self.free.get()
+            if self.stopped:
+                break
+            frame_no += self.stride
+            if self.end_frame is not None and frame_no >= self.end_frame:
+                break
+            if not self.skip():
+                break
+            # decodes straight into the slot when the frame has the same size and type
+            success, frame = self.cap.read(self.frames[slot])
+            if not success:
+                break
+            if frame.shape != self.frames[slot].shape:
+                frame = cv2.resize(frame, (self.width, self.height))
+            if not np.shares_memory(frame, self.frames[slot]):
+                self.frames[slot] = frame
+            self.ready.put((slot, frame_no))
+        self.ready.put(None)
+
+    def read(self):
+        # (frame number from 0, frame), or (None, None) at the end of the video
+        if self.current is not None:
+            self.free.put(self.current)
+            self.current = None
+        if self.ready.empty():
+            self.stalls += 1
+            start = time.perf_counter()
+            item = self.ready.get()
+            self.stall_time += time.perf_counter() - start
+        else:
+            item = self.ready.get()
+        if item is None:
+            # leave the end marker for any later read()
+            self.ready.put(None)
+            return None, None
+        self.current, frame_no = item
+        self.count += 1
+        return frame_no, self.frames[self.current]
+
+    def __iter__(self):
+        while True:
+            frame_no, frame = self.read()
+            if frame is None:
+                return
+            yield frame_no, frame
+
+    def stats(self):
+        return "Frames read: %i, decoder stalls: %i (%.1f%%), %.2fs waiting for frames"%(
+            self.count, self.stalls, 100*self.stalls/max(self.count, 1), self.stall_time)
+
+    def release(self):
+        self.stopped = True
+        self.free.put(-1)
+        self.thread.join()
+        self.cap.release()
@@ -0,0 +1,170 @@
+# Thin client for inference_server.py
+# InferenceClient has the predict()/track()/names of an Ultralytics YOLO model, and the results it returns have the
+# boxes (xyxy, xywh, conf, cls, id), plot() and save_txt() the scripts use, so a script can swap its model for a client
+# without other changes. Frames are sent as raw pixels over a kept-alive localhost connection, so the server sees the
+# exact same image as a local model would. Only numpy and OpenCV are needed, Ultralytics is not imported.
+
+
+import os
+import json
+import uuid
+import http.client
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# box colours, as compare_label_pred.py
+COLORS = [(75, 25, 230), (75, 180, 60), (25, 225, 255), (200, 130, 0), (48, 130, 245),
+          (180, 30, 145), (240, 240, 70), (230, 50, 240), (60, 245, 210), (212, 190, 250),
+          (128, 128, 0), (255, 190, 220), (40, 110, 170), (200, 250, 255), (0, 0, 128),
+          (195, 255, 170), (0, 128, 128), (180, 215, 255), (128, 0, 0), (128, 128, 128)]
+
+
+class HostArray(np.ndarray):
+    # numpy array with the .cpu()/.numpy()/.int() calls of a torch tensor, for scripts written for Ultralytics results
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+    def int(self):
+        return self.astype(np.int64)
+
+
+def host_array(values, width, dtype=np.float32):
+    return np.asarray(values, dtype=dtype).reshape((-1, width) if width > 1 else (-1,)).view(HostArray)
+
+
+class RemoteBoxes():
+    def __init__(self, data):
+
+        self.xyxy = host_array(data["boxes"], 4)
+        self.conf = host_array(data["conf"], 1)
+        self.cls = host_array(data["cls"], 1)
+        self.id = host_array(data["id"], 1, np.int64) if data.get("id") is not None else None
+        self.is_track = self.id is not None
+        # (N, 6) xyxy, conf, cls or (N, 7) xyxy, id, conf, cls, as Ultralytics' boxes.data
+        columns = [self.xyxy] + ([self.id[:, None]] if self.is_track else []) + [self.conf[:, None], self.cls[:, None]]
+        self.data = np.concatenate(columns, axis=1).astype(np.float32).view(HostArray)
+        xy = (self.xyxy[:, 0:2] + self.xyxy[:, 2:4]) / 2
+        self.xywh = np.concatenate([xy, self.xyxy[:, 2:4] - self.xyxy[:, 0:2]], axis=1).view(HostArray)
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class RemoteResult():
+    # detections of one image from the server
+    def __init__(self, data, orig_img, names):
+
+        self.orig_img = orig_img
+        self.names = names
+        self.boxes = RemoteBoxes(data)
+        self.speed = data.get("speed", {})
+
+    def plot(self, labels=True, conf=True, probs=True, **kwargs):
+        # copy of the image with the boxes drawn
+        image = self.orig_img.copy()
+        for i, (x0, y0, x1, y1) in enumerate(self.boxes.xyxy.tolist()):
+            cls = int(self.boxes.cls[i])
+            color = COLORS[cls % len(COLORS)]
+            cv2.rectangle(image, (int(x0), int(y0)), (int(x1), int(y1)), color, 2)
+            if labels:
+                text = self.names.get(cls, str(cls)) + (" %.2f"%self.boxes.conf[i] if conf else "")
+                cv2.putText(image, text, (int(x0), max(int(y0) - 5, 15)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return image
+
+    def save_txt(self, txt_file, save_conf=False):
+        # YOLO label lines as Ultralytics' save_txt, no file if there are no detections
+        height, width = self.orig_img.shape[0:2]
+        lines = []
+        for i, (x, y, w, h) in enumerate(self.boxes.xywh.tolist()):
+            line = (int(self.boxes.cls[i]), x/width, y/height, w/width, h/height)
+            if save_conf:
+                line += (float(self.boxes.conf[i]),)
+            lines.append(("%g " * len(line)).rstrip()%line)
+        if len(lines) > 0:
+            with open(txt_file, 'a') as f:
+                f.write("".join(line + "\n" for line in lines))
+        return txt_file
+
+
+class InferenceClient():
+    def __init__(self, url, model, backend="pytorch", imgsz=640, concurrent=8):
+
+        parsed = urllib.parse.urlparse(url if "://" in url else "http://" + url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        # the server may run in another folder, so local weights are sent as absolute paths
+        self.model = os.path.abspath(model) if os.path.exists(model) else model
+        self.backend = backend
+        self.imgsz = imgsz
+        # tracks are kept on the server per stream, one stream per client
+        self.stream = uuid.uuid4().hex
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, concurrent))
+        self._names = None
+
+    def _connection(self):
+        # one kept-alive connection per thread
+        if getattr(self.local, "conn", None) is None:
+            self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=600)
+        return self.local.conn
+
+    def _request(self, method, path, params=None, body=None, headers=None):
+        query = urllib.parse.urlencode(dict(params or {}, model=self.model, backend=self.backend))
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, "%s?%s"%(path, query), body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # the server closed a kept-alive connection, reconnect once
+                conn.close()
+                self.local.conn = None
+                if attempt == 1:
+                    raise
+        if response.status != 200:
+            raise RuntimeError("inference server: %s"%data.decode(errors="replace"))
+        return json.loads(data)
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._names = {int(k): v for k, v in self._request("GET", "/info")["names"].items()}
+        return self._names
+
+    def _send(self, path, image, params):
+        image = np.ascontiguousarray(image)
+        headers = {"Content-Type": "application/octet-stream", "X-Shape": ",".join(str(s) for s in image.shape)}
+        data = self._request("POST", path, params, image.tobytes(), headers)
+        return RemoteResult(data, image, self.names)
+
+    def predict(self, source, conf=0.25, imgsz=None, **kwargs):
+        # list of results for an image or a list of images, sent at the same time so the server can batch them
+        params = {"conf": conf, "imgsz": imgsz or self.imgsz}
+        images = source if isinstance(source, list) else [source]
+        if len(images) == 1:
+            return [self._send("/predict", images[0], params)]
+        return list(self.pool.map(lambda image: self._send("/predict", image, params), images))
+
+    def track(self, source, conf=0.25, imgsz=None, tracker="botsort.yaml", **kwargs):
+        # list with the result of one frame, tracks persist between calls of this client
+        params = {"conf": conf, "imgsz": imgsz or self.imgsz, "stream": self.stream, "tracker": tracker}
+        return [self._send("/track", source, params)]
+
+    def metrics(self):
+        return self._request("GET", "/metrics")
+
+    def close(self):
+        # drop this client's tracker on the server
+        try:
+            self._request("POST", "/close", {"stream": self.stream})
+        except (OSError, RuntimeError):
+            pass
+        self.pool.shutdown()
@@ -0,0 +1,334 @@
+# Local inference server keeping models loaded between runs of the example scripts
+# Start it once, then run the scripts with --server http://127.0.0.1:8765 and they send frames here instead of
+# loading the model themselves (see inference_client.py). Models are loaded on their first request and kept.
+#
+#   POST /predict   detections of one image. Requests for the same model, conf and image size that arrive within
+#                   --max_wait ms of each other are run as one batch of up to --max_batch images
+#   POST /track     detections with track IDs. Each client stream has its own copy of the loaded model and its own
+#                   tracker, so tracks persist between its frames. Frames of a stream are run in order, one at a time
+#   POST /close     drop the tracker of a stream
+#   GET  /info      class names of a model
+#   GET  /metrics   requests, batch sizes, queue depth and latency of each model
+#
+# Images are sent as raw uint8 pixels with their shape in an X-Shape header, or as an encoded image file.
+# Only listens on localhost by default, there is no authentication
+
+
+import copy
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+import numpy as np
+from backends import BACKENDS, resolve_device, load_model
+
+
+def percentiles(values):
+    # p50 and p95 in ms of a list of seconds
+    if len(values) == 0:
+        return None, None
+    p50, p95 = np.percentile(np.asarray(values) * 1000, [50, 95])
+    return round(float(p50), 2), round(float(p95), 2)
+
+
+def result_json(result):
+    # detections of an Ultralytics result for the client
+    boxes = result.boxes
+    return {"boxes": boxes.xyxy.cpu().tolist(),
+            "conf": boxes.conf.cpu().tolist(),
+            "cls": boxes.cls.cpu().tolist(),
+            "id": boxes.id.int().cpu().tolist() if boxes.is_track else None,
+            "speed": result.speed}
+
+
+class Batcher():
+    # dynamic batching of predict requests for one model, conf and image size
+    # requests queue up while the previous batch runs, so the batch size follows the load
+    def __init__(self, model, lock, conf, imgsz, device, max_batch=8, max_wait=0.005):
+
+        self.model = model
+        self.lock = lock
+        self.conf = conf
+        self.imgsz = imgsz
+        self.device = device
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.requests = 0
+        self.batches = 0
+        self.latency = deque(maxlen=1000)
+        self.inference = deque(maxlen=1000)
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def __call__(self, image):
+        # blocks until the batch holding this image has run
+        future = Future()
+        self.queue.put((image, future, time.perf_counter()))
+        return future.result()
+
+    def collect(self):
+        # first waiting request, then any others arriving before max_wait or until the batch is full
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect()
+            start = time.perf_counter()
+            try:
+                with self.lock:
+                    results = self.model.predict([image for image, _, _ in batch], conf=self.conf, imgsz=self.imgsz,
+                                                 device=self.device, verbose=False)
+                replies = [result_json(result) for result in results]
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            end = time.perf_counter()
+            self.requests += len(batch)
+            self.batches += 1
+            self.inference.append(end - start)
+            for (_, future, queued), reply in zip(batch, replies):
+                self.latency.append(end - queued)
+                future.set_result(reply)
+
+    def metrics(self):
+        p50, p95 = percentiles(list(self.latency))
+        inference = list(self.inference)
+        return {"requests": self.requests,
+                "batches": self.batches,
+                "mean_batch": round(self.requests/max(self.batches, 1), 2),
+                "queue_depth": self.queue.qsize(),
+                "latency_p50_ms": p50,
+                "latency_p95_ms": p95,
+                "inference_ms_per_batch": round(1000*sum(inference)/max(len(inference), 1), 2)}
+
+
+class Stream():
+    # tracker of one client stream, with its own copy of the model so its tracks are not mixed with other streams
+    def __init__(self, model, device):
+
+        self.model = model
+        self.device = device
+        self.lock = threading.Lock()
+        self.used = time.time()
+
+    def __call__(self, image, conf, imgsz, tracker):
+        with self.lock:
+            self.used = time.time()
+            return result_json(self.model.track(image, persist=True, conf=conf, imgsz=imgsz, device=self.device,
+                                                tracker=tracker, verbose=False)[0])
+
+
+class InferenceServer():
+    # models, batchers and tracker streams behind the HTTP handler
+    def __init__(self, device=None, max_batch=8, max_wait=5, stream_timeout=600):
+
+        self.device = device
+        self.max_batch = max_batch
+        self.max_wait = max_wait / 1000
+        self.stream_timeout = stream_timeout
+        self.lock = threading.Lock()
+        # (model, backend): (YOLO model, lock serialising its predict calls)
+        self.models = {}
+        # (model, backend, conf, imgsz): Batcher
+        self.batchers = {}
+        # stream id: Stream
+        self.streams = {}
+        self.track_latency = deque(maxlen=1000)
+        self.track_requests = 0
+        self.started = time.time()
+
+    def model(self, weights, backend):
+        key = (weights, backend)
+        with self.lock:
+            if key not in self.models:
+                print("Loading %s (%s)"%(weights, backend))
+                self.models[key] = (load_model(weights, backend), threading.Lock())
+            return self.models[key]
+
+    def stream_model(self, weights, backend):
+        # copy of the loaded model for a new stream, without the predictor so the copy makes its own for its tracker
+        model, lock = self.model(weights, backend)
+        with lock:
+            predictor, model.predictor = getattr(model, "predictor", None), None
+            try:
+                return copy.deepcopy(model)
+            finally:
+                model.predictor = predictor
+
+    def predict(self, image, weights, backend, conf, imgsz):
+        key = (weights, backend, conf, imgsz)
+        model, lock = self.model(weights, backend)
+        with self.lock:
+            if key not in self.batchers:
+                self.batchers[key] = Batcher(model, lock, conf, imgsz, resolve_device(self.device, backend),
+                                             self.max_batch, self.max_wait)
+            batcher = self.batchers[key]
+        return batcher(image)
+
+    def track(self, image, weights, backend, conf, imgsz, tracker, stream_id):
+        start = time.perf_counter()
+        with self.lock:
+            # forget streams of clients that stopped without closing
+            for key in [key for key, stream in self.streams.items() if time.time() - stream.used > self.stream_timeout]:
+                del self.streams[key]
+            stream = self.streams.get(stream_id)
+        if stream is None:
+            stream = Stream(self.stream_model(weights, backend), resolve_device(self.device, backend))
+            with self.lock:
+                stream = self.streams.setdefault(stream_id, stream)
+        reply = stream(image, conf, imgsz, tracker)
+        self.track_latency.append(time.perf_counter() - start)
+        self.track_requests += 1
+        return reply
+
+    def close(self, stream_id):
+        with self.lock:
+            self.streams.pop(stream_id, None)
+
+    def metrics(self):
+        with self.lock:
+            batchers = dict(self.batchers)
+            streams = len(self.streams)
+        p50, p95 = percentiles(list(self.track_latency))
+        return {"uptime_s": round(time.time() - self.started, 1),
+                "models": ["%s (%s)"%key for key in self.models],
+                "predict": {"%s (%s) conf=%g imgsz=%i"%key: batcher.metrics() for key, batcher in batchers.items()},
+                "track": {"requests": self.track_requests, "streams": streams,
+                          "latency_p50_ms": p50, "latency_p95_ms": p95}}
+
+
+class Handler(BaseHTTPRequestHandler):
+    # kept-alive connections, the clients send one request after another on the same connection
+    protocol_version = "HTTP/1.1"
+    server_version = "InferenceServer"
+
+    def reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def params(self):
+        path = urlparse(self.path)
+        return path.path, {key: values[-1] for key, values in parse_qs(path.query).items()}
+
+    def image(self):
+        # raw pixels with an X-Shape header (height,width[,channels]), otherwise an encoded image file
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        shape = self.headers.get("X-Shape")
+        if shape is not None:
+            return np.frombuffer(body, dtype=np.uint8).reshape([int(s) for s in shape.split(',')])
+        image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("could not decode image")
+        return image
+
+    def do_GET(self):
+        path, params = self.params()
+        try:
+            if path == "/metrics":
+                self.reply(200, self.server.inference.metrics())
+            elif path == "/health":
+                self.reply(200, {"status": "ok"})
+            elif path == "/info":
+                model, _ = self.server.inference.model(params["model"], params.get("backend", "pytorch"))
+                self.reply(200, {"names": model.names})
+            else:
+                self.reply(404, {"error": "unknown path %s"%path})
+        except Exception as e:
+            self.reply(500, {"error": repr(e)})
+
+    def do_POST(self):
+        path, params = self.params()
+        inference = self.server.inference
+        try:
+            if path == "/close":
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                inference.close(params["stream"])
+                self.reply(200, {"status": "ok"})
+                return
+            if path not in ["/predict", "/track"]:
+                # the body is read so the kept-alive connection stays usable
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.reply(404, {"error": "unknown path %s"%path})
+                return
+            image = self.image()
+            weights = params["model"]
+            backend = params.get("backend", "pytorch")
+            conf = float(params.get("conf", 0.25))
+            imgsz = int(params.get("imgsz", 640))
+            if path == "/predict":
+                self.reply(200, inference.predict(image, weights, backend, conf, imgsz))
+            else:
+                self.reply(200, inference.track(image, weights, backend, conf, imgsz, params.get("tracker", "botsort.yaml"),
+                                                params["stream"]))
+        except KeyError as e:
+            self.reply(400, {"error": "missing parameter %s"%e})
+        except Exception as e:
+            self.reply(500, {"error": repr(e)})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Local inference server keeping models loaded')
+
+    parser.add_argument("--host", dest = "host",
+                help = "Address to listen on. Default 127.0.0.1 (this machine only)", default = "127.0.0.1", type = str)
+    parser.add_argument("--port", dest = "port",
+                help = "Port to listen on. Default 8765", default = 8765, type = int)
+    parser.add_argument("--model", dest = "model",
+                help = "Models to load at start, separated by commas. Others are loaded on their first request", default = None, type = str)
+    parser.add_argument("--backend", dest = "backend",
+                help = "Inference backend of the --model models: pytorch, onnx or openvino. Default pytorch", default = "pytorch", choices = BACKENDS, type = str)
+    parser.add_argument("--device", dest = "device",
+                help = "Device to run, ex. 0 for CUDA, cpu or mps for MacOS. Default 0 for pytorch, cpu for onnx and openvino", default = None, type = str)
+    parser.add_argument("--max_batch", dest = "max_batch",
+                help = "Maximum number of images per predict batch. Default 8", default = 8, type = int)
+    parser.add_argument("--max_wait", dest = "max_wait",
+                help = "Time in ms a predict request waits for others to batch with. Default 5", default = 5, type = float)
+    parser.add_argument("--stream_timeout", dest = "stream_timeout",
+                help = "Seconds after which the tracker of an idle stream is dropped. Default 600", default = 600, type = float)
+    parser.add_argument("--verbose", dest = "verbose",
+                help = "Log every request", action = "store_true")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = arg_parse()
+    inference = InferenceServer(args.device, args.max_batch, args.max_wait, args.stream_timeout)
+    if args.model is not None:
+        for weights in args.model.split(','):
+            inference.model(weights, args.backend)
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.inference = inference
+    server.verbose = args.verbose
+    print("Inference server on http://%s:%i"%(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
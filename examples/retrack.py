@@ -0,0 +1,75 @@
+# Rerun tracking and counting from detections saved by run_tracker_videos_summary.py --detections
+# No video or detector is needed, so --conf, --track_len and --tracker can be tried in seconds. The count and the
+# --save csv are the same as run_tracker_videos_summary.py gives with those settings (see detections.py for which
+# trackers are exact). --conf can only be raised above the conf the detections were recorded at
+
+
+import os
+import sys
+import time
+import argparse
+from detections import load_detections, retrack
+from track_counter import TrackCounter
+
+
+parser = argparse.ArgumentParser(description='Rerun tracker on saved detections')
+
+parser.add_argument("--src", dest = "src",
+            help = "Detections .npz saved by run_tracker_videos_summary.py --detections", default = None, type = str)
+parser.add_argument("--track_len", dest = "track_len",
+            help = "Number of frames detected before counting. Default 5.", default = 5, type = int)
+parser.add_argument("--conf", dest = "conf",
+            help = "Confidence threshold for detections. Default the conf they were recorded at", default = None, type = float)
+parser.add_argument("--tracker", dest = "tracker",
+            help = "Tracker yaml. Default the tracker they were recorded with", default = None, type = str)
+parser.add_argument("--save", dest = "save",
+            help = "Save the csv of run_tracker_videos_summary.py", action = "store_true")
+parser.add_argument("--name", dest = "name",
+            help = "Name to prepend to csv name save. Default \"tracked\"", default = "tracked", type = str)
+
+args = parser.parse_args()
+
+if args.src is None or not os.path.isfile(args.src):
+    sys.exit("ERROR: detections file must be provided with --src")
+
+detections = load_detections(args.src)
+meta = detections["meta"]
+conf = meta["conf"] if args.conf is None else args.conf
+fps = meta["fps"]
+
+if args.save:
+    # same name and columns as run_tracker_videos_summary.py
+    save_name = "%s-t%i-c%.2f-%s"%(args.name, args.track_len, conf, os.path.basename(meta["video"]))
+    csv_name = save_name[0:save_name.rfind(".")] + ".csv"
+    csv = open(csv_name, 'w')
+    header_end = "".join(",%s_count,%s_track_ID"%(value, value) for value in meta["names"].values())
+    csv.write("Frame #,Seconds,Box_x,Box_y,Box_w,Box_h,Conf%s\n"%header_end)
+
+counter = TrackCounter(args.track_len)
+start = time.time()
+try:
+    for frame_no, tracks in retrack(detections, conf, args.tracker):
+        if len(tracks) == 0:
+            continue
+        # centre x, y, w, h from x0, y0, x1, y1, as result.boxes.xywh
+        x = (tracks[:, 0] + tracks[:, 2]) / 2
+        y = (tracks[:, 1] + tracks[:, 3]) / 2
+        w = tracks[:, 2] - tracks[:, 0]
+        h = tracks[:, 3] - tracks[:, 1]
+        for i, track_id in enumerate(tracks[:, 4].astype(int).tolist()):
+            counter.update([(x[i], y[i])], [track_id])
+            if args.save:
+                frame_count = frame_no + 1
+                pre_commas = ","*(int(tracks[i, 6])*2+1)
+                csv.write("%i,%.2f,%s,%s,%s,%s,%s%s%s,%s\n"%(frame_count, frame_count/fps, str(float(x[i])), str(float(y[i])),
+                          str(float(w[i])), str(float(h[i])), str(float(tracks[i, 5])), pre_commas, counter.count, track_id))
+except ValueError as e:
+    sys.exit("ERROR: %s"%e)
+time_taken = time.time() - start
+
+if args.save:
+    csv.close()
+    print("Saved %s"%csv_name)
+n_frames = len(detections["frames"])
+print("COUNT: ", counter.count)
+print("TIME TO RUN: %.4f (%i frames, %.0f frames/s)"%(time_taken, n_frames, n_frames/max(time_taken, 1e-9)))
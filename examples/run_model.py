@@ -1,28 +1,268 @@
 # Run model on a source, can be a folder of images or video file
+# Results are streamed in batches and saved by a background writer pool with a bounded queue,
+# so memory stays flat however large the source folder is
+# With --tile each image is cut into overlapping tiles at full resolution instead of being shrunk to the model size
+# With --server the model runs on a running inference_server.py, images are read here and sent --batch at a time
 
 
-from ultralytics import YOLO 
 import argparse
+from backends import add_backend_args, resolve_device, load_model
+import os
+import sys
+import time
+import itertools
+import cv2
+from writer_pool import WriterPool
+from frame_source import FrameSource
+from tiling import predict_tiled, yolo_lines
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
 
 
 
 parser = argparse.ArgumentParser(description='Run a pretrained model on a source')
- 
+
 parser.add_argument("--src", dest = "src",
         help = "Source directory to parse", default = None, type = str)
 parser.add_argument("--model", dest = "model",
         help = "Path to model", default = None, type = str)
 parser.add_argument("--name", dest = "name",
         help = "Name output folder", default = None, type = str)
+parser.add_argument("--conf", dest = "conf",
+        help = "Confidence threshold. Between 0-1. Default 0.5", default = 0.5, type = float)
+add_backend_args(parser)
+parser.add_argument("--batch", dest = "batch",
+        help = "Number of images per inference batch. Default 8", default = 8, type = int)
+parser.add_argument("--writers", dest = "writers",
+        help = "Number of threads saving overlays and label files. Default 4", default = 4, type = int)
+parser.add_argument("--queue", dest = "queue",
+        help = "Maximum number of results waiting to be saved, inference waits when it is full. Default 32", default = 32, type = int)
+parser.add_argument("--tile", dest = "tile",
+        help = "Tile size in pixels for tiled inference on high resolution images, --batch tiles run at once. Default 0 (off)", default = 0, type = int)
+parser.add_argument("--overlap", dest = "overlap",
+        help = "Overlap between tiles as a fraction of --tile. Default 0.2", default = 0.2, type = float)
+parser.add_argument("--merge_iou", dest = "merge_iou",
+        help = "Overlap (of the smaller box) above which detections from different tiles are merged. Default 0.5", default = 0.5, type = float)
 
 args = parser.parse_args()
 
-model = YOLO(args.model)    # pretrained YOLOv8n model 
+
+args.device = resolve_device(args.device, args.backend)
+
+
+def save_result(result, image_path, label_path):
+    # runs on a writer thread: draw the overlay, write it and the label file (no label file if nothing was detected)
+    cv2.imwrite(image_path, result.plot())
+    result.save_txt(label_path)
+
+
+def save_tiled(image, boxes, scores, classes, names, image_path, label_path):
+    # runs on a writer thread: draw the merged detections, write the overlay and the label file
+    from ultralytics.utils.plotting import colors
+    height, width = image.shape[0:2]
+    for (x0, y0, x1, y1), score, cls in zip(boxes, scores, classes):
+        color = colors(int(cls), True)
+        cv2.rectangle(image, (int(x0), int(y0)), (int(x1), int(y1)), color, 3)
+        cv2.putText(image, "%s %.2f"%(names[int(cls)], score), (int(x0), max(int(y0) - 8, 20)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+    cv2.imwrite(image_path, image)
+    lines = yolo_lines(boxes, classes, width, height)
+    if len(lines) > 0:
+        with open(label_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class VideoSaver():
+    # annotated video of a video source, as predict(save=True) writes it: <save_dir>/<video name>.avi
+    # frames are drawn and written in order by one thread of its own, label files are still saved per frame
+    def __init__(self, video_path, save_dir):
+
+        self.source = video_path
+        self.path = os.path.join(save_dir, os.path.splitext(os.path.basename(video_path))[0] + ".avi")
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps >= 1 else 30
+        cap.release()
+        self.video = None
+        self.frames = 0
+        self.writer = WriterPool(1, args.queue)
+
+    def _write(self, result, label_path):
+        image = result.plot()
+        if self.video is None:
+            self.video = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"MJPG"), self.fps, (image.shape[1], image.shape[0]))
+            if not self.video.isOpened():
+                raise RuntimeError("could not open %s for writing"%self.path)
+        self.video.write(image)
+        result.save_txt(label_path)
+
+    def submit(self, result, label_path):
+        self.frames += 1
+        self.writer.submit(self._write, result, label_path)
+
+    def close(self):
+        # wait for the queued frames and finish the file
+        try:
+            self.writer.close()
+        finally:
+            if self.video is not None:
+                self.video.release()
+        return self.writer.blocked
+
+
+def output_dir(model):
+    # runs/<task>/<name> folder the predictions are saved to, a client has no predictor so the folder is named here
+    if args.server is not None:
+        save_dir = os.path.join("runs", "detect", args.name or "predict")
+    else:
+        save_dir = str(model.predictor.save_dir)
+    os.makedirs(os.path.join(save_dir, "labels"), exist_ok=True)
+    return save_dir
+
+
+def remote_frames():
+    # (image, output name, output stem, video path) of an image, folder of images or video
+    # video frames are named <video name>_<frame>, video path is None for images
+    if os.path.isdir(args.src):
+        paths = sorted(os.path.join(args.src, f) for f in os.listdir(args.src) if f.lower().endswith(IMAGE_EXTS))
+    else:
+        paths = [args.src]
+    for path in paths:
+        name = os.path.basename(path)
+        stem = os.path.splitext(name)[0]
+        if path.lower().endswith(IMAGE_EXTS):
+            image = cv2.imread(path)
+            if image is None:
+                print("WARNING: could not read %s, skipping"%path)
+                continue
+            yield image, name, stem, None
+        else:
+            source = FrameSource(path)
+            for frame_no, frame in source:
+                # copied as the decoder reuses the frame while it waits in a batch
+                yield frame.copy(), "%s_%i.jpg"%(stem, frame_no + 1), "%s_%i"%(stem, frame_no + 1), path
+            source.release()
+
+
+def run_remote(model):
+    # thin client of an inference server, --batch images are sent at once so the server can batch them
+    save_dir = output_dir(model)
+    start = time.perf_counter()
+    n_images = 0
+    frames = remote_frames()
+    # video sources are saved as one video, images as overlays on the writer pool
+    video = None
+    videos = 0
+    try:
+        with WriterPool(args.writers, args.queue) as writer:
+            while True:
+                batch = list(itertools.islice(frames, args.batch))
+                if len(batch) == 0:
+                    break
+                results = model.predict([image for image, _, _, _ in batch], conf=args.conf)
+                for result, (_, name, stem, video_path) in zip(results, batch):
+                    label_path = os.path.join(save_dir, "labels", stem + ".txt")
+                    if video_path is None:
+                        writer.submit(save_result, result, os.path.join(save_dir, name), label_path)
+                        continue
+                    if video is None or video.source != video_path:
+                        if video is not None:
+                            video.close()
+                        video = VideoSaver(video_path, save_dir)
+                        videos += 1
+                    video.submit(result, label_path)
+                n_images += len(batch)
+    finally:
+        if video is not None:
+            video.close()
+    seconds = time.perf_counter() - start
+    print("Saved %i images and %i videos to %s, %.1f images/s"%(writer.done, videos, save_dir, n_images/max(seconds, 1e-9)))
+
+
+def run_tiled(model):
+    # tiled inference on an image or folder of images, one image at a time
+    if os.path.isdir(args.src):
+        images = sorted(os.path.join(args.src, f) for f in os.listdir(args.src) if f.lower().endswith(IMAGE_EXTS))
+    elif args.src.lower().endswith(IMAGE_EXTS):
+        images = [args.src]
+    else:
+        sys.exit("ERROR: --tile runs on an image or a folder of images")
+
+    save_dir = None
+    n_images = 0
+    n_tiles = 0
+    infer_time = 0.0
+    with WriterPool(args.writers, args.queue) as writer:
+        for path in images:
+            image = cv2.imread(path)
+            if image is None:
+                print("WARNING: could not read %s, skipping"%path)
+                continue
+            start = time.perf_counter()
+            boxes, scores, classes, tiles = predict_tiled(model, image, args.tile, args.overlap, args.batch,
+                                                          args.conf, args.device, args.merge_iou, name=args.name)
+            latency = time.perf_counter() - start
+            n_images += 1
+            n_tiles += tiles
+            infer_time += latency
+            print("%s: %i tiles, %i detections, %.1f ms"%(os.path.basename(path), tiles, len(boxes), 1000*latency))
+
+            if save_dir is None:
+                save_dir = output_dir(model)
+            name = os.path.basename(path)
+            writer.submit(save_tiled, image, boxes, scores, classes, model.names, os.path.join(save_dir, name),
+                          os.path.join(save_dir, "labels", os.path.splitext(name)[0] + ".txt"))
+
+    print("Saved %i results to %s"%(writer.done, save_dir))
+    print("%i tiles in %.1fs, %.1f tiles/s, %.1f ms per image"%(n_tiles, infer_time, n_tiles/max(infer_time, 1e-9),
+                                                              1000*infer_time/max(n_images, 1)))
+
+
+model = load_model(args.model, args.backend, args.tile if args.tile > 0 else 640, args.server)
+if args.tile > 0:
+    run_tiled(model)
+    sys.exit()
+if args.server is not None:
+    run_remote(model)
+    sys.exit()
+
 results = model.predict(source=args.src,
                         show=False,
                         classes = None,
                         name=args.name,
-                        conf=0.5,
-                        device=0, 
-                        save=True,       
-                        save_txt=True )     
+                        conf=args.conf,
+                        device=args.device,
+                        batch=args.batch,
+                        stream=True)
+
+# overlays and labels go to the same runs/<task>/<name> folder as predict(save=True, save_txt=True)
+# images are saved as overlays on the writer pool, videos as one annotated video with labels <video name>_<frame>.txt
+save_dir = None
+video = None
+videos = 0
+blocked = 0.0
+
+try:
+    with WriterPool(args.writers, args.queue) as writer:
+        for result in results:
+            if save_dir is None:
+                save_dir = output_dir(model)
+
+            name = os.path.basename(result.path)
+            stem = os.path.splitext(name)[0]
+            if model.predictor.dataset.mode == "image":
+                writer.submit(save_result, result, os.path.join(save_dir, name), os.path.join(save_dir, "labels", stem + ".txt"))
+                continue
+
+            if video is None or video.source != result.path:
+                if video is not None:
+                    blocked += video.close()
+                video = VideoSaver(result.path, save_dir)
+                videos += 1
+            video.submit(result, os.path.join(save_dir, "labels", "%s_%i.txt"%(stem, video.frames + 1)))
+finally:
+    if video is not None:
+        blocked += video.close()
+
+print("Saved %i images and %i videos to %s, inference waited %.1fs for the writers"%(writer.done, videos, save_dir,
+                                                                                     writer.blocked + blocked))
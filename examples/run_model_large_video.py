@@ -1,9 +1,15 @@
 # Run model on a source, can be a folder of images or video file
+# Overlays are drawn, encoded and written by a background writer pool with a bounded queue,
+# so inference does not wait for the disk unless the writers fall --queue frames behind
+# Frames come from a decoder thread (frame_source.py), --stride frames are skipped without decoding them and
+# --start/--end select a window of the video
 
 
-from ultralytics import YOLO 
 import argparse
+from backends import add_backend_args, resolve_device, load_model
 import os
+from frame_source import FrameSource
+from writer_pool import WriterPool, FORMATS, encode_params, save_image
 
 
 parser = argparse.ArgumentParser(description='Run a pretrained model on a source')
@@ -15,25 +21,34 @@ parser.add_argument("--model", dest = "model",
 parser.add_argument("--name", dest = "name",
         help = "Name output folder", default = None, type = str)
 parser.add_argument("--stride", dest = "stride",
-        help = "Number of video frames to skip. Default 3", default = 3, type = int)
+        help = "Run on every Nth video frame, skipped frames are not decoded. Default 3", default = 3, type = int)
+parser.add_argument("--start", dest = "start",
+        help = "Start time in seconds. Default 0", default = 0, type = float)
+parser.add_argument("--end", dest = "end",
+        help = "End time in seconds. Default end of the video", default = None, type = float)
+parser.add_argument("--buffer", dest = "buffer",
+        help = "Number of frames the decoder thread can read ahead. Default 8", default = 8, type = int)
 parser.add_argument("--conf", dest = "conf",
         help = "Confidence threshold. Between 0-1. Default 0.25", default = 0.25, type = float)
-parser.add_argument("--device", dest = "device",
-        help = "Device to run. Default 0 for CUDA enabled. Change to mps for MacOS", default = 0, type = str)
+add_backend_args(parser)
+parser.add_argument("--format", dest = "format",
+        help = "Image format of saved frames. Default jpg", default = "jpg", choices = FORMATS, type = str)
+parser.add_argument("--quality", dest = "quality",
+        help = "Encoding quality for jpg and webp. Between 0-100. Default 95", default = 95, type = int)
+parser.add_argument("--scale", dest = "scale",
+        help = "Downscale saved frames by this factor. Between 0-1. Default 1 (full size)", default = 1.0, type = float)
+parser.add_argument("--writers", dest = "writers",
+        help = "Number of threads encoding and writing frames. Default 4", default = 4, type = int)
+parser.add_argument("--queue", dest = "queue",
+        help = "Maximum number of frames waiting to be written, inference waits when it is full. Default 32", default = 32, type = int)
 
 args = parser.parse_args()
 
 
-if args.device == "0":
-    args.device = 0
+args.device = resolve_device(args.device, args.backend)
 
-model = YOLO(args.model)    # pretrained YOLOv8n model 
-results = model.predict(source=args.src,
-                        vid_stride=args.stride,
-                        classes = None,
-                        conf=args.conf,
-                        device=args.device, 
-                        stream=True)
+model = load_model(args.model, args.backend, server=args.server)
+source = FrameSource(args.src, args.buffer, args.start, args.end, args.stride)
 
 os.makedirs(args.name, exist_ok=True)
 
@@ -41,9 +56,27 @@ vid_name = args.src.split('/')[-1]
 vid_idx = vid_name.rfind('.')
 vid_name = vid_name[:vid_idx]
 
-for i,result in enumerate(results):
-        frame_no = i*args.stride
-        frame_name = "%s-frame-%i.jpg"%(vid_name,frame_no) 
+params = encode_params(args.format, args.quality)
+
+
+def save_overlay(save_path, result, params, scale):
+    # runs on a writer thread: draw the detections on the frame and write it
+    save_image(save_path, result.plot(), params, scale)
+
+
+with WriterPool(args.writers, args.queue) as writer:
+    for frame_no, frame in source:
+        result = model.predict(frame,
+                               classes = None,
+                               conf=args.conf,
+                               device=args.device,
+                               verbose=False)[0]
+        frame_name = "%s-frame-%i.%s"%(vid_name,frame_no,args.format)
         save_path = os.path.join(args.name, frame_name)
-        result.save(filename=save_path)
-         
+        # the decoder reuses the frame, so the writer gets a copy to draw on and inference goes on to the next frame
+        result.orig_img = frame.copy()
+        writer.submit(save_overlay, save_path, result, params, args.scale)
+source.release()
+
+print("Saved %i frames to %s, inference waited %.1fs for the writers"%(writer.done, args.name, writer.blocked))
+print(source.stats())
@@ -3,15 +3,13 @@
 import os
 os.environ["OPENCV_FFMPEG_READ_ATTEMPTS"] = str(2**18)
 
-from collections import defaultdict
-
 import cv2
-import numpy as np
 import time
-
-from ultralytics import YOLO
+from frame_source import FrameSource
+from track_counter import TrackCounter
 
 import argparse
+from backends import add_backend_args, resolve_device, load_model
 parser = argparse.ArgumentParser(description='Run Tracker on Video')
 
 parser.add_argument("--src", dest = "src",
@@ -28,6 +26,15 @@ parser.add_argument("--conf", dest = "conf",
             help = "Confidence threshold for detections. Default 0.25", default = 0.25, type = float)
 parser.add_argument("--name", dest = "name",
             help = "Name to prepend to video name save. Default \"tracked\"", default = "tracked", type = str)
+add_backend_args(parser)
+parser.add_argument("--buffer", dest = "buffer",
+            help = "Number of frames the decoder thread can read ahead. Default 8", default = 8, type = int)
+parser.add_argument("--start", dest = "start",
+            help = "Start time in seconds. Default 0", default = 0, type = float)
+parser.add_argument("--end", dest = "end",
+            help = "End time in seconds. Default end of the video", default = None, type = float)
+parser.add_argument("--stride", dest = "stride",
+            help = "Run on every Nth frame, skipped frames are not decoded. Default 1", default = 1, type = int)
 
 
 
@@ -37,66 +44,51 @@ parser.add_argument("--name", dest = "name",
 args = parser.parse_args()
 
 # Load the YOLO11 model
-model = YOLO(args.model)
+model = load_model(args.model, args.backend, server=args.server)
+device = resolve_device(args.device, args.backend)
 
 # Open the video file
 # video_path = "/home/serena/Data/Urchins/videos/GH013242.MP4"
 video_path = args.src
-cap = cv2.VideoCapture(video_path)
+# frames are decoded on a background thread while the model runs
+source = FrameSource(video_path, args.buffer, args.start, args.end, args.stride)
 if args.save:
     save_name = args.src.split('/')
     save_name = save_name[-1]
     save_name = "%s-t%i-c%.2f-%s"%(args.name,args.track_len, args.conf,save_name)
-    frame_width = int(cap.get(3))
-    frame_height = int(cap.get(4))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    out = cv2.VideoWriter(save_name, cv2.VideoWriter_fourcc(*'XVID'), fps, (frame_width, frame_height))
+    frame_width = source.width
+    frame_height = source.height
+    fps = source.fps
+    out = cv2.VideoWriter(save_name, cv2.VideoWriter_fourcc(*'XVID'), fps/args.stride, (frame_width, frame_height))
 
 
-# Store the track history
-track_history = defaultdict(lambda: [])
-count = []
+# Store the track history and count
+counter = TrackCounter(args.track_len)
 start = time.time()
 # Loop through the video frames
-while cap.isOpened():
-    # Read a frame from the video
-    success, frame = cap.read()
+while True:
+    # Read a frame from the video, frame numbers are positions in the video starting from 0
+    frame_no, frame = source.read()
+    success = frame is not None
 
     if success:
         # Run YOLO11 tracking on the frame, persisting tracks between frames
-        result = model.track(frame, persist=True, show_labels=False, show_conf=False, conf=args.conf)[0]
+        result = model.track(frame, persist=True, show_labels=False, show_conf=False, conf=args.conf, device=device)[0]
 
         # Get the boxes and track IDs
+        boxes = []
+        track_ids = []
         if result.boxes and result.boxes.is_track:
-            boxes = result.boxes.xywh.cpu()
+            boxes = result.boxes.xywh.cpu().tolist()
             track_ids = result.boxes.id.int().cpu().tolist()
 
             # Visualize the result on the frame
             frame = result.plot(labels=False, probs=False)
-            # Plot the tracks
-            for box, track_id in zip(boxes, track_ids):
-                x, y, w, h = box
-                
-                
-                track = track_history[track_id]
-
-                track.append((float(x), float(y)))  # x, y center point
-                color = (230,230,230)
-                if len(track) > args.track_len and track_id not in count:
-                    count.append(track_id)
-                
-                if len(track) > args.track_len:
-                    color = (0,255,0)
-                    
-                if len(track) > 30:  # retain 30 tracks for 30 frames
-                    track.pop(0)
-
-                # Draw the tracking lines
-                points = np.hstack(track).astype(np.int32).reshape((-1, 1, 2))
-                cv2.polylines(frame, [points], isClosed=False, color=color, thickness=10)
-        cv2.putText(frame, "COUNT: %i"%len(count), (5,50), cv2.FONT_HERSHEY_SIMPLEX, 2, (0,0,255), 2 )
+            counter.update(boxes, track_ids)
+        # Draw the tracking lines and the count
+        counter.draw(frame, boxes, track_ids, draw_boxes=False)
         
-        print("COUNT: ",len(count))
+        print("COUNT: ",counter.count)
         # Display the annotated frame
         if args.show:
             cv2.imshow("YOLO11 Tracking", cv2.resize(frame, (0,0), fx=0.8, fy=0.8))
@@ -111,9 +103,14 @@ while cap.isOpened():
         break
 
 # Release the video capture object and close the display window
-cap.release()
-out.release()
+source.release()
+# drop the tracker on the inference server
+if args.server is not None:
+    model.close()
+if args.save:
+    out.release()
 cv2.destroyAllWindows()
 
 time_taken = time.time()-start
-print("TIME TO RUN: %.4f"%time_taken)
\ No newline at end of file
+print("TIME TO RUN: %.4f"%time_taken)
+print(source.stats())
\ No newline at end of file
@@ -0,0 +1,195 @@
+# Run model and tracker on a video as a multi-process pipeline
+# Decode, inference and render/encode each run in their own process, so with a free core per stage they can overlap
+# instead of sharing the GIL. With fewer cores there is nothing to overlap: on a 1-core machine benchmark_pipeline.py
+# measured 0.95x the frames/s of the single loop. Frames are never pickled: the decoder reads each frame straight into a slot of a
+# multiprocessing.shared_memory ring, and only the slot number and the (small) detection arrays pass through the
+# queues. A slot goes back to the decoder once its frame is rendered.
+#
+#   free slots -> decode -> inference -> render/encode -> free slots
+#
+# Can be imported (run_pipeline) or run like run_tracker_video.py
+
+
+import os
+os.environ["OPENCV_FFMPEG_READ_ATTEMPTS"] = str(2**18)
+
+import time
+import queue
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+from backends import add_backend_args, resolve_device, load_model
+from track_counter import TrackCounter
+
+
+class YoloTracker():
+    # detector for the inference process, the model is loaded in that process on the first frame
+    def __init__(self, model, conf=0.25, device=None, backend="pytorch", server=None):
+
+        self.model_path = model
+        self.conf = conf
+        self.backend = backend
+        self.server = server
+        self.device = resolve_device(device, backend)
+        self.model = None
+
+    def __call__(self, frame):
+        # (xywh boxes N x 4, track IDs N, confidences N) of the tracked objects in a frame
+        if self.model is None:
+            self.model = load_model(self.model_path, self.backend, server=self.server)
+        result = self.model.track(frame, persist=True, conf=self.conf, device=self.device, verbose=False)[0]
+        if not (result.boxes and result.boxes.is_track):
+            return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return (result.boxes.xywh.cpu().numpy(), result.boxes.id.int().cpu().numpy().astype(np.int64),
+                result.boxes.conf.cpu().numpy())
+
+
+def video_info(video_path):
+    # (frame shape, fps) from the first frame, CAP_PROP width/height can be wrong for rotated videos
+    cap = cv2.VideoCapture(video_path)
+    success, frame = cap.read()
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    if not success:
+        raise IOError("could not read a frame from %s"%video_path)
+    return frame.shape, fps
+
+
+def attach(name, shape, slots):
+    # the shared memory ring as a (slots, h, w, 3) array
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((slots,) + shape, dtype=np.uint8, buffer=shm.buf)
+
+
+def decode_stage(video_path, name, shape, slots, free, to_infer):
+    shm, frames = attach(name, shape, slots)
+    cap = cv2.VideoCapture(video_path)
+    frame_no = 0
+    while True:
+        slot = free.get()
+        success, frame = cap.read(frames[slot])
+        if not success:
+            break
+        if not np.shares_memory(frame, frames[slot]):
+            frames[slot] = cv2.resize(frame, (shape[1], shape[0])) if frame.shape != shape else frame
+        to_infer.put((slot, frame_no))
+        frame_no += 1
+    to_infer.put(None)
+    cap.release()
+    del frames
+    shm.close()
+
+
+def infer_stage(detector, name, shape, slots, to_infer, to_render):
+    shm, frames = attach(name, shape, slots)
+    while True:
+        item = to_infer.get()
+        if item is None:
+            break
+        slot, frame_no = item
+        to_render.put((slot, frame_no) + tuple(detector(frames[slot])))
+    to_render.put(None)
+    del frames
+    shm.close()
+
+
+def render_stage(name, shape, slots, fps, save_path, track_len, to_render, free, done):
+    shm, frames = attach(name, shape, slots)
+    counter = TrackCounter(track_len)
+    out = None
+    if save_path is not None:
+        out = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'XVID'), fps, (shape[1], shape[0]))
+    n_frames = 0
+    while True:
+        item = to_render.get()
+        if item is None:
+            break
+        slot, frame_no, boxes, track_ids = item[0:4]
+        counter.update(boxes, track_ids)
+        if out is not None:
+            counter.draw(frames[slot], boxes, track_ids)
+            out.write(frames[slot])
+        free.put(slot)
+        n_frames += 1
+    if out is not None:
+        out.release()
+    done.put((n_frames, counter.count))
+    del frames
+    shm.close()
+
+
+def run_pipeline(video_path, detector, save_path=None, track_len=5, slots=8):
+    # run decode, detector (a picklable callable frame -> (boxes, track IDs, confs)) and render in 3 processes
+    # returns (frames, count, seconds)
+    shape, fps = video_info(video_path)
+    slots = max(2, slots)
+    shm = shared_memory.SharedMemory(create=True, size=slots*int(np.prod(shape)))
+    ctx = mp.get_context()
+    free = ctx.Queue()
+    to_infer = ctx.Queue()
+    to_render = ctx.Queue()
+    done = ctx.Queue()
+    for slot in range(slots):
+        free.put(slot)
+
+    start = time.time()
+    procs = [ctx.Process(target=decode_stage, args=(video_path, shm.name, shape, slots, free, to_infer)),
+             ctx.Process(target=infer_stage, args=(detector, shm.name, shape, slots, to_infer, to_render)),
+             ctx.Process(target=render_stage, args=(shm.name, shape, slots, fps, save_path, track_len, to_render, free, done))]
+    try:
+        for proc in procs:
+            proc.start()
+        while True:
+            try:
+                n_frames, count = done.get(timeout=1)
+                break
+            except queue.Empty:
+                failed = [proc for proc in procs if proc.exitcode not in (None, 0)]
+                if len(failed) > 0:
+                    raise RuntimeError("pipeline process %s exited with code %i"%(failed[0].name, failed[0].exitcode))
+        seconds = time.time() - start
+        for proc in procs:
+            proc.join()
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        shm.close()
+        shm.unlink()
+    return n_frames, count, seconds
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Run Tracker on Video with a process per stage')
+
+    parser.add_argument("--src", dest = "src",
+                help = "Path to video to run model on", default = None, type = str)
+    parser.add_argument("--model", dest = "model",
+                help = "Path to model to run. Default is yolo11m", default = "yolo11m.pt", type = str)
+    parser.add_argument("--save", dest = "save",
+                help = "Save resulting video", action = "store_true")
+    parser.add_argument("--track_len", dest = "track_len",
+                help = "Number of frames detected before counting. Default 5.", default = 5, type = int)
+    parser.add_argument("--conf", dest = "conf",
+                help = "Confidence threshold for detections. Default 0.25", default = 0.25, type = float)
+    add_backend_args(parser)
+    parser.add_argument("--name", dest = "name",
+                help = "Name to prepend to video name save. Default \"tracked\"", default = "tracked", type = str)
+    parser.add_argument("--slots", dest = "slots",
+                help = "Number of frames in the shared memory ring. Default 8", default = 8, type = int)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = arg_parse()
+    save_name = None
+    if args.save:
+        save_name = "%s-t%i-c%.2f-%s"%(args.name, args.track_len, args.conf, os.path.basename(args.src))
+    n_frames, count, seconds = run_pipeline(args.src, YoloTracker(args.model, args.conf, args.device, args.backend, args.server), save_name,
+                                            args.track_len, args.slots)
+    print("COUNT: ", count)
+    print("TIME TO RUN: %.4f (%i frames, %.1f frames/s)"%(seconds, n_frames, n_frames/max(seconds, 1e-9)))
@@ -0,0 +1,218 @@
+# Sweep tracker settings against manual counts
+# The detector runs once per video at the lowest --confs value and its detections are saved (or reused) in --dets.
+# Every combination of conf, tracker yaml and --set tracker values is then re-tracked from the saved detections in
+# parallel worker processes (see detections.py), and every --track_lens value is counted in the same pass.
+# Counts are compared with --truth, a csv of manual counts (ex. made on videos from tools/add_line_to_vid.py):
+#
+#   video,count
+#   GH013242.MP4,57
+#
+# Saves <name>_sweep.csv (count of every video and setting) and <name>_sweep_summary.csv (error of each setting over
+# all videos, best first). Counts match run_tracker_videos_summary.py with the same settings for trackers that only
+# use the boxes, ex. bytetrack.yaml
+
+
+import os
+import sys
+import csv
+import time
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import yaml
+from backends import add_backend_args, resolve_device, load_model
+from detections import detect_video, load_detections, make_tracker, retrack
+from track_counter import TrackCounter
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mpg", ".mpeg", ".wmv")
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Sweep tracker settings against manual counts')
+
+    parser.add_argument("--src", dest = "src",
+                help = "Video or folder of videos", default = None, type = str)
+    parser.add_argument("--model", dest = "model",
+                help = "Path to model to run. Default is yolo11m", default = "yolo11m.pt", type = str)
+    parser.add_argument("--truth", dest = "truth",
+                help = "csv of manual counts with video and count columns. Default counts only", default = None, type = str)
+    parser.add_argument("--confs", dest = "confs",
+                help = "Confidence thresholds, separated by commas. Default 0.1,0.2,0.25,0.3,0.4,0.5", default = "0.1,0.2,0.25,0.3,0.4,0.5", type = str)
+    parser.add_argument("--track_lens", dest = "track_lens",
+                help = "Numbers of frames detected before counting, separated by commas. Default 1,3,5,8,12,20", default = "1,3,5,8,12,20", type = str)
+    parser.add_argument("--trackers", dest = "trackers",
+                help = "Tracker yamls, separated by commas. Default bytetrack.yaml", default = "bytetrack.yaml", type = str)
+    parser.add_argument("--set", dest = "settings",
+                help = "Tracker values to sweep, ex. --set track_buffer=30,60 --set match_thresh=0.7,0.8. Can be repeated", default = [], action = "append")
+    add_backend_args(parser)
+    parser.add_argument("--stride", dest = "stride",
+                help = "Run on every Nth frame. Default 1", default = 1, type = int)
+    parser.add_argument("--dets", dest = "dets",
+                help = "Folder to save detections to, detections already there are reused. Default sweep_detections", default = "sweep_detections", type = str)
+    parser.add_argument("--workers", dest = "workers",
+                help = "Number of re-tracking processes. Default number of CPUs", default = os.cpu_count(), type = int)
+    parser.add_argument("--name", dest = "name",
+                help = "Name for outputs. Default sweep", default = "sweep", type = str)
+
+    return parser.parse_args()
+
+
+def parse_settings(settings):
+    # list of {key: value} tracker settings, one per combination of --set values
+    grid = []
+    for setting in settings:
+        if '=' not in setting:
+            sys.exit("ERROR: --set %s should be key=value1,value2"%setting)
+        key, values = setting.split('=', 1)
+        grid.append([(key, yaml.safe_load(value)) for value in values.split(',')])
+    return [dict(combination) for combination in itertools.product(*grid)]
+
+
+def read_truth(truth_path):
+    # {video name: count}, names are matched with or without extension
+    truth = {}
+    with open(truth_path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            if "video" not in row or "count" not in row:
+                sys.exit("ERROR: %s needs video and count columns"%truth_path)
+            name = os.path.basename(row["video"].strip())
+            truth[name] = int(row["count"])
+            truth[os.path.splitext(name)[0]] = int(row["count"])
+    return truth
+
+
+@lru_cache(maxsize=4)
+def cached_detections(path):
+    # jobs of the same video usually land on the same worker
+    return load_detections(path)
+
+
+def video_stamp(video):
+    # absolute path, size and modified time of a video, saved with its detections
+    stat = os.stat(video)
+    return {"video": os.path.abspath(video), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def dets_name(video, conf, stride):
+    # videos of the same name in different folders get their own file
+    digest = hashlib.sha1(os.path.abspath(video).encode()).hexdigest()[0:8]
+    return "%s-%s-c%g-s%i.npz"%(os.path.basename(video), digest, conf, stride)
+
+
+def reusable(dets_path, video, model):
+    # saved detections of this same, unchanged video and model
+    if not os.path.isfile(dets_path):
+        return False
+    meta = load_detections(dets_path)["meta"]
+    return all(meta.get(key) == value for key, value in video_stamp(video).items()) and meta.get("model") == model
+
+
+def count_job(job):
+    # runs in a worker: {track_len: count} of one video, conf, tracker and settings
+    path, conf, tracker, settings, track_lens = job
+    counters = [TrackCounter(track_len) for track_len in track_lens]
+    for _, tracks in retrack(cached_detections(path), conf, tracker, settings, warn=False):
+        if len(tracks) == 0:
+            continue
+        centres = [((x0 + x1) / 2, (y0 + y1) / 2) for x0, y0, x1, y1 in tracks[:, 0:4].tolist()]
+        track_ids = tracks[:, 4].astype(int).tolist()
+        for counter in counters:
+            counter.update(centres, track_ids)
+    return {track_len: counter.count for track_len, counter in zip(track_lens, counters)}
+
+
+def settings_text(settings):
+    return " ".join("%s=%s"%(key, value) for key, value in settings.items())
+
+
+if __name__ == '__main__':
+    args = arg_parse()
+
+    if args.src is None or not os.path.exists(args.src):
+        sys.exit("ERROR: video or folder of videos must be provided with --src")
+    if os.path.isdir(args.src):
+        videos = sorted(os.path.join(args.src, f) for f in os.listdir(args.src) if f.lower().endswith(VIDEO_EXTS))
+    else:
+        videos = [args.src]
+    if len(videos) == 0:
+        sys.exit("ERROR: no videos found in %s"%args.src)
+
+    confs = sorted(float(conf) for conf in args.confs.split(','))
+    track_lens = sorted(int(track_len) for track_len in args.track_lens.split(','))
+    trackers = args.trackers.split(',')
+    grid = parse_settings(args.settings)
+    truth = read_truth(args.truth) if args.truth is not None else {}
+
+    # check the trackers and settings before the detector runs
+    warnings = set(make_tracker(tracker, settings)[1] for tracker, settings in itertools.product(trackers, grid))
+    for warning in sorted(warnings - {None}):
+        print("WARNING: " + warning)
+    print("%i videos, %i settings per video, %i track lengths each"%(len(videos), len(confs)*len(trackers)*len(grid), len(track_lens)))
+
+    os.makedirs(args.dets, exist_ok=True)
+    device = resolve_device(args.device, args.backend)
+    model = None
+    start = time.time()
+    futures = []
+    with ProcessPoolExecutor(max(1, args.workers)) as pool:
+        for video in videos:
+            dets_path = os.path.join(args.dets, dets_name(video, confs[0], args.stride))
+            if reusable(dets_path, video, args.model):
+                print("Using detections in %s"%dets_path)
+            else:
+                if model is None:
+                    model = load_model(args.model, args.backend, server=args.server)
+                print("Detecting %s at conf %g"%(video, confs[0]))
+                detect_video(model, video, dets_path, confs[0], device, stride=args.stride,
+                             meta=dict(video_stamp(video), model=args.model))
+            # this video is re-tracked while the detector runs on the next
+            for conf, tracker, settings in itertools.product(confs, trackers, grid):
+                futures.append(((os.path.basename(video), conf, tracker, settings),
+                                pool.submit(count_job, (dets_path, conf, tracker, settings, track_lens))))
+
+        rows = []
+        for (video, conf, tracker, settings), future in futures:
+            for track_len, count in future.result().items():
+                rows.append([video, conf, tracker, settings_text(settings), track_len, count,
+                             truth.get(video, truth.get(os.path.splitext(video)[0]))])
+    print("Sweep took %.1fs"%(time.time() - start))
+
+    # count and error of every video and setting
+    sweep_path = "%s_sweep.csv"%args.name
+    with open(sweep_path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["video", "conf", "tracker", "settings", "track_len", "count", "truth", "error"])
+        for row in rows:
+            writer.writerow(row[0:6] + (["", ""] if row[6] is None else [row[6], row[5] - row[6]]))
+    print("Counts saved to %s"%sweep_path)
+
+    # error of each setting over the videos with manual counts, best first
+    if len(truth) > 0:
+        settings_rows = {}
+        for video, conf, tracker, settings, track_len, count, manual in rows:
+            if manual is not None:
+                settings_rows.setdefault((conf, tracker, settings, track_len), []).append((count, manual))
+        if len(settings_rows) == 0:
+            sys.exit("ERROR: no video in %s matched %s"%(args.truth, args.src))
+        summary = []
+        for (conf, tracker, settings, track_len), counts in settings_rows.items():
+            abs_error = sum(abs(count - manual) for count, manual in counts)
+            percent = 100*sum(abs(count - manual)/max(manual, 1) for count, manual in counts)/len(counts)
+            bias = sum(count - manual for count, manual in counts)
+            summary.append([conf, tracker, settings, track_len, len(counts), abs_error, percent, bias])
+        summary.sort(key=lambda row: (row[6], row[5]))
+
+        header = ["conf", "tracker", "settings", "track_len", "videos", "total abs error", "mean abs error %", "total error"]
+        summary_path = "%s_sweep_summary.csv"%args.name
+        with open(summary_path, 'w', newline='') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(header)
+            for row in summary:
+                writer.writerow(row[0:6] + ["%.1f"%row[6], row[7]])
+        print("\n" + ", ".join(header))
+        for row in summary[0:10]:
+            print(", ".join(str(v) for v in row[0:6] + ["%.1f"%row[6], row[7]]))
+        print("Summary saved to %s"%summary_path)
@@ -0,0 +1,96 @@
+# Sliced (tiled) inference for high resolution images
+# The image is cut into overlapping tiles at the model's input size, tiles run through the model in batches, and the
+# detections are moved back to image coordinates. Objects cut by a tile edge are found again whole in the overlapping
+# tile, so duplicates across tiles are merged with a vectorised NMS on intersection over the smaller box (ios).
+
+
+import numpy as np
+
+
+def tile_starts(length, size, step):
+    # start of each tile along one side, the last tile ends on the image edge
+    if length <= size:
+        return [0]
+    starts = list(range(0, length - size + 1, step))
+    if starts[-1] + size < length:
+        starts.append(length - size)
+    return starts
+
+
+def tile_windows(width, height, size, overlap=0.2):
+    # (x0, y0, x1, y1) of every tile, tiles overlap by a fraction of the tile size
+    step = max(1, int(size * (1 - overlap)))
+    return np.array([(x, y, min(x + size, width), min(y + size, height))
+                     for y in tile_starts(height, size, step) for x in tile_starts(width, size, step)], dtype=np.int64)
+
+
+def nms(boxes, scores, classes, threshold=0.5, metric="iou", merge=False):
+    # greedy NMS with the overlaps of each kept box computed against all remaining boxes at once
+    # boxes xyxy, boxes of different classes never suppress each other
+    # metric "ios" divides by the smaller area, so a box cut at a tile edge is suppressed by the whole box
+    # merge grows each kept box to cover the boxes it suppressed
+    # returns (indices kept, kept boxes)
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64), boxes
+    # move each class to its own region so boxes of different classes never overlap
+    shifted = boxes + (np.asarray(classes, dtype=np.float64) * (boxes.max() + 1))[:, None]
+    areas = (shifted[:, 2] - shifted[:, 0]) * (shifted[:, 3] - shifted[:, 1])
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    keep = []
+    kept_boxes = []
+    while order.size > 0:
+        i = order[0]
+        rest = order[1:]
+        w = np.clip(np.minimum(shifted[i, 2], shifted[rest, 2]) - np.maximum(shifted[i, 0], shifted[rest, 0]), 0, None)
+        h = np.clip(np.minimum(shifted[i, 3], shifted[rest, 3]) - np.maximum(shifted[i, 1], shifted[rest, 1]), 0, None)
+        inter = w * h
+        if metric == "ios":
+            overlap = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        else:
+            overlap = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        suppressed = rest[overlap > threshold]
+        box = boxes[i]
+        if merge and len(suppressed) > 0:
+            group = boxes[np.append(suppressed, i)]
+            box = np.concatenate([group[:, 0:2].min(axis=0), group[:, 2:4].max(axis=0)])
+        keep.append(i)
+        kept_boxes.append(box)
+        order = rest[overlap <= threshold]
+    return np.asarray(keep, dtype=np.int64), np.asarray(kept_boxes)
+
+
+def predict_tiled(model, image, size=640, overlap=0.2, batch=8, conf=0.25, device=None, iou=0.5, **kwargs):
+    # (boxes xyxy, scores, classes, number of tiles) of an image from overlapping tiles run batch tiles at a time
+    # kwargs are passed on to model.predict
+    height, width = image.shape[0:2]
+    windows = tile_windows(width, height, size, overlap)
+    boxes = []
+    scores = []
+    classes = []
+    for start in range(0, len(windows), max(1, batch)):
+        chunk = windows[start:start+batch]
+        tiles = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in chunk]
+        results = model.predict(tiles, imgsz=size, conf=conf, device=device, verbose=False, **kwargs)
+        for (x0, y0, x1, y1), result in zip(chunk, results):
+            if len(result.boxes) == 0:
+                continue
+            boxes.append(result.boxes.xyxy.cpu().numpy() + np.array([x0, y0, x0, y0], dtype=np.float32))
+            scores.append(result.boxes.conf.cpu().numpy())
+            classes.append(result.boxes.cls.cpu().numpy().astype(np.int64))
+    if len(boxes) == 0:
+        return np.zeros((0, 4)), np.zeros(0), np.zeros(0, dtype=np.int64), len(windows)
+    boxes = np.concatenate(boxes)
+    scores = np.concatenate(scores)
+    classes = np.concatenate(classes)
+    keep, merged = nms(boxes, scores, classes, iou, metric="ios", merge=True)
+    return merged, scores[keep], classes[keep], len(windows)
+
+
+def yolo_lines(boxes, classes, width, height):
+    # YOLO label lines (class x_centre y_centre w h, normalised) as Ultralytics' save_txt
+    lines = []
+    for (x0, y0, x1, y1), cls in zip(boxes, classes):
+        line = (int(cls), (x0 + x1)/2/width, (y0 + y1)/2/height, (x1 - x0)/width, (y1 - y0)/height)
+        lines.append(("%g " * len(line)).rstrip()%line)
+    return lines
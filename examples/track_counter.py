@@ -0,0 +1,47 @@
+# Track history and count of tracked objects, shared by the tracker scripts
+# A track is counted once it has been seen in more than track_len frames. Only the last points of each track are
+# kept, for drawing its line
+
+
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+
+class TrackCounter():
+    # track history of each track ID and count of tracks seen in more than track_len frames, used by the tracker scripts
+    def __init__(self, track_len=5, history=30):
+
+        self.track_len = track_len
+        # tracks keep at least track_len points, or longer track lengths could never be counted
+        self.history = max(history, track_len)
+        self.tracks = defaultdict(lambda: [])
+        self.counted = []
+
+    def update(self, boxes, track_ids):
+        # boxes are xywh with x, y the box centre
+        for box, track_id in zip(boxes, track_ids):
+            x, y = box[0:2]
+            track = self.tracks[track_id]
+            track.append((float(x), float(y)))
+            if len(track) > self.track_len and track_id not in self.counted:
+                self.counted.append(track_id)
+            if len(track) > self.history:
+                track.pop(0)
+
+    def draw(self, frame, boxes, track_ids, draw_boxes=True):
+        # boxes (unless already drawn, ex. by result.plot), track lines (green once counted) and the count, in place
+        for box, track_id in zip(boxes, track_ids):
+            if draw_boxes:
+                x, y, w, h = box
+                cv2.rectangle(frame, (int(x - w/2), int(y - h/2)), (int(x + w/2), int(y + h/2)), (255,0,0), 2)
+            track = self.tracks[track_id]
+            color = (0,255,0) if track_id in self.counted else (230,230,230)
+            points = np.hstack(track).astype(np.int32).reshape((-1, 1, 2))
+            cv2.polylines(frame, [points], isClosed=False, color=color, thickness=10)
+        cv2.putText(frame, "COUNT: %i"%len(self.counted), (5,50), cv2.FONT_HERSHEY_SIMPLEX, 2, (0,0,255), 2 )
+
+    @property
+    def count(self):
+        return len(self.counted)
@@ -0,0 +1,83 @@
+# Background writer pool for the example scripts
+# Saving (drawing, encoding and writing images/labels) runs on worker threads fed by a bounded queue.
+# submit() blocks while the queue is full, so a fast producer (ex. model.predict) can never hold more than
+# max_pending results in memory. OpenCV encoding and file writes release the GIL, so threads run them in parallel.
+
+
+import queue
+import threading
+import time
+import cv2
+
+FORMATS = ["jpg", "png", "webp"]
+
+
+class WriterPool():
+    def __init__(self, workers=4, max_pending=32):
+
+        self.tasks = queue.Queue(maxsize=max(1, max_pending))
+        self.error = None
+        # number of tasks done and seconds submit() waited for space in the queue
+        self.done = 0
+        self.blocked = 0.0
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._run, daemon=True) for i in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            fn, args = task
+            try:
+                fn(*args)
+            except Exception as error:
+                with self.lock:
+                    if self.error is None:
+                        self.error = error
+            with self.lock:
+                self.done += 1
+
+    def submit(self, fn, *args):
+        # run fn(*args) on a writer thread, waits while max_pending tasks are queued
+        if self.error is not None:
+            raise self.error
+        start = time.perf_counter()
+        self.tasks.put((fn, args))
+        self.blocked += time.perf_counter() - start
+
+    def close(self):
+        # wait for every queued task, then raise the first error of a task if there was one
+        for thread in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def encode_params(fmt, quality):
+    # cv2.imwrite parameters for an image format, quality 0-100 for jpg and webp
+    # png is lossless, quality is ignored and it is written with fast compression
+    if fmt == "jpg":
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if fmt == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, max(1, int(quality))]
+    return [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+
+def save_image(path, image, params=None, scale=1.0):
+    # write an image, downscaled by scale (0-1) first if given
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if not cv2.imwrite(path, image, params or []):
+        raise IOError("could not write %s"%path)
@@ -6,17 +6,20 @@ Created: 27 Jan 2024
 
 Creates a train / test / validation split in the format expected by yolov5+
 Optionally trim n images with empty labels
+Splits are stratified by the most common class of each image (--strat mode) or by every class (--strat iterative)
 """
 
 import os
 import sys
-import shutil
 import random
 import argparse
+import yaml
 import numpy as np
-from statistics import mode
-from sklearn.model_selection import StratifiedShuffleSplit
-import glob
+from sklearn.model_selection import StratifiedShuffleSplit, StratifiedKFold
+from manifest import DatasetManifest
+from split_output import add_mode_args, make_split_dirs, write_splits, write_fold_files
+from stable_split import add_assign_args, sync_splits
+from stratify import count_matrix, iterative_split, report
 
 random.seed(1)
 
@@ -36,6 +39,11 @@ def arg_parse():
             help = "Number of empty images to drop", default = None, type = int)
     parser.add_argument("--rand", dest = "random_state",
             help = "Seed for random generation", default = 1, type = int)
+    parser.add_argument("--strat", dest = "strat",
+            help = "Stratify by the most common class of each image (mode) or by all classes of each image (iterative). Default mode",
+            default = "mode", choices = ["mode", "iterative"], type = str)
+    add_mode_args(parser)
+    add_assign_args(parser)
 
     return parser.parse_args()
 
@@ -56,102 +64,22 @@ def main():
     if os.path.exists(image_source_dir) == False:
         raise FileNotFoundError("Source directory {} does not exist".format(label_source_dir))
        # Check labels and images match - if an image has no label file, generate an empty one. If a label has no image, throw a warning
-    all_images = glob.glob(os.path.join(image_source_dir,"*"))
-    all_labels = glob.glob(os.path.join(label_source_dir,"*"))
-
-    # remove extensions
-    all_ims = []
-    all_labs = []
- 
-    for img in all_images:
-        img_name = img.split('/')[-1]
-        idx = img_name.rfind('.')
-        img_name = img_name[0:idx]
-        all_ims.append(img_name)
-
-
-    for label in all_labels:
-        label_name = label.split('/')[-1]
-        idx = label_name.rfind('.') 
-        label_name = label_name[0:idx]
-        all_labs.append(label_name)      
-
-
-    # all_ims = [im.split("/")[-1].split('.')[0] for im in all_ims]
-    # all_labs = [lab.split("/")[-1].split('.')[0] for lab in all_labs]
-    # print(all_ims)
-    # print(all_labs)
-    for im in all_ims:
-        if im not in all_labs:
-            print("Label file does not exist for %s, creating empty label"%im)
-            empty_label = os.path.join(label_source_dir,im+".txt")
-            open(empty_label, 'a').close()
-    
-    for lab in all_labs:
-        if lab not in all_ims:
-            print("WARNING: Label file %s exists with no matching image..."%lab) 
-    # Create output directory paths
-    train_out_dir = os.path.join(args.src_dir, "train")
-    valid_out_dir = os.path.join(args.src_dir, "valid")
-    test_out_dir = os.path.join(args.src_dir, "test")
-    train_image_dir = os.path.join(train_out_dir, "images")
-    train_label_dir = os.path.join(train_out_dir, "labels")
-    valid_image_dir = os.path.join(valid_out_dir, "images")
-    valid_label_dir = os.path.join(valid_out_dir, "labels")
-    test_image_dir = os.path.join(test_out_dir, "images")
-    test_label_dir = os.path.join(test_out_dir, "labels")
-
-    # Prompt to overwrite if output dir exists, otherwise attempt to create it
-    if os.path.exists(train_out_dir) or os.path.exists(valid_out_dir) or os.path.exists(test_out_dir):
-        print("WARNING: Output Directory Exists, data will be overwritten ", end="")
-
-        if input("Y/N?:").lower() != "y":
-            print("EXITING...\n")
-            exit()
-        else:
-            print("CONTINUING...\n")
-            # Delete existing output dir
-            try:
-                if os.path.exists(train_out_dir): shutil.rmtree(train_out_dir)
-                if os.path.exists(valid_out_dir): shutil.rmtree(valid_out_dir)
-                if os.path.exists(test_out_dir): shutil.rmtree(test_out_dir)
-            except OSError as error:
-                print(error)
-                sys.exit()
-
-    print("#################### Creating output directories ####################")
-    print("TRAIN: {}\nVALID: {}".format(train_out_dir, valid_out_dir))
-
-    try:
-        os.mkdir(train_out_dir)
-        os.mkdir(valid_out_dir)
-        os.mkdir(train_image_dir)
-        os.mkdir(train_label_dir)
-        os.mkdir(valid_image_dir)
-        os.mkdir(valid_label_dir)
-    except OSError as error:
-        print(error)
-        sys.exit()
-
-    if args.test is not None:
-        print("TEST: {}\n".format(test_out_dir))
-        try:
-            os.mkdir(test_out_dir)
-            os.mkdir(test_image_dir)
-            os.mkdir(test_label_dir)
-        except OSError as error:
-            print(error)
-            sys.exit()
-    else:
-        print("")
-
-    # Get image paths
-    images = os.listdir(image_source_dir)
-    images.sort()
-
-    # Get label paths
-    labels = os.listdir(label_source_dir)
-    labels.sort()
+    # Refresh the dataset manifest (only new or changed files are read) and index both folders by file stem
+    manifest = DatasetManifest(args.src_dir)
+    manifest.refresh()
+    index = manifest.pair_index()
+    created = index.create_empty_labels()
+    manifest.update_files("labels", [index.label(stem) for stem in created])
+    index.report(orphans=True)
+
+    # Prompt to overwrite and create output directories (list files need none, --assign hash updates them in place)
+    if args.mode != "listfile" and args.assign != "hash" and args.folds is None:
+        make_split_dirs(args.src_dir, args.test is not None, args.yes)
+
+    # Get matched image/label names, sorted by stem so images[i] and labels[i] are a pair
+    pairs = index.pairs()
+    images = [os.path.basename(img) for stem, img, label in pairs]
+    labels = [os.path.basename(label) for stem, img, label in pairs]
     
     # If dumping empty images
     if args.n_dump is not None:
@@ -159,7 +87,7 @@ def main():
         # Parse labels looking for empty sets to dump
         empty = []
         for i, label in enumerate(labels):
-            if os.stat(os.path.join(label_source_dir, label)).st_size == 0:
+            if manifest.is_empty(label):
                 empty.append(i)
         
         # Check numbers
@@ -168,115 +96,120 @@ def main():
             sys.exit()
         
         # Get a random selection of targets to remove
-        targets = random.sample(empty, args.n_dump)
+        targets = random.Random(args.random_state).sample(empty, args.n_dump)
 
         # Purge targets from inputs
         for i in sorted(targets, reverse=True):
             del images[i]
             del labels[i]
 
+    # Class histogram of each image from the manifest, as an images x classes matrix
+    hists = [manifest.classes(label_name) for label_name in labels]
+    class_matrix, class_ids = count_matrix(hists)
+    split_names = ["train", "valid"] + (["test"] if args.test is not None else [])
+
     # Get label mode for each image
     label_modes = []
-    for label_name in labels:
+    for hist in hists:
 
-        # Get path
-        label_path = os.path.join(label_source_dir, label_name)
-        
         # Check if empty
-        if os.stat(label_path).st_size != 0:
-            
-            # If not empty get label mode
-            with open(label_path, 'r') as stream:
-                lines = stream.readlines()
-                
-                # Iterate label lines
-                cls_list = []
-                for label in lines:
-                    label = label.rstrip()[0]
-                    cls_list.append(label)
-                
-                # Get mode
-                label_modes.append(mode(cls_list))
+        if hist:
+            # If not empty get the most common class (first seen wins ties)
+            label_modes.append(max(hist, key=hist.get))
         else:
             # If empty use -1 place holder
             label_modes.append(-1)
 
-    # Get train test splits
-    if args.test is None:
-        # Split train and valdidation sets using stratified (balance preserving split)
-        train_images, valid_images, train_labels, valid_labels = set_split(images, labels, label_modes, args.valid)[:4]
+    # K-fold cross validation list files instead of one split
+    if args.folds is not None:
+        # Hold out the test set first, the folds are made from the rest
+        rest = np.arange(len(images))
+        test_images = None
+        if args.test is not None:
+            if args.strat == "iterative":
+                held = iterative_split(class_matrix, [1 - args.test, args.test], args.random_state)
+                rest, test_idx = np.flatnonzero(held == 0), np.flatnonzero(held == 1)
+            else:
+                rest, test_idx = set_split(rest, rest, label_modes, args.test, args.random_state)[0:2]
+            test_images = [images[i] for i in test_idx]
+
+        rest = np.sort(np.asarray(rest, dtype=np.int64))
+        folds = set_folds([label_modes[i] for i in rest], class_matrix[rest], args.folds, args.strat, args.random_state)
+        write_fold_files(args.src_dir, image_source_dir, label_source_dir,
+                         [[images[i] for i in rest[folds == k]] for k in range(args.folds)], test_images)
+        report(class_matrix[rest], folds, ["fold%i"%k for k in range(args.folds)], class_ids, class_names(args.src_dir))
+        return
 
+    # Get train test splits
+    ratios = [1 - args.valid - (args.test or 0), args.valid] + ([args.test] if args.test is not None else [])
+    if args.assign == "hash":
+        # Keep the splits of earlier runs, new images are placed by the classes each split is missing (iterative) or by hash
+        splits = sync_splits(manifest, args.src_dir, image_source_dir, label_source_dir, images, labels, ratios, args.mode, args.workers,
+                             class_matrix if args.strat == "iterative" else None, args.random_state, args.yes)
     else:
-        # Calculate split percentages
-        total_per = args.valid + args.test
-        test_per = args.test / total_per
-        
-        # Split train, valdidation and test sets using stratified (balance preserving split)
-        train_images, temp_images, train_labels, temp_labels, temp_modes = set_split(images, labels, label_modes, total_per)
-        valid_images, test_images, valid_labels, test_labels = set_split(temp_images, temp_labels, temp_modes, test_per)[:4]
-    
-    # Copy splits to output folders
-    # Train images
-    for img_name in train_images:
-        # Make paths
-        temp_src_dir = os.path.join(image_source_dir, img_name)
-        temp_dst_dir = os.path.join(train_image_dir, img_name)
-
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
-        
-    # Train labels
-    for label_name in train_labels:
-        # Make paths
-        temp_src_dir = os.path.join(label_source_dir, label_name)
-        temp_dst_dir = os.path.join(train_label_dir, label_name)
+        if args.strat == "iterative":
+            # Split all sets at once, balancing the instances of every class
+            split_idx = iterative_split(class_matrix, ratios, args.random_state)
+            split_lists = [([images[i] for i in np.flatnonzero(split_idx == j)], [labels[i] for i in np.flatnonzero(split_idx == j)])
+                           for j in range(len(split_names))]
+            (train_images, train_labels), (valid_images, valid_labels) = split_lists[0:2]
+            if args.test is not None:
+                test_images, test_labels = split_lists[2]
+
+        elif args.test is None:
+            # Split train and valdidation sets using stratified (balance preserving split)
+            train_images, valid_images, train_labels, valid_labels = set_split(images, labels, label_modes, args.valid, args.random_state)[:4]
 
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
-    
-    # Valid images
-    for img_name in valid_images:
-        # Make paths
-        temp_src_dir = os.path.join(image_source_dir, img_name)
-        temp_dst_dir = os.path.join(valid_image_dir, img_name)
-
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
+        else:
+            # Calculate split percentages
+            total_per = args.valid + args.test
+            test_per = args.test / total_per
         
-    # Valid labels
-    for label_name in valid_labels:
-        # Make paths
-        temp_src_dir = os.path.join(label_source_dir, label_name)
-        temp_dst_dir = os.path.join(valid_label_dir, label_name)
-
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
+            # Split train, valdidation and test sets using stratified (balance preserving split)
+            train_images, temp_images, train_labels, temp_labels, temp_modes = set_split(images, labels, label_modes, total_per, args.random_state)
+            valid_images, test_images, valid_labels, test_labels = set_split(temp_images, temp_labels, temp_modes, test_per, args.random_state)[:4]
     
-    # Test set
-    if args.test is not None:
-        # Test images
-        for img_name in test_images:
-            # Make paths
-            temp_src_dir = os.path.join(image_source_dir, img_name)
-            temp_dst_dir = os.path.join(test_image_dir, img_name)
-
-            # Copy
-            copy_file(temp_src_dir, temp_dst_dir)
-            
-        # Test labels
-        for label_name in test_labels:
-            # Make paths
-            temp_src_dir = os.path.join(label_source_dir, label_name)
-            temp_dst_dir = os.path.join(test_label_dir, label_name)
-
-            # Copy
-            copy_file(temp_src_dir, temp_dst_dir)
+        splits = {"train": (train_images, train_labels), "valid": (valid_images, valid_labels)}
+        if args.test is not None:
+            splits["test"] = (test_images, test_labels)
+
+        # Copy/link splits to output folders or write list files
+        write_splits(args.src_dir, image_source_dir, label_source_dir, splits, args.mode, args.workers)
+        # the splits were rebuilt, a later --assign hash run must not keep the placements it recorded
+        manifest.clear_splits()
+
+    # Report the share of each class in each split
+    split_of = {}
+    for j, split in enumerate(splits.values()):
+        split_of.update({label_name: j for label_name in split[1]})
+    report(class_matrix, np.array([split_of[label_name] for label_name in labels], dtype=np.int64), split_names, class_ids,
+           class_names(args.src_dir))
+
+# Class names from data.yaml for the split report, if there is one
+def class_names(src_dir):
+    try:
+        with open(os.path.join(src_dir, "data.yaml"), 'r') as stream:
+            names = yaml.safe_load(stream)["names"]
+    except (OSError, KeyError, TypeError, yaml.YAMLError):
+        return None
+    return dict(enumerate(names)) if isinstance(names, list) else names
+
+# Helper function for cross validation, returns the fold of each image
+def set_folds(label_modes, class_matrix, n_folds, strat, random_state):
+    if strat == "iterative":
+        return iterative_split(class_matrix, [1]*n_folds, random_state)
+
+    folds = np.zeros(len(label_modes), dtype=np.int64)
+    kfold = StratifiedKFold(n_splits = n_folds, shuffle = True, random_state = random_state)
+    for k, (train_index, valid_index) in enumerate(kfold.split(np.zeros(len(label_modes)), label_modes)):
+        folds[valid_index] = k
+    return folds
 
 # Helper function for train test splits
-def set_split(src_images, src_labels, src_label_idents, split):
+def set_split(src_images, src_labels, src_label_idents, split, random_state=1):
     
     # Generate splits
-    train_split = StratifiedShuffleSplit(n_splits=1, test_size = split, random_state = 1)
+    train_split = StratifiedShuffleSplit(n_splits=1, test_size = split, random_state = random_state)
     train_gen = train_split.split(np.zeros(len(src_label_idents)), src_label_idents)
     train_index, valid_index = next(train_gen)
     
@@ -299,14 +232,5 @@ def set_split(src_images, src_labels, src_label_idents, split):
 
     return train_images, valid_images, train_labels, valid_labels, valid_idents
 
-# Helper function to copy files
-def copy_file(src_dir, dst_dir):
-    try:
-        shutil.copy(src_dir, dst_dir)
-    except OSError as error:
-        print(error)
-        print("\nFailed to copy {} to {}".format(src_dir, dst_dir))
-        sys.exit()
-
 if __name__=="__main__":
     main()
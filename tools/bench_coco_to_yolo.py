@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Microbenchmark for the label writing in coco_to_yolo_format.py.
+Scales the examples/SAM_COCO_annotation export up synthetically (copies of each image with jittered boxes) and times
+three versions of the label writing, whose outputs are checked to be identical:
+  baseline   write_txt as first written: every image scans all annotations, one f.write per line. It grows with
+             images x annotations, so it is timed once
+  grouped    annotations grouped by image in one pass and the class remap precomputed, one f.write per line
+  vectorised boxes normalised as one array and each label file written at once, the current write_txt
+
+Example use:
+python tools/bench_coco_to_yolo.py --scale 2000
+===
+
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import filecmp
+from coco_to_yolo_format import COCO2YOLOBB
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "SAM_COCO_annotation", "annotations", "instances_default.json")
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Benchmark COCO to YOLO label writing')
+
+    parser.add_argument("--json", dest = "json_file",
+            help = "COCO json to scale up. Default is the examples/SAM_COCO_annotation export", default = FIXTURE, type = str)
+    parser.add_argument("--scale", dest = "scale",
+            help = "Number of copies of every image and its annotations. Default 1000", default = 1000, type = int)
+    parser.add_argument("--repeat", dest = "repeat",
+            help = "Number of timed runs of each method, the best is reported. Default 3", default = 3, type = int)
+
+    return parser.parse_args()
+
+
+def scale_up(data, scale):
+    # copies of every image (new file names and ids) with jittered copies of its annotations
+    # segmentations are shared, not copied, so only the boxes take extra memory
+    random.seed(1)
+    n_images = len(data["images"])
+    img_names = []
+    cls = []
+    img_ids = []
+    bbxs = []
+    im_sz = []
+    for k in range(scale):
+        for image in data["images"]:
+            name = image["file_name"]
+            idx = name.rfind('.')
+            img_names.append("%s_%i%s"%(name[0:idx], k, name[idx:]))
+        for annotation in data["annotations"]:
+            cls.append(int(annotation["category_id"])-1)
+            img_ids.append(int(annotation["image_id"])-1 + k*n_images)
+            bbxs.append([v*random.uniform(0.95, 1.05) for v in annotation["bbox"]])
+            im_sz.append(annotation["segmentation"]["size"])
+    classes = {k:v["name"] for k,v in enumerate(data["categories"])}
+    return classes, img_names, cls, img_ids, bbxs, im_sz
+
+
+def write_baseline(converter, classes, img_names, cls, img_ids, bbxs, im_sz, out_folder):
+    # write_txt as first written, each image scans every annotation and classes are looked up by list index
+    for i, name in enumerate(img_names):
+        all_im_idx = [j for j in range(len(img_ids)) if img_ids[j] == i]
+        lines = []
+        for idx in all_im_idx:
+            idx_class = cls[idx]
+            if len(converter.all_classes_dict.keys()) < 1:
+                full_list_class = idx_class
+            else:
+                full_list_class = list(converter.all_classes_dict.keys())[list(converter.all_classes_dict.values()).index(classes[idx_class])]
+            [xn, yn, wn, hn] = converter.bbx_converter(bbxs[idx], im_sz[idx])
+            lines.append((full_list_class, xn, yn, wn, hn))
+        with open(os.path.join(out_folder,name[0:name.rfind('.')] + '.txt'),'w') as f:
+            for line in lines:
+                write_line = "%d %0.4f %0.4f %0.4f %0.4f"%line
+                f.write("%s\n"%write_line)
+
+
+def write_grouped(converter, classes, img_names, cls, img_ids, bbxs, im_sz, out_folder):
+    # annotations grouped by image in one pass, per-annotation conversion and one write per line
+    remap = converter.class_remap(classes)
+    im_annots = {}
+    for j, im_idx in enumerate(img_ids):
+        if im_idx in im_annots:
+            im_annots[im_idx].append(j)
+        else:
+            im_annots[im_idx] = [j]
+
+    for i, name in enumerate(img_names):
+        lines = []
+        for idx in im_annots.get(i, []):
+            full_list_class = converter.map_class(classes, remap, cls[idx])
+            [xn, yn, wn, hn] = converter.bbx_converter(bbxs[idx], im_sz[idx])
+            lines.append((full_list_class, xn, yn, wn, hn))
+        with open(os.path.join(out_folder,converter.label_name(name)),'w') as f:
+            for line in lines:
+                write_line = "%d %0.4f %0.4f %0.4f %0.4f"%line
+                f.write("%s\n"%write_line)
+
+
+def best_time(fn, repeat):
+    times = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter()-start)
+    return min(times)
+
+
+def main():
+    args = arg_parse()
+    with open(args.json_file) as f:
+        data = json.load(f)
+
+    classes, img_names, cls, img_ids, bbxs, im_sz = scale_up(data, args.scale)
+    print("Images: %i, annotations: %i"%(len(img_names), len(cls)))
+
+    tmp = tempfile.mkdtemp()
+    try:
+        converter = COCO2YOLOBB(None, tmp, None)
+        base_folder = os.path.join(tmp, "baseline")
+        ref_folder = os.path.join(tmp, "grouped")
+        vec_folder = os.path.join(tmp, "vectorised")
+        for folder in [base_folder, ref_folder, vec_folder]:
+            os.makedirs(folder)
+
+        # conversion only, without writing files
+        t_convert_ref = best_time(lambda: [converter.bbx_converter(b, s) for b, s in zip(bbxs, im_sz)], args.repeat)
+        t_convert_vec = best_time(lambda: converter.bbx_converter_np(bbxs, im_sz), args.repeat)
+
+        # conversion, formatting and writing every label file
+        t_base = best_time(lambda: write_baseline(converter, classes, img_names, cls, img_ids, bbxs, im_sz, base_folder), 1)
+        t_ref = best_time(lambda: write_grouped(converter, classes, img_names, cls, img_ids, bbxs, im_sz, ref_folder), args.repeat)
+        t_vec = best_time(lambda: converter.write_txt(classes, img_names, cls, img_ids, bbxs, im_sz, 1, vec_folder), args.repeat)
+
+        names = sorted(os.listdir(base_folder))
+        for folder in [ref_folder, vec_folder]:
+            match, mismatch, errors = filecmp.cmpfiles(base_folder, folder, names, shallow=False)
+            if len(mismatch) > 0 or len(errors) > 0:
+                sys.exit("ERROR: %s output differs for %i files, ex. %s"%(os.path.basename(folder), len(mismatch)+len(errors), (mismatch+errors)[0]))
+
+        print("\nbbox conversion: per-annotation %.4fs, vectorised %.4fs, %.1fx"%(t_convert_ref, t_convert_vec, t_convert_ref/t_convert_vec))
+        print("\nconvert + write labels, time (s), speedup over baseline")
+        for method, seconds in [("baseline", t_base), ("grouped", t_ref), ("vectorised", t_vec)]:
+            print("%s, %.4f, %.1fx"%(method, seconds, t_base/seconds))
+        print("\n%i label files identical"%len(match))
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__=='__main__':
+    main()
@@ -5,10 +5,10 @@ Date:       16/12/25
 '''
 
 
-import glob
 import os
 import argparse
 import shutil
+from pairing import PairIndex
 
 def arg_parse():
     """
@@ -32,27 +32,17 @@ def main():
     args = arg_parse()
     os.makedirs(args.save_imgs, exist_ok=True)
 
-    all_labels = glob.glob(os.path.join(args.label_folder,'*'))
-
-    for i in range(0,len(all_labels)):
-        label = all_labels[i]
-        # get matching image
-
-        # img name
-        label_name = label.split('/')[-1]
-        img_name = label_name[:-4]#label_name.split('.')[0]
-        print(img_name)
-        img_path = glob.glob(os.path.join(args.img_folder,img_name+"*"))
-        if len(img_path) > 1:
-            print("WARNING: label name matched to more than one img")
-        if len(img_path) == 0:
-            print("WARNING: image not found for %s"%label)
-        else:
-            im_name_ext = img_path[0]
-            im_name_ext = im_name_ext.split('/')[-1]
-            #print(img_path)
-            #print(os.path.join(args.save_imgs,im_name_ext))
-        shutil.copy(img_path[0],os.path.join(args.save_imgs,im_name_ext))
+    # index both folders once by file stem
+    index = PairIndex(args.img_folder, args.label_folder, label_ext=None)
+    index.report(orphans=False)
+
+    for stem in index.orphan_labels():
+        print("WARNING: image not found for %s"%index.label(stem))
+
+    for stem, img_path, label in index.pairs():
+        print(stem)
+        im_name_ext = os.path.basename(img_path)
+        shutil.copy(img_path,os.path.join(args.save_imgs,im_name_ext))
 
 
 if __name__=='__main__':
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+COCO segmentation (RLE masks from CVAT Segment Anything, or polygons) to YOLO segmentation polygons.
+RLE masks are decoded with NumPy, only over the columns/rows of the annotation bbox, then the outer contours are
+extracted and simplified with OpenCV. Masks in several parts are joined into one polygon by zero width bridges
+between their closest points, as YOLO has one polygon per line. Used by coco_to_yolo_format.py --format seg.
+===
+
+"""
+
+import math
+import cv2
+import numpy as np
+
+# parts smaller than this fraction of the largest part of a mask are dropped (SAM speckles)
+MIN_PART = 0.01
+
+
+def rle_string_counts(s):
+    # counts of a compressed COCO RLE string (same encoding as pycocotools)
+    counts = []
+    p = 0
+    while p < len(s):
+        x = 0
+        k = 0
+        more = 1
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1f) << 5*k
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and (c & 0x10):
+                x |= -1 << 5*k
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
+
+
+def rle_decode_t(counts, size, cols=None):
+    # decode a column-major COCO RLE into its transposed mask, shape (width, height), uint8 0/1
+    # cols=(x0, x1) decodes only image columns x0..x1-1, so memory is the size of the bbox and not the image
+    h, w = size
+    x0, x1 = (0, w) if cols is None else cols
+    lo = x0*h
+    hi = x1*h
+
+    counts = np.asarray(counts, dtype=np.int64)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    # run lengths clipped to the decoded range, runs alternate 0, 1, 0, 1...
+    lengths = np.clip(ends, lo, hi) - np.clip(starts, lo, hi)
+    values = np.zeros(len(counts), dtype=np.uint8)
+    values[1::2] = 1
+    flat = np.repeat(values, lengths)
+    if len(flat) < hi-lo:
+        flat = np.concatenate([flat, np.zeros(hi-lo-len(flat), dtype=np.uint8)])
+    return flat.reshape((x1-x0, h))
+
+
+def bbox_window(bbox, size):
+    # integer (x0, x1), (y0, y1) covering a [x, y, w, h] bbox, clipped to the image
+    h, w = size
+    x0 = min(max(int(math.floor(bbox[0])), 0), w)
+    y0 = min(max(int(math.floor(bbox[1])), 0), h)
+    x1 = min(max(int(math.ceil(bbox[0]+bbox[2])), x0+1), w)
+    y1 = min(max(int(math.ceil(bbox[1]+bbox[3])), y0+1), h)
+    return (x0, x1), (y0, y1)
+
+
+def simplify(points, epsilon):
+    # simplify a closed (K,2) polygon with Douglas-Peucker, epsilon in pixels
+    if epsilon is None or epsilon <= 0 or len(points) <= 3:
+        return points
+    approx = cv2.approxPolyDP(points.astype(np.float32).reshape(-1,1,2), epsilon, True).reshape(-1,2)
+    if len(approx) < 3:
+        return points
+    return approx
+
+
+def polygon_area(points):
+    x = points[:,0]
+    y = points[:,1]
+    return 0.5*abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1)))
+
+
+def merge_parts(parts):
+    # join (K,2) polygons into one, largest first, each part bridged in at its closest point to the polygon so far
+    # tiny parts are dropped, returns None if nothing is left
+    parts = [part for part in parts if len(part) >= 3]
+    if len(parts) == 0:
+        return None
+    areas = [polygon_area(part) for part in parts]
+    order = np.argsort(areas)[::-1]
+    merged = parts[order[0]]
+    for i in order[1:]:
+        if areas[i] < MIN_PART*areas[order[0]]:
+            break
+        part = parts[i]
+        dist = ((merged[:,None,:] - part[None,:,:])**2).sum(axis=2)
+        a, b = np.unravel_index(np.argmin(dist), dist.shape)
+        # go out to the part at merged[a] -> part[b], around the part, and back
+        part = np.roll(part, -b, axis=0)
+        merged = np.concatenate([merged[:a+1], part, part[:1], merged[a:]])
+    return merged
+
+
+def rle_polygon(counts, size, bbox, epsilon):
+    # outer contours of an RLE mask merged into one (K,2) array of image [x, y] pixels, or None
+    if bbox is not None:
+        cols, rows = bbox_window(bbox, size)
+    else:
+        cols, rows = (0, size[1]), (0, size[0])
+    mask_t = rle_decode_t(counts, size, cols)
+    mask_t = np.ascontiguousarray(mask_t[:, rows[0]:rows[1]])
+
+    # contours of the transposed mask, points come back as (row, column) of the image
+    contours = cv2.findContours(mask_t, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+    parts = []
+    for contour in contours:
+        contour = contour.reshape(-1,2)
+        points = np.empty(contour.shape, dtype=np.float64)
+        points[:,0] = contour[:,1] + cols[0]
+        points[:,1] = contour[:,0] + rows[0]
+        parts.append(simplify(points, epsilon))
+    return merge_parts(parts)
+
+
+def seg_polygon(job):
+    # YOLO segmentation polygon for one annotation, normalised and flattened [x1, y1, x2, y2...], or None
+    # job = (segmentation, image size [h, w], bbox or None, epsilon)
+    seg, size, bbox, epsilon = job
+    h, w = size
+
+    if isinstance(seg, dict):
+        counts = seg["counts"]
+        if isinstance(counts, str):
+            counts = rle_string_counts(counts)
+        points = rle_polygon(counts, seg.get("size", size), bbox, epsilon)
+    else:
+        points = merge_parts([simplify(np.asarray(poly, dtype=np.float64).reshape(-1,2), epsilon) for poly in seg if len(poly) >= 6])
+
+    if points is None:
+        return None
+    points = points / np.array([w, h], dtype=np.float64)
+    return np.clip(points, 0.0, 1.0).ravel()
+
+
+def seg_polygons(jobs, pool=None, chunksize=16):
+    # seg_polygon for many annotations, spread over a process pool if one is given
+    if pool is None:
+        return [seg_polygon(job) for job in jobs]
+    return list(pool.map(seg_polygon, jobs, chunksize=chunksize))
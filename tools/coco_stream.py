@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Incremental reader for large COCO json files (ex. CVAT exports with SAM RLE masks).
+The top level arrays ("categories", "images", "annotations"...) are read one element at a time from a small
+rolling buffer, so memory stays roughly the size of the largest single element instead of the whole file.
+Only the standard library json decoder is used.
+===
+
+"""
+
+import json
+
+WHITESPACE = " \t\n\r"
+
+
+class COCOStream():
+    def __init__(self, path, chunk_size=1 << 20):
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+
+    def _open(self):
+        self.f = open(self.path, 'r', encoding='utf-8')
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        # read more of the file into the buffer, dropping what has already been parsed
+        if self.eof:
+            return False
+        data = self.f.read(size or self.chunk_size)
+        if len(data) == 0:
+            self.eof = True
+            return False
+        if self.pos > 0:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += data
+        return True
+
+    def _peek(self):
+        # next non whitespace character, without consuming it
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of json file %s"%self.path)
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError("Expected '%s' at offset %i of the buffer in %s"%(char, self.pos, self.path))
+        self.pos += 1
+
+    def _decode(self):
+        # decode one json value at the current position, reading more of the file until it is complete
+        self._peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a value ending exactly at the end of the buffer (ex. a number) may continue in the file
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # value is larger than the buffer, grow the reads so long values are not re-parsed too often
+            self._fill(size)
+            size *= 2
+
+    def _array(self):
+        # iterate the elements of an array at the current position
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._decode()
+            c = self._peek()
+            self.pos += 1
+            if c == ']':
+                return
+            if c != ',':
+                raise ValueError("Expected ',' or ']' in array in %s"%self.path)
+
+    def items(self, keys, stop_early=True):
+        # yield (key, element) for every element of the top level arrays named in keys, in file order
+        # other top level values are skipped element by element. With stop_early, reading stops once every key was read
+        remaining = set(keys)
+        self._open()
+        try:
+            self._expect('{')
+            if self._peek() == '}':
+                return
+            while True:
+                key = self._decode()
+                self._expect(':')
+                if self._peek() == '[':
+                    wanted = key in remaining
+                    for element in self._array():
+                        if wanted:
+                            yield key, element
+                    remaining.discard(key)
+                else:
+                    value = self._decode()
+                    if key in remaining:
+                        yield key, value
+                        remaining.discard(key)
+
+                if stop_early and len(remaining) == 0:
+                    return
+                c = self._peek()
+                self.pos += 1
+                if c == '}':
+                    return
+                if c != ',':
+                    raise ValueError("Expected ',' or '}' in %s"%self.path)
+        finally:
+            self.f.close()
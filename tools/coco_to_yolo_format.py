@@ -6,6 +6,7 @@ Created: 23 July 2024
 
 ===
 Converts the Segment Anything Model (SAM) masks from CVAT in COCO format into YOLO compatible bounding boxes
+or, with --format seg, into YOLO segmentation polygons
 If there are multiple jsons and the classes do not all match, a "all_classes_dict.yaml" will be required
 ===
 
@@ -18,10 +19,23 @@ import glob
 import csv
 import sys
 import argparse
+import shutil
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from coco_stream import COCOStream
+from coco_masks import seg_polygons
+
+# class, bb centre x, bb centre y, bb w, bb h
+LABEL_LINE = "%d %0.4f %0.4f %0.4f %0.4f\n"
+# class, x1 y1 x2 y2 ... (normalised polygon points)
+SEG_CLASS = "%d"
+SEG_POINT = " %0.6f"
+FORMATS = ["bbox", "seg"]
 
 
 class COCO2YOLOBB():
-    def __init__(self, json_file, save_location, classes_dict):
+    def __init__(self, json_file, save_location, classes_dict, stream=False, workers=1, fmt="bbox", epsilon=1.5, yes=False):
 
         # load in the json file
         #json_file = "/home/serena/Data/SCTLD/RAW/1_100/annotations/instances_default.json" 
@@ -31,6 +45,21 @@ class COCO2YOLOBB():
         self.in_files = json_file #"/home/serena/Data/SCTLD/RAW/"
         self.save_location = save_location #"/home/serena/Data/SCTLD/Processed/"
         self.all_classes_dict = {}
+        self.classes_dict_path = classes_dict
+        # read the jsons incrementally instead of json.load
+        self.stream = stream
+        # number of processes converting json files in parallel
+        self.workers = workers
+        # bbox: YOLO bounding boxes, seg: YOLO segmentation polygons from the masks
+        self.fmt = fmt
+        # polygon simplification tolerance in pixels
+        self.epsilon = epsilon
+        # process pool for decoding masks, set in run() for a single json with --workers > 1
+        self.pool = None
+        # annotations with no usable mask, not written
+        self.dropped = 0
+        # answer yes to overwrite prompts (for run_pipeline.py)
+        self.yes = yes
         if classes_dict is not None: 
             with open(classes_dict, 'r') as f:
                 self.all_classes_dict = yaml.load(f, Loader=yaml.SafeLoader) 
@@ -64,7 +93,8 @@ class COCO2YOLOBB():
             cls = [int(annotation["category_id"])-1 for annotation in annotations]
             img_ids = [int(annotation["image_id"])-1 for annotation in annotations]
             bbxs = [annotation["bbox"] for annotation in annotations]
-            im_sz = [annotation["segmentation"]["size"] for annotation in annotations]
+            # RLE masks carry their size [h, w], polygons use the size of their image
+            im_sz = [self.seg_size(annotation["segmentation"], img_size, img_id) for annotation, img_id in zip(annotations, img_ids)]
             # print(classes, img_names, cls, img_ids, bbxs, im_sz)
             return classes_dict, img_names, cls, img_ids, bbxs, im_sz
 
@@ -75,20 +105,31 @@ class COCO2YOLOBB():
 
 
 
+    def seg_size(self, seg, img_size, img_id):
+        # [h, w] of the image an annotation belongs to, img_size is a list of [w, h]
+        if isinstance(seg, dict):
+            return seg["size"]
+        [w, h] = img_size[img_id]
+        return [h, w]
+
+    def get_segs(self, data):
+        # segmentation (RLE dict or list of polygons) of each annotation, in the order of get_info
+        return [annotation["segmentation"] for annotation in data["annotations"]]
+
     def write_yaml(self, classes):
         # generate yaml file with each class name
         yaml_path = os.path.join(self.save_location,"data.yaml")
         test_yaml_path = os.path.join(self.save_location,"test.yaml")
 
         if os.path.isfile(yaml_path):
-            ow = input("data.yaml already exists at %s. Overwrite? Y/N "%(yaml_path))
+            ow = "y" if self.yes else input("data.yaml already exists at %s. Overwrite? Y/N "%(yaml_path))
             if ow.lower() == "y":
                 print("Overwriting data.yaml")
             else:
                 sys.exit("ERROR: Not overwriting data.yaml. Please select different save path without exisiting yaml file.")
         
         if os.path.isfile(test_yaml_path):
-            ow1 = input("test.yaml already exists at %s. Overwrite? Y/N "%(yaml_path))
+            ow1 = "y" if self.yes else input("test.yaml already exists at %s. Overwrite? Y/N "%(yaml_path))
             if ow.lower() == "y":
                 print("Overwriting test.yaml")
             else:
@@ -144,15 +185,38 @@ class COCO2YOLOBB():
 
         return [xn, yn, wn, hn]
 
-    def write_txt(self, classes, img_names, cls, img_ids, bbxs, im_sz, loop):
+    def stack(self, values, width):
+        # (N,width) float64 array from a list of N lists, fromiter is about twice as fast as np.asarray on nested lists
+        if isinstance(values, np.ndarray):
+            return values.astype(np.float64, copy=False).reshape(-1,width)
+        return np.fromiter(itertools.chain.from_iterable(values), dtype=np.float64, count=len(values)*width).reshape(-1,width)
+
+    def bbx_converter_np(self, bbxs, im_szs):
+        # vectorised bbx_converter for all annotations at once
+        # bbxs (N,4) [x top left, y top left, width, height], im_szs (N,2) [height, width]
+        # returns (N,4) [x middle, y middle, width, height] normalised, with the same float64 arithmetic as bbx_converter
+        bbxs = self.stack(bbxs, 4)
+        im_szs = self.stack(im_szs, 2)
+        fh = im_szs[:,0]
+        fw = im_szs[:,1]
+        out = np.empty_like(bbxs)
+        out[:,0] = (bbxs[:,0] + (bbxs[:,2]/2))/fw
+        out[:,1] = (bbxs[:,1] + (bbxs[:,3]/2))/fh
+        out[:,2] = bbxs[:,2]/fw
+        out[:,3] = bbxs[:,3]/fh
+        return out
+
+    def prepare_output(self, classes, loop, out_folder=None):
         
-        # location to save labels
+        # location to save labels (parallel workers write to their own staging folder)
+        if out_folder is not None:
+            return out_folder
         out_folder = os.path.join(self.save_location,"all_labels")
         if loop == 0:
             if not os.path.isdir(out_folder):
-                os.mkdir(out_folder)
+                os.makedirs(out_folder)
             else:
-                ow = input("WARNING: Folder %s already exists. Overwrite contents? Y/N "%(out_folder))
+                ow = "y" if self.yes else input("WARNING: Folder %s already exists. Overwrite contents? Y/N "%(out_folder))
                 if ow.lower() == "y":
                     print("Overwriting labels")
                 else:
@@ -164,57 +228,214 @@ class COCO2YOLOBB():
             
             # write data.yaml and test.yaml
             self.write_yaml(classes)
+        return out_folder
+
+    def label_name(self, name):
+        # textfile name for an image file name
+        get_name_str_end = name.rfind('.')
+        return name[0:get_name_str_end]+ '.txt'
+
+    def map_class(self, classes, remap, idx_class):
+        # class id written for one annotation
+        if remap is None:
+            return idx_class 
+        full_list_class = remap[idx_class]
+        if full_list_class is None:
+            sys.exit("ERROR: class %s is not in %s"%(classes[idx_class], self.classes_dict_path))
+        return full_list_class
+
+    def map_classes(self, classes, remap, cls):
+        # vectorised map_class, (N,) class ids written for all annotations
+        cls = np.asarray(cls, dtype=np.int64)
+        if remap is None:
+            return cls
+        if len(cls) > 0 and (cls.min() < 0 or cls.max() >= len(classes)):
+            sys.exit("ERROR: annotation category_id not in the json categories")
+        lut = np.array([-1 if remap[k] is None else remap[k] for k in range(len(classes))], dtype=np.int64)
+        out = lut[cls]
+        missing = np.flatnonzero(out < 0)
+        if len(missing) > 0:
+            self.map_class(classes, remap, int(cls[missing[0]]))
+        return out
+
+    def format_lines(self, rows):
+        # one label block for (N,5) rows of class, x, y, w, h (normalised), formatted in a single operation
+        return (LABEL_LINE * len(rows)) % tuple(rows.ravel().tolist())
+
+    def write_lines(self, out_path, text, mode='w'):
+        # write a whole label block to file in one write
+        with open(out_path,mode) as f:
+            f.write(text)
+
+    def group_by_image(self, img_ids, n_images):
+        # group annotations by image: stable sort keeps the annotation order within each image
+        # annotations with an image id outside the image list are dropped
+        # returns (annotation order, number of annotations of each image, end of each image in the order)
+        img_ids = np.asarray(img_ids, dtype=np.int64).reshape(-1)
+        valid = np.flatnonzero((img_ids >= 0) & (img_ids < n_images))
+        order = valid[np.argsort(img_ids[valid], kind='stable')]
+        counts = np.bincount(img_ids[valid], minlength=n_images)
+        return order, counts, np.cumsum(counts)
+
+    def polygons(self, segs, im_sz, bbxs):
+        # normalised polygon of each annotation (None if the mask is empty), decoded in the process pool if there is one
+        # the bbox limits RLE decoding to the pixels the mask can cover
+        jobs = [(seg, sz, bbx if isinstance(seg, dict) else None, self.epsilon) for seg, sz, bbx in zip(segs, im_sz, bbxs)]
+        return seg_polygons(jobs, self.pool)
+
+    def format_seg_lines(self, cls, polygons):
+        # one label block of class x1 y1 x2 y2 ... lines, annotations with no polygon are skipped
+        lines = []
+        for c, poly in zip(cls, polygons):
+            if poly is None:
+                self.dropped += 1
+                continue
+            lines.append((SEG_CLASS + SEG_POINT*len(poly) + "\n") % ((c,) + tuple(poly.tolist())))
+        return "".join(lines)
+
+    def write_seg_txt(self, classes, img_names, cls, img_ids, segs, bbxs, im_sz, loop, out_folder=None):
+        # write_txt for --format seg, one polygon line per annotation
+        # returns the label file names written, in image order
+
+        out_folder = self.prepare_output(classes, loop, out_folder)
+        remap = self.class_remap(classes)
+        cls = self.map_classes(classes, remap, cls).tolist()
+        polygons = self.polygons(segs, im_sz, bbxs)
+
+        order, counts, ends = self.group_by_image(img_ids, len(img_names))
+        for i, name in enumerate(img_names):
+            idx = order[ends[i]-counts[i]:ends[i]]
+            text = self.format_seg_lines([cls[j] for j in idx], [polygons[j] for j in idx])
+            self.write_lines(os.path.join(out_folder,self.label_name(name)), text)
+        return [self.label_name(name) for name in img_names]
+
+    def write_txt(self, classes, img_names, cls, img_ids, bbxs, im_sz, loop, out_folder=None):
+        # returns the label file names written, in image order
+
+        out_folder = self.prepare_output(classes, loop, out_folder)
+
+        # class id written for each class index of this json, looked up once per json instead of per annotation
+        remap = self.class_remap(classes)
+
+        # rows of class, x, y, w, h (normalised) for every annotation, converted in one vectorised step
+        rows = np.empty((len(cls), 5), dtype=np.float64)
+        rows[:,0] = self.map_classes(classes, remap, cls)
+        rows[:,1:] = self.bbx_converter_np(bbxs, im_sz)
+
+        order, counts, ends = self.group_by_image(img_ids, len(img_names))
+        rows = rows[order]
 
-        
         for i, name in enumerate(img_names):
-            # textfile name 
-            get_name_str_end = name.rfind('.')
-            # if len(get_name_str)>2:
-            #     print("Image name not able to be processed")
-            #     print(name)
-            # else:
-            out_txt_name = name[0:get_name_str_end]+ '.txt'
-            #print(out_txt_name)
-
-            # get the indexes of all annotations in this image
-            all_im_idx = [j for j in range(len(img_ids)) if img_ids[j] == i]
-            # print(img_ids)
-            # print(cls)
-            # print(out_txt_name, all_im_idx)
-            
-            # list of lines for each text file consisting of class, x, y, w, h (normalised)
-            lines = []
-
-            for idx in all_im_idx:
-                #print(idx)
-                idx_class = cls[idx] 
-                #print(idx_class)
-                #print(classes)
-                #print(self.all_classes_dict)
-                if len(self.all_classes_dict.keys()) < 1:
-                    full_list_class = idx_class 
-                else:
-                    full_list_class = list(self.all_classes_dict.keys())[list(self.all_classes_dict.values()).index(classes[idx_class])]
-                #input()
-                [xn, yn, wn, hn] = self.bbx_converter(bbxs[idx], im_sz[idx])
-                lines.append((full_list_class, xn, yn, wn, hn))
+            # one write per text file
+            text = self.format_lines(rows[ends[i]-counts[i]:ends[i]])
+            self.write_lines(os.path.join(out_folder,self.label_name(name)), text)
+        return [self.label_name(name) for name in img_names]
+
+    def write_txt_stream(self, data_path, loop, out_folder=None):
+        # same output as get_info + write_txt + label_summary, but the json is read incrementally with COCOStream
+        # label lines are written as soon as the annotations of an image have been read
+        # returns (label file names written, class summary of this json)
+        categories = []
+        img_names = []
+        # [w, h] of each image, for polygon segmentations
+        img_size = []
+        classes = None
+        remap = None
+        written = set()
+        # number of annotations of each class index
+        counts = {}
+        pending = []
+
+        # annotations (class, bbox, size, segmentation) of the current image, flushed when the image changes
+        cur_idx = None
+        cur_lines = []
+
+        def flush():
+            if cur_idx is None or cur_idx < 0 or cur_idx >= len(img_names):
+                return
+            bbxs = [line[1] for line in cur_lines]
+            szs = [line[2] if line[2] is not None else self.seg_size(None, img_size, cur_idx) for line in cur_lines]
+            if self.fmt == "seg":
+                text = self.format_seg_lines([line[0] for line in cur_lines], self.polygons([line[3] for line in cur_lines], szs, bbxs))
+            else:
+                rows = np.empty((len(cur_lines), 5), dtype=np.float64)
+                rows[:,0] = [line[0] for line in cur_lines]
+                rows[:,1:] = self.bbx_converter_np(bbxs, szs)
+                text = self.format_lines(rows)
+            # annotations of one image are usually consecutive, append if they were not
+            mode = 'a' if cur_idx in written else 'w'
+            self.write_lines(os.path.join(out_folder,self.label_name(img_names[cur_idx])), text, mode)
+            written.add(cur_idx)
 
-            
-            out_path = os.path.join(out_folder,out_txt_name) 
-
-            # if os.path.isfile(out_path):
-            #     print("FILE %s ALREADY EXISTS. CONTINUE?" % out_path)
-            #     input()
-
-            # write to file
-            with open(out_path,'w') as f:
-                for line in lines:
-                    write_line = "%d %0.4f %0.4f %0.4f %0.4f"%line
-                    # print(write_line)
-                    f.write("%s\n"%write_line)
-        
-            
-                    
+        try:
+            for key, item in COCOStream(data_path).items(["categories", "images", "annotations"]):
+                if key == "categories":
+                    categories.append(item["name"])
+                elif key == "images":
+                    img_names.append(item["file_name"])
+                    img_size.append([item["width"], item["height"]])
+                else:
+                    im_idx = int(item["image_id"])-1
+                    seg = item["segmentation"]
+                    # the mask is only kept for --format seg
+                    # polygons take the size of their image at flush, images may come after the annotations
+                    annot = (im_idx, int(item["category_id"])-1, item["bbox"], seg["size"] if isinstance(seg, dict) else None,
+                             seg if self.fmt == "seg" else None)
+                    counts[annot[1]] = counts.get(annot[1], 0) + 1
+                    if classes is None and len(categories) > 0 and len(img_names) > 0:
+                        classes = {k:v for k,v in enumerate(categories)}
+                        remap = self.class_remap(classes)
+                        out_folder = self.prepare_output(classes, loop, out_folder)
+                    if classes is None:
+                        # categories/images not read yet, keep the annotation (without its mask unless --format seg)
+                        pending.append(annot)
+                        continue
+                    for im_idx, idx_class, bbx, sz, seg in pending + [annot]:
+                        if im_idx != cur_idx:
+                            flush()
+                            cur_idx = im_idx
+                            cur_lines = []
+                        cur_lines.append((self.map_class(classes, remap, idx_class), bbx, sz, seg))
+                    pending = []
+        except (KeyError, TypeError, ValueError) as error:
+            print(error)
+            sys.exit("ERROR: json file in wrong format - check it is downloaded from CVAT in COCO 1.0 format, from Segment Anything mask labels. ")
+
+        if classes is None:
+            classes = {k:v for k,v in enumerate(categories)}
+            remap = self.class_remap(classes)
+            out_folder = self.prepare_output(classes, loop, out_folder)
+        for im_idx, idx_class, bbx, sz, seg in pending:
+            if im_idx != cur_idx:
+                flush()
+                cur_idx = im_idx
+                cur_lines = []
+            cur_lines.append((self.map_class(classes, remap, idx_class), bbx, sz, seg))
+        flush()
+
+        # images with no annotations get an empty label file
+        for i, name in enumerate(img_names):
+            if i not in written:
+                self.write_lines(os.path.join(out_folder,self.label_name(name)), "")
+
+        summary = self.label_summary(classes, img_names, [], [], {})
+        for idx_class, n in counts.items():
+            summary[classes[idx_class]] += n
+        return [self.label_name(name) for name in img_names], summary
+
+    def class_remap(self, classes):
+        # table of {class index in this json: class id in all_classes_dict}
+        # None if there is no all_classes_dict (class indexes are written as they are)
+        # classes missing from all_classes_dict map to None
+        if len(self.all_classes_dict.keys()) < 1:
+            return None
+
+        # first id for each name, as list.index() would find
+        name_to_id = {}
+        for k, v in self.all_classes_dict.items():
+            if v not in name_to_id:
+                name_to_id[v] = k
+        return {idx: name_to_id.get(name) for idx, name in classes.items()}
 
     def label_summary(self, classes, img_names, img_ids, cls, summary_dict):
         #print(classes, img_names, cls)
@@ -233,6 +454,65 @@ class COCO2YOLOBB():
         #print(cls)
         #input()
     
+    def convert_json(self, data_path, loop, out_folder=None):
+        # convert one json file, returns (label file names written, class summary of this json)
+        if self.stream:
+            return self.write_txt_stream(data_path, loop, out_folder)
+
+        try:
+            f = open(data_path)
+            data = json.load(f)
+        except:
+            print("ERROR: json failed to load")
+        # extract the info
+        classes, img_names, cls, img_ids, bbxs, im_sz = self.get_info(data)
+
+        ## For the first run, also generates the output folder and yaml files
+        if self.fmt == "seg":
+            written = self.write_seg_txt(classes, img_names, cls, img_ids, self.get_segs(data), bbxs, im_sz, loop, out_folder)
+        else:
+            written = self.write_txt(classes, img_names, cls, img_ids, bbxs, im_sz, loop, out_folder)
+
+        ## Label summary
+        summary = self.label_summary(classes, img_names, img_ids, cls, {})
+        return written, summary
+
+    def run_parallel(self, all_in, merge):
+        # convert the jsons in a process pool, each into its own staging folder
+        # files are then moved into all_labels in json order, so later jsons overwrite earlier ones exactly as in the serial loop
+
+        # output folder and yaml files come from the first json, as in the serial loop
+        categories = [category["name"] for key, category in COCOStream(all_in[0]).items(["categories"])]
+        out_folder = self.prepare_output({k:v for k,v in enumerate(categories)}, 0)
+
+        staging = [os.path.join(self.save_location, ".staging_%i"%i) for i in range(len(all_in))]
+        for folder in staging:
+            os.makedirs(folder, exist_ok=True)
+        jobs = [(self.save_location, self.classes_dict_path, self.stream, self.fmt, self.epsilon, data_path, staging[i])
+                for i, data_path in enumerate(all_in)]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # results come back in json order
+            for i, (written, summary, dropped) in enumerate(pool.map(convert_worker, jobs)):
+                self.dropped += dropped
+                for name in dict.fromkeys(written):
+                    os.replace(os.path.join(staging[i], name), os.path.join(out_folder, name))
+                shutil.rmtree(staging[i])
+                merge(i, written, summary)
+                print("Converted %s (%i/%i)"%(all_in[i], i+1, len(all_in)))
+
+    def write_collisions(self, collisions):
+        # report label files written by more than one json, the later json is kept
+        if len(collisions) == 0:
+            return
+        csv_path = os.path.join(self.save_location,"label_collisions.csv")
+        print("WARNING: %i label files were written by more than one json, see %s"%(len(collisions), csv_path))
+        with open(csv_path, 'w') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(["label", "kept_from", "overwritten_from"])
+            for name, earlier, later in collisions:
+                writer.writerow([name, later, earlier])
+
     def run(self):
 
 
@@ -242,48 +522,53 @@ class COCO2YOLOBB():
             all_in.append(self.in_files) # glob.glob(self.in_files+'Labels/*/*/*.json')
         else:
             try:
-                all_in = glob.glob(self.in_files)
+                # sorted so the order jsons overwrite each other does not depend on the filesystem
+                all_in = sorted(glob.glob(self.in_files))
             except:
                 print("ERROR: regex to multiple jsons failed")
 
-
         summary_dict = {}
-        # For each json file
-        for i,data_path in enumerate(all_in):
-            #print(all_in)
-            # print(data_path)
-            try:
-                f = open(data_path)
-                data = json.load(f)
-            except:
-                print("ERROR: json failed to load")
-            # extract the infoi
-            #print(self.classes_dict)
-            classes, img_names, cls, img_ids, bbxs, im_sz = self.get_info(data)
-            #print(classes)
-            #input()
-            # print(classes)
-            # print(img_names)
-            # input()
-            ## For the first run, generate the class merger file            
-
-            self.write_txt(classes, img_names, cls, img_ids, bbxs, im_sz, i)
+        # json that last wrote each label file, and label files written by more than one json
+        owners = {}
+        collisions = []
+
+        def merge(i, written, summary):
+            # merged in json order, so the serial and parallel runs give the same summary and report
+            for name in written:
+                if name in owners and owners[name] != i:
+                    collisions.append((name, all_in[owners[name]], all_in[i]))
+                owners[name] = i
+            for key, value in summary.items():
+                summary_dict[key] = summary_dict.get(key, 0) + value
+
+        if self.workers > 1 and len(all_in) > 1:
+            self.run_parallel(all_in, merge)
+        elif self.workers > 1 and self.fmt == "seg":
+            # a single json: decode its masks in the process pool instead
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                self.pool = pool
+                for i,data_path in enumerate(all_in):
+                    written, summary = self.convert_json(data_path, i)
+                    merge(i, written, summary)
+            self.pool = None
+        else:
+            # For each json file
+            for i,data_path in enumerate(all_in):
+                written, summary = self.convert_json(data_path, i)
+                merge(i, written, summary)
 
-            
-            ## Label summary
-            #summary_dict = self.label_summary(classes, img_names, img_ids, cls, summary_dict)
-        
         self.write_label_summary(summary_dict) 
-            
-            ## Use this section to move the images that are referenced in the jsons 
-            # for img_name in img_names:
-            #     src = os.path.join(images_path,img_name)
-            #     if os.path.isfile(src):
-            #         dest = os.path.join(self.save_location,"training/all_images",img_name)
-            #         shutil.copy2(src,dest)
-            #     else: print("not a file", src)
-        
-        # print(summary_dict)
+        self.write_collisions(collisions)
+        if self.dropped > 0:
+            print("WARNING: %i annotations had an empty mask or polygon and were not written"%self.dropped)
+
+
+def convert_worker(job):
+    # process pool entry point, converts one json into a staging folder
+    save_location, classes_dict, stream, fmt, epsilon, data_path, out_folder = job
+    converter = COCO2YOLOBB(None, save_location, classes_dict, stream, fmt=fmt, epsilon=epsilon)
+    written, summary = converter.convert_json(data_path, 1, out_folder)
+    return written, summary, converter.dropped
 
 def arg_parse():
     parser = argparse.ArgumentParser(description='Convert from COCO SAM annotation to YOLO format')
@@ -297,6 +582,26 @@ def arg_parse():
     parser.add_argument("--classes", dest = "classes_dict",
             help = "Path to all_classes yaml file", 
             default = None, type = str, required=False)
+
+    parser.add_argument("--stream", dest = "stream",
+            help = "Read the json files incrementally to keep memory low for very large exports", 
+            action = "store_true")
+
+    parser.add_argument("--workers", dest = "workers",
+            help = "Number of processes converting json files in parallel (or decoding masks of a single json with --format seg). Default 1", 
+            default = 1, type = int)
+
+    parser.add_argument("--format", dest = "fmt",
+            help = "Label format: bbox (YOLO bounding boxes) or seg (YOLO segmentation polygons from the masks). Default bbox", 
+            default = "bbox", choices = FORMATS, type = str)
+
+    parser.add_argument("--epsilon", dest = "epsilon",
+            help = "--format seg only. Polygon simplification tolerance in pixels, 0 keeps every contour point. Default 1.5", 
+            default = 1.5, type = float)
+
+    parser.add_argument("--yes", dest = "yes",
+            help = "Overwrite existing labels and yaml files without asking", 
+            action = "store_true")
     return parser.parse_args()
 
 
@@ -305,7 +610,7 @@ def main():
 
     #json_file = input("Path to JSON file or regex to files: ")
     #save_location = input("Path to save labels: ")
-    test = COCO2YOLOBB(args.json_file, args.save_location, args.classes_dict)
+    test = COCO2YOLOBB(args.json_file, args.save_location, args.classes_dict, args.stream, args.workers, args.fmt, args.epsilon, args.yes)
     test.run()
     print("DONE")
 
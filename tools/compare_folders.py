@@ -8,6 +8,7 @@ import glob
 import shutil
 import os
 import argparse
+from pairing import PairIndex, index_folder, index_paths
 
 
 parser = argparse.ArgumentParser(description='Move images in folder that do not match any labels')
@@ -26,27 +27,16 @@ labels = args.label_folder
 copy_folder = args.out_folder
 
 
-def get_name_from_path(path:str, end:bool):
-        name = path.split('/')[-1]
-        if end:
-            return name
-        base = name[0:name.rfind('.')]
-        return base
-
-match = False
-all_ims = sorted(glob.glob(images))
-all_labs = sorted(glob.glob(labels))
-num_labels = len(all_labs)
-print(len(all_ims))
-for j,im in enumerate(all_ims):
-    print(j)
-    for i,lab in enumerate(all_labs):
-        if get_name_from_path(path=im, end=False) == get_name_from_path(path=lab, end=False):
-            # print("true")
-            # input()
-            match = True
-            break
-        if i == num_labels-1 and match == False:
-            shutil.move(im, os.path.join(copy_folder, get_name_from_path(path=im, end=True)))
-            print("NO MATCH: ", im)
-        match = False
+def index_arg(path):
+    # a folder is read in one pass, a glob (ex. folder/*.jpg) keeps its filter and indexes the files it matches
+    if os.path.isdir(path):
+        return index_folder(path)
+    return index_paths(p for p in glob.glob(path) if os.path.isfile(p))
+
+# images with no label stem are moved
+index = PairIndex(None, None, label_ext=None, images=index_arg(images), labels=index_arg(labels))
+index.report(orphans=False)
+for stem in index.orphan_images():
+    for im in index.images[stem]:
+        shutil.move(im, os.path.join(copy_folder, os.path.basename(im)))
+        print("NO MATCH: ", im)
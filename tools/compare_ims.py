@@ -6,9 +6,9 @@ Written by: Serena Mou
 Date:       17/9/25
 '''
 
-import glob
 import os
 import argparse
+from pairing import PairIndex, index_folder, get_first_stem
 
 parser = argparse.ArgumentParser(description='Compare labels to images and print labels with no matching image')
  
@@ -18,35 +18,12 @@ parser.add_argument("--label_folder", dest = "label_folder",
         help = "Path to folder of labels", default = None, type = str)
 args = parser.parse_args()
 
-sub_ims = glob.glob(os.path.join(args.image_folder,'*'))
-all_labels = glob.glob(os.path.join(args.label_folder,'*.txt'))
-
-print("Number of images: ",len(sub_ims))
-print("Number of labels: ",len(all_labels))
-
-label_list = []
-im_list = []
-for label in all_labels:
-    label_name = label.split('/')[-1]
-    
-    label_name = label_name.split('.')[0]
-    # print(label_name)
-    label_list.append(label_name)
-
-for i,im in enumerate(sub_ims):
-    # match
-    im = str(im)
-    im_name_ex = im.split('/')[-1]
-    im_name = im_name_ex.split('.')[0]
-    im_list.append(im_name)
-
-#print(label_list)
-#print(im_list)
-not_im = []
-
-for label in label_list:
-    if label not in im_list:
-        not_im.append(label)
+# index images and labels once by the name up to the first dot, as this script always matched them
+images = index_folder(args.image_folder, stem_fn=get_first_stem)
+labels = index_folder(args.label_folder, ".txt", stem_fn=get_first_stem)
+index = PairIndex(args.image_folder, args.label_folder, images=images, labels=labels)
+index.report(orphans=False)
+not_im = index.orphan_labels()
 
 
 print("Labels with no image match:")
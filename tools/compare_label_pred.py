@@ -15,7 +15,6 @@ import os
 import yaml
 import glob
 import sys
-from ultralytics import YOLO
 
 def arg_parse():
     """
@@ -37,6 +36,8 @@ def arg_parse():
             help = "Save ims or just view. Default False", default = False, type = bool)
     parser.add_argument("--model", dest = "model", 
             help = "Model path for predictions", type = str)
+    parser.add_argument("--server", dest = "server",
+            help = "URL of a running examples/inference_server.py to run the model on. Default load the model here", default = None, type = str)
 
 
     return parser.parse_args()
@@ -86,8 +87,14 @@ def main():
         save_path_pred = os.path.join(args.src,"vis_output","model")
         os.makedirs(save_path_pred, exist_ok=True)
 
-    # load model
-    model = YOLO(args.model)
+    # load model, or a client of a running inference server which has the same predict()
+    if args.server is not None:
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples"))
+        from inference_client import InferenceClient
+        model = InferenceClient(args.server, args.model)
+    else:
+        from ultralytics import YOLO
+        model = YOLO(args.model)
     
     # for each label
     # for label in labels:
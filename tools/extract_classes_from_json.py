@@ -18,10 +18,11 @@ import glob
 import csv
 import sys
 import argparse
+from coco_stream import COCOStream
 
 
 class COCO2LIST():
-    def __init__(self, json_file, save_location, new_cls):
+    def __init__(self, json_file, save_location, new_cls, stream=False):
 
         # load in the json file
         #json_file = "/home/serena/Data/SCTLD/RAW/1_100/annotations/instances_default.json" 
@@ -31,6 +32,9 @@ class COCO2LIST():
         self.in_files = json_file #"/home/serena/Data/SCTLD/RAW/"
         self.save_location = save_location #"/home/serena/Data/SCTLD/Processed/"
         self.new_cls = new_cls.split(",")
+        # read only the categories of each json incrementally instead of json.load
+        self.stream = stream
+
     def get_info(self, data):
 
         # given the json file, return lists of:
@@ -79,15 +83,17 @@ class COCO2LIST():
             except:
                 print("ERROR: regex to multiple jsons failed")
         for i,data_path in enumerate(all_in):
-            #print(all_in)
-            # print(data_path)
-            try:
-                f = open(data_path)
-                data = json.load(f)
-            except:
-                print("ERROR: json failed to load")
-            # extract the info
-            classes, img_names, cls, img_ids, bbxs, im_sz = self.get_info(data)
+            if self.stream:
+                # categories come before images/annotations in CVAT exports, reading stops after them
+                classes = [category["name"] for key, category in COCOStream(data_path).items(["categories"])]
+            else:
+                try:
+                    f = open(data_path)
+                    data = json.load(f)
+                except:
+                    print("ERROR: json failed to load")
+                # extract the info
+                classes, img_names, cls, img_ids, bbxs, im_sz = self.get_info(data)
 
             for cls in classes:
                 if cls not in all_classes.values():
@@ -135,6 +141,10 @@ def arg_parse():
             help = "The class names to be merged to, separated by commas. Ex: cls0,cls1,cls2", 
             default = None, type = str, required=False)
 
+    parser.add_argument("--stream", dest = "stream",
+            help = "Read only the categories of each json incrementally, for very large exports", 
+            action = "store_true")
+
     return parser.parse_args()
 
 
@@ -143,7 +153,7 @@ def main():
 
     #json_file = input("Path to JSON file or regex to files: ")
     #save_location = input("Path to save labels: ")
-    test = COCO2LIST(args.json_file, args.save_location, args.new_cls)
+    test = COCO2LIST(args.json_file, args.save_location, args.new_cls, args.stream)
     test.run()
     print("DONE")
 
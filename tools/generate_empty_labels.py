@@ -8,10 +8,9 @@ Date:       16/12/25
 '''
 
 
-import glob
 import os
 import argparse
-import shutil
+from pairing import PairIndex
 
 def arg_parse():
     """
@@ -32,31 +31,8 @@ def arg_parse():
 def main():
     args = arg_parse()
 
-    all_images = glob.glob(os.path.join(args.img_folder,'*'))
-    all_labels = glob.glob(os.path.join(args.label_folder,'*'))
-       
-           
-    label_list = []
-    for label in all_labels:
-        label_name = label.split('/')[-1]
-        idx = label_name.rfind('.') 
-        label_name = label_name[0:idx]
-        # print(label_name)
-        label_list.append(label_name)      
-        # get matching image
-    
-    # For each image
-    for img in all_images:
-        # check if there's a matching label
-        # image name
-        img_name = img.split('/')[-1]
-        dot_idx = img_name.rfind('.')
-        img_name = img_name[0:dot_idx]
-        # if not
-        # full label path
-        if img_name not in label_list:
-            empty_label = os.path.join(args.label_folder, img_name+".txt")
-            open(empty_label, 'a').close()
-            continue
+    # index images and labels once by file stem, label every image with no label file
+    index = PairIndex(args.img_folder, args.label_folder, label_ext=None)
+    index.create_empty_labels(verbose=False)
 if __name__=='__main__':
     main()
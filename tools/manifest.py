@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Persistent dataset manifest, saved as manifest.sqlite next to data.yaml (in the dataset root).
+Records stem, size, mtime, content hash and the parsed class histogram of every file in all_images/all_labels.
+On each run only files whose size or mtime changed are re-read, so an unchanged dataset only costs a stat per file.
+Also keeps the split of every image for the split scripts run with --assign hash.
+
+Example use:
+python tools/manifest.py --src /Dataset
+===
+
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pairing import scan_folder, index_paths, get_stem, PairIndex
+
+MANIFEST_NAME = "manifest.sqlite"
+HASH_CHUNK = 1 << 20
+
+
+def hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path):
+    # content hash of a file, read in chunks so large images are not held in memory
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        chunk = f.read(HASH_CHUNK)
+        while chunk:
+            h.update(chunk)
+            chunk = f.read(HASH_CHUNK)
+    return h.hexdigest()
+
+
+def parse_classes(text):
+    # class histogram {class id: count} of a YOLO label file, in order of first appearance
+    # returns None if a line does not start with an integer class id
+    hist = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if len(line) == 0:
+            continue
+        first_space = line.find(" ")
+        try:
+            cls = int(line if first_space == -1 else line[0:first_space])
+        except ValueError:
+            return None
+        hist[cls] = hist.get(cls, 0) + 1
+    return hist
+
+
+def read_entry(kind, path):
+    # (hash, class histogram as json) for one file
+    if kind == "labels":
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            hist = parse_classes(data.decode())
+        except UnicodeDecodeError:
+            hist = None
+        return hash_bytes(data), (json.dumps(hist) if hist is not None else None)
+    return hash_file(path), None
+
+
+class DatasetManifest():
+    def __init__(self, src, img_folder="all_images", label_folder="all_labels", db_path=None, workers=8):
+
+        self.src = src
+        self.folders = {
+            "images": os.path.join(src, img_folder),
+            "labels": os.path.join(src, label_folder)
+        }
+        self.db_path = db_path if db_path is not None else os.path.join(src, MANIFEST_NAME)
+        self.workers = workers
+        # {kind: {name: (stem, size, mtime_ns, hash, classes json)}}, filled by refresh()
+        self.rows = {"images": {}, "labels": {}}
+
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS files (
+                kind TEXT NOT NULL,
+                name TEXT NOT NULL,
+                stem TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                classes TEXT,
+                PRIMARY KEY (kind, name))""")
+        # split of each image stem and the files (and their hashes) placed in it, for --assign hash
+        self.db.execute("""CREATE TABLE IF NOT EXISTS splits (
+                stem TEXT PRIMARY KEY,
+                split TEXT NOT NULL,
+                image TEXT NOT NULL,
+                label TEXT NOT NULL,
+                image_hash TEXT NOT NULL,
+                label_hash TEXT NOT NULL,
+                mode TEXT NOT NULL)""")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def refresh(self, verbose=True):
+        # rescan both folders and bring the manifest up to date
+        # returns {"unchanged": n, "updated": n, "removed": n}
+        stats = {"unchanged": 0, "updated": 0, "removed": 0}
+
+        for kind, folder in self.folders.items():
+            known = {}
+            for name, stem, size, mtime_ns, h, classes in self.db.execute(
+                    "SELECT name, stem, size, mtime_ns, hash, classes FROM files WHERE kind=?", (kind,)):
+                known[name] = (stem, size, mtime_ns, h, classes)
+
+            current = {}
+            changed = []
+            for entry in scan_folder(folder):
+                st = entry.stat()
+                row = known.get(entry.name)
+                if row is not None and row[1] == st.st_size and row[2] == st.st_mtime_ns:
+                    current[entry.name] = row
+                else:
+                    changed.append((entry.name, entry.path, st.st_size, st.st_mtime_ns))
+
+            # re-read only the new or modified files
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                read = pool.map(lambda c: read_entry(kind, c[1]), changed)
+                updates = []
+                for (name, path, size, mtime_ns), (h, classes) in zip(changed, read):
+                    row = (get_stem(name), size, mtime_ns, h, classes)
+                    current[name] = row
+                    updates.append((kind, name) + row)
+
+            removed = [(kind, name) for name in known if name not in current]
+
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?)", updates)
+            self.db.executemany("DELETE FROM files WHERE kind=? AND name=?", removed)
+            self.rows[kind] = current
+
+            stats["unchanged"] += len(current) - len(updates)
+            stats["updated"] += len(updates)
+            stats["removed"] += len(removed)
+
+        self.db.commit()
+        if verbose:
+            print("Manifest %s: %i unchanged, %i updated, %i removed"%(
+                self.db_path, stats["unchanged"], stats["updated"], stats["removed"]))
+        return stats
+
+    def update_files(self, kind, paths):
+        # record files written after refresh() (ex. empty labels for unlabelled images)
+        updates = []
+        for path in paths:
+            name = os.path.basename(path)
+            st = os.stat(path)
+            h, classes = read_entry(kind, path)
+            row = (get_stem(name), st.st_size, st.st_mtime_ns, h, classes)
+            self.rows[kind][name] = row
+            updates.append((kind, name) + row)
+        self.db.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?,?,?)", updates)
+        self.db.commit()
+
+    def pair_index(self, label_ext=None):
+        # PairIndex of the manifest contents, without scanning the folders again
+        def paths(kind, ext=None):
+            folder = self.folders[kind]
+            return index_paths(os.path.join(folder, name) for name in self.rows[kind]
+                               if ext is None or name.endswith(ext))
+        return PairIndex(self.folders["images"], self.folders["labels"], label_ext=label_ext,
+                         images=paths("images"), labels=paths("labels", label_ext))
+
+    def size(self, kind, name):
+        return self.rows[kind][name][1]
+
+    def file_hash(self, kind, name):
+        return self.rows[kind][name][3]
+
+    def is_empty(self, label_name):
+        return self.rows["labels"][label_name][1] == 0
+
+    def classes(self, label_name):
+        # class histogram {class id: count} of a label file, None if it could not be parsed
+        classes = self.rows["labels"][label_name][4]
+        if classes is None:
+            return None
+        return {int(k): v for k, v in json.loads(classes).items()}
+
+    def split_rows(self):
+        # {stem: (split, image name, label name, image hash, label hash, mode)} as last placed
+        return {row[0]: row[1:] for row in self.db.execute(
+            "SELECT stem, split, image, label, image_hash, label_hash, mode FROM splits")}
+
+    def update_splits(self, rows, removed):
+        # rows: {stem: (split, image name, label name, image hash, label hash, mode)}, removed: stems to forget
+        self.db.executemany("DELETE FROM splits WHERE stem=?", [(stem,) for stem in removed])
+        self.db.executemany("INSERT OR REPLACE INTO splits VALUES (?,?,?,?,?,?,?)", [(stem,) + tuple(row) for stem, row in rows.items()])
+        self.db.commit()
+
+    def clear_splits(self):
+        # forget all placements, after the split folders or list files were rebuilt without --assign hash
+        self.db.execute("DELETE FROM splits")
+        self.db.commit()
+
+    def class_totals(self):
+        # {class id: [number of instances, number of images]} over all label files
+        totals = {}
+        for name in self.rows["labels"]:
+            hist = self.classes(name)
+            if hist is None:
+                continue
+            for cls, n in hist.items():
+                if cls not in totals:
+                    totals[cls] = [0, 0]
+                totals[cls][0] += n
+                totals[cls][1] += 1
+        return totals
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Build or refresh the manifest.sqlite of a dataset')
+
+    parser.add_argument("--src", dest = "src",
+            help = "Dataset root folder, expects /src/all_images, /src/all_labels", default = None, type = str, required=True)
+    parser.add_argument("--workers", dest = "workers",
+            help = "Number of threads to hash new or changed files. Default 8", default = 8, type = int)
+
+    return parser.parse_args()
+
+
+def main():
+    args = arg_parse()
+    if not os.path.isdir(args.src):
+        sys.exit("ERROR: %s does not exist"%args.src)
+
+    manifest = DatasetManifest(args.src, workers=args.workers)
+    manifest.refresh()
+    manifest.pair_index().report()
+
+    print("\nclass, instances, images")
+    for cls, (n, n_ims) in sorted(manifest.class_totals().items()):
+        print("%i, %i, %i"%(cls, n, n_ims))
+    manifest.close()
+
+if __name__=='__main__':
+    main()
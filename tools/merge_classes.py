@@ -6,6 +6,10 @@ Created:  16 October 2024
 
 ===
 Merges classes with a class_merger.yaml for labels that are in YOLO format
+Label files are remapped in parallel with a lookup table of old class -> new class. Every file is written to a
+temporary file first and only renamed over the output once all files have been remapped without error,
+so a class missing from the merger leaves the labels untouched. Each file is replaced whole, but the renames are
+not one operation: if the script is killed while renaming, some labels are merged and the rest are not.
 ===
 
 """
@@ -15,9 +19,12 @@ import yaml
 import glob
 import sys
 import argparse
+import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 class mergeClasses():
-    def __init__(self, labels_in, save, merge_file, data_file, new_cls, use_case):
+    def __init__(self, labels_in, save, merge_file, data_file, new_cls, use_case, workers=8, yes=False):
 
         self.labels_in = labels_in
         self.save = save
@@ -40,6 +47,10 @@ class mergeClasses():
             except:
                 sys.exit("--newclasses argument incorrectly formated. See README for more info")
         self.use_case = use_case
+        # number of threads remapping label files
+        self.workers = workers
+        # answer yes to overwrite prompts (for run_pipeline.py)
+        self.yes = yes
 
     def write_class_merger(self):
         print("Generating a class_merger.yaml file with data from %s and the new classes, [%s]\n"%(self.data_file, self.new_cls_dict))
@@ -47,7 +58,7 @@ class mergeClasses():
         # for the purpose of merging classes 
         yaml_path = os.path.join(self.save,"class_merger.yaml")
         if os.path.isdir(yaml_path):
-            ow = input("File %s already exists. Overwrite? Y/N")
+            ow = "y" if self.yes else input("File %s already exists. Overwrite? Y/N")
             if ow.lower() == "y":
                 print("Overwriting class_merger.yaml")
             else:
@@ -77,7 +88,7 @@ class mergeClasses():
             with open(self.merge_file, 'r') as stream:
                 data_loaded = yaml.safe_load(stream)
 
-            to_merge = data_loaded['old_classes']
+            to_merge = data_loaded['old_classes'] or {}
             new_classes = data_loaded['new_classes']
         except:
             sys.exit("%s failed to load. Check the file path and that \"old_classes\" and \"new_classes\" are present. If not, see README for correct class_merger.yaml format") 
@@ -97,6 +108,51 @@ class mergeClasses():
         #input()
         return new_class_mapping
     
+    def build_lut(self, mapping):
+        # dense lookup table, lut[old class] = new class, -1 for old classes not in the mapping
+        if not any(len(olds) > 0 for olds in mapping.values()):
+            sys.exit("ERROR: %s maps no old classes to new classes. See README for the class_merger.yaml format"%self.merge_file)
+        old_max = max(int(old_cls) for olds in mapping.values() for old_cls in olds)
+        lut = np.full(old_max+1, -1, dtype=np.int64)
+        for new_cls, olds in mapping.items():
+            for old_cls in olds:
+                lut[int(old_cls)] = new_cls
+        return lut
+
+    def remap_text(self, text, lut):
+        # new contents of a label file, the class id of every line is replaced in one lookup
+        # returns (text, None), or (None, first unmapped old class) if a class is not in the mapping
+        lines = [line for line in text.splitlines(True) if line.strip()]
+        if len(lines) == 0:
+            return "", None
+        parts = [line.partition(" ") for line in lines]
+        try:
+            old = np.array([part[0] for part in parts]).astype(np.int64)
+        except ValueError:
+            return None, [part[0] for part in parts if not part[0].lstrip('-').isdigit()][0]
+        valid = (old >= 0) & (old < len(lut))
+        new = np.where(valid, lut[np.where(valid, old, 0)], -1)
+        missing = np.flatnonzero(new < 0)
+        if len(missing) > 0:
+            return None, int(old[missing[0]])
+        return "".join("%d %s"%(cls, part[2]) for cls, part in zip(new.tolist(), parts)), None
+
+    def remap_to_temp(self, label, out_folder, lut, mode):
+        # remap one label file into a temporary file in out_folder, with the permissions the output would get
+        # (those of the file it replaces, or mode for a new file) as mkstemp files are only readable by the owner
+        # returns (temp path, final path, None) or (None, None, unmapped old class)
+        with open(label, "r") as f:
+            text, missing = self.remap_text(f.read(), lut)
+        if text is None:
+            return None, None, missing
+        save_name = os.path.basename(label)
+        fd, tmp_path = tempfile.mkstemp(prefix="."+save_name, suffix=".tmp", dir=out_folder)
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        save_out = os.path.join(out_folder,save_name)
+        os.chmod(tmp_path, os.stat(save_out).st_mode & 0o7777 if os.path.exists(save_out) else mode)
+        return tmp_path, save_out, None
+
     def change_classes(self, mapping):
         
         # location to save labels
@@ -105,41 +161,40 @@ class mergeClasses():
         if not os.path.isdir(out_folder):
             os.mkdir(out_folder)
         else:
-            ow = input("WARNING: %s folder already exists. Overwrite contents? Y/N "%out_folder)
+            ow = "y" if self.yes else input("WARNING: %s folder already exists. Overwrite contents? Y/N "%out_folder)
             if ow.lower() == "y":
                 print("Overwriting..")
             else:
                 sys.exit("ERROR: --save path already exists and overwrite NOT selected. Choose different --save path.")
         # add all labels to list
-        labels_in = glob.glob(os.path.join(self.labels_in,"*.txt"))
-
-        # for each label, open file, load each line, change first value based on mapping
-        for label in labels_in:
-            # grab just the file name
-            save_name = label.split('/')[-1]
-            
-            new_lines = []
-            f = open(label, "r")
-            for line in f:
-                # get first val
-                first_space = line.find(" ")
-                old_cls = int(line[0:first_space])
-                new_cls = None
-                for map_new in mapping:
-                    if old_cls in mapping[map_new]:
-                        new_cls = map_new
-                    else:
-                        continue
-                
-                if new_cls == None:
-                    print(old_cls)
-                    sys.exit("ERROR: Class merge error. Old class not found in %s"%label)
-                new_lines.append("%s %s"%(str(new_cls),line[first_space+1:]))
-
-            save_out = os.path.join(out_folder,save_name)
-            with open(save_out, "w") as f:
-                for line in new_lines:
-                    f.write(line)
+        labels_in = sorted(glob.glob(os.path.join(self.labels_in,"*.txt")))
+        lut = self.build_lut(mapping)
+        # mode of a newly created file, 0666 less the umask
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+        # remap every label into a temporary file first, nothing in out_folder is replaced until all have succeeded
+        temps = []
+        failed = None
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            for label, (tmp_path, save_out, missing) in zip(labels_in, pool.map(lambda l: self.remap_to_temp(l, out_folder, lut, mode), labels_in)):
+                if tmp_path is None:
+                    if failed is None:
+                        failed = (label, missing)
+                else:
+                    temps.append((tmp_path, save_out))
+
+        if failed is not None:
+            for tmp_path, save_out in temps:
+                os.remove(tmp_path)
+            print(failed[1])
+            sys.exit("ERROR: Class merge error. Old class not found in %s. No labels were changed"%failed[0])
+
+        # rename over the outputs, each label is replaced whole
+        for tmp_path, save_out in temps:
+            os.replace(tmp_path, save_out)
+        print("Merged classes in %i label files"%len(temps))
 
 
     def write_yaml(self):
@@ -149,14 +204,14 @@ class mergeClasses():
         # dictionary of {0: class0, 1: class1...}
 
         if os.path.isfile(yaml_path):
-            ow = input("data.yaml already exists at %s. Overwrite? Y/N "%(yaml_path))
+            ow = "y" if self.yes else input("data.yaml already exists at %s. Overwrite? Y/N "%(yaml_path))
             if ow.lower() == "y":
                 print("Overwriting data.yaml")
             else:
                 sys.exit("ERROR: Not overwriting data.yaml. Please select different save path without exisiting yaml file.")
         
         if os.path.isfile(test_yaml_path):
-            ow = input("test.yaml already exists at %s. Overwrite? Y/N "%(test_yaml_path))
+            ow = "y" if self.yes else input("test.yaml already exists at %s. Overwrite? Y/N "%(test_yaml_path))
             if ow.lower() == "y":
                 print("Overwriting test.yaml")
             else:
@@ -220,13 +275,25 @@ def arg_parse():
     parser.add_argument("--merge", dest = "merge_file",
             help = "Path to merge yaml file", 
             default = None, type = str, required=False)
+
+    parser.add_argument("--workers", dest = "workers",
+            help = "Number of threads remapping label files. Default 8", 
+            default = 8, type = int)
+
+    parser.add_argument("--use_case", dest = "use_case",
+            help = "G to generate a merger file or M to merge classes, instead of being asked", 
+            default = None, type = str, required=False)
+
+    parser.add_argument("--yes", dest = "yes",
+            help = "Overwrite existing labels and yaml files without asking", 
+            action = "store_true")
     
     return parser.parse_args()
 
 
 def main():
     args = arg_parse()
-    use_case = input("Do you need to generate a merger file (G) or merge classes from existing class_merger.yaml (M)? G/M? ")
+    use_case = args.use_case if args.use_case is not None else input("Do you need to generate a merger file (G) or merge classes from existing class_merger.yaml (M)? G/M? ")
     # generating a merger file
     if use_case.lower() == "g":
         # check for new class list and data.yaml of classes
@@ -256,7 +323,7 @@ def main():
     
     else:
         sys.exit("Please type G to generate a class_merger.yaml file or M to merge labels from an existing class_merger.yaml file")
-    mc = mergeClasses(labels_in, save, merge_file, data, new_cls, use_case)
+    mc = mergeClasses(labels_in, save, merge_file, data, new_cls, use_case, args.workers, args.yes)
     mc.run()
     print("\nDONE")
 if __name__=='__main__':
@@ -9,10 +9,9 @@ Date:       12/9/25
 
 
 import shutil
-import glob
 import os
-import re
 import argparse
+from pairing import PairIndex
 
 parser = argparse.ArgumentParser(
         description='Copy paste only image/label pairs with specific classes')
@@ -36,22 +35,21 @@ parser.add_argument("--save", dest = "save",
 
 args = parser.parse_args()
 
-all_im = glob.glob(os.path.join(args.images_in,'*'))
-labels = glob.glob(os.path.join(args.labels_in,'*.txt'))
+# index images and labels once by file stem
+index = PairIndex(args.images_in, args.labels_in)
+index.report(orphans=False)
 
 out = args.save
 copy_cls = args.classes.split(',')
 
 count_copy = 0
 count = 0
-print(len(all_im))
-print(len(labels))
 os.makedirs(os.path.join(out,"images"),exist_ok=True)
 os.makedirs(os.path.join(out,"labels"),exist_ok=True)
 
-# input()
-for label in labels:
-    label_name = label.split('/')[-1]
+for stem in sorted(index.labels):
+    label = index.label(stem)
+    label_name = os.path.basename(label)
     f = open(label,"r")
     for line in f:
         line.rstrip()
@@ -63,38 +61,17 @@ for label in labels:
         count_copy += 1
     else:
         continue  
-    label_name_ex = label_name[:-4]
-    # print(label_name)
-
-    for i,im in enumerate(all_im):
-        # match
-        im = str(im)
-        im_name = im.split('/')[-1]
-        # print(str(im_name))
-        period_idx = str(im_name).rfind(".")
-        if period_idx != -1:
-            im_name_ex = im_name[:int(period_idx)]
-        else:
-            print("ERROR BAD")
-
-        # im_name = im_name_ex.split('.')[0]
-        
-        if label_name_ex == im_name_ex:    
-        #if bool(re.match(label_name_ex,im_name_ex)) == True:
-            im_out = os.path.join(out,"images",im_name)
-            label_out = os.path.join(out,"labels",label_name)
-            #print(im,label)
-            #print(im_out, label_out) 
-            shutil.copy(im,im_out)
-            shutil.copy(label, label_out)
-            count +=1
-            #im_name == label_name:
-            # print("found", im)
-            #break
-            # print(os.path.join(out,im_name_ex))
-            #input()
-            #shutil.copy(im,os.path.join(out,"images",im_name_ex))
-        # if i == len(all_im)-1:
-            # print("not found", label)
+
+    # matching image(s) from the index
+    matches = index.images.get(stem, [])
+    if len(matches) == 0:
+        print("not found", label)
+    for im in matches:
+        im_name = os.path.basename(im)
+        im_out = os.path.join(out,"images",im_name)
+        label_out = os.path.join(out,"labels",label_name)
+        shutil.copy(im,im_out)
+        shutil.copy(label, label_out)
+        count +=1
 print("count: ",count)
-print("count_copy: ", count_copy)
\ No newline at end of file
+print("count_copy: ", count_copy)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Shared image/label pairing used by the tools in this folder.
+Each folder is read once with os.scandir and indexed by file stem (file name without the last extension),
+so pairing N images with M labels is O(N+M) instead of a glob or list search per file.
+Duplicate stems (ex. im1.jpg and im1.png) and orphans are found in the same pass.
+===
+
+"""
+
+import os
+
+
+def get_stem(name):
+    # file name without the last extension, ex. "im1.v2.jpg" -> "im1.v2"
+    idx = name.rfind('.')
+    if idx <= 0:
+        return name
+    return name[0:idx]
+
+
+def get_first_stem(name):
+    # file name up to the first dot, ex. "im1.v2.jpg" -> "im1", the rule compare_ims.py has always matched with
+    return name.split('.')[0]
+
+
+def scan_folder(folder, ext=None):
+    # yield os.DirEntry for every regular file in a folder, in a single os.scandir pass
+    # hidden files are skipped to match glob "*". If ext is given (ex. ".txt") only those files are kept
+    if folder is None or not os.path.isdir(folder):
+        return
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.'):
+                continue
+            if ext is not None and not name.endswith(ext):
+                continue
+            if not entry.is_file():
+                continue
+            yield entry
+
+
+def index_paths(paths, stem_fn=get_stem):
+    # {stem: [path, path...]} with paths sorted, from an iterable of file paths
+    index = {}
+    for path in paths:
+        stem = stem_fn(os.path.basename(path))
+        if stem in index:
+            index[stem].append(path)
+        else:
+            index[stem] = [path]
+
+    for stem_paths in index.values():
+        if len(stem_paths) > 1:
+            stem_paths.sort()
+    return index
+
+
+def index_folder(folder, ext=None, stem_fn=get_stem):
+    # {stem: [path, path...]} for the regular files in a folder
+    return index_paths((entry.path for entry in scan_folder(folder, ext)), stem_fn)
+
+
+class PairIndex():
+    def __init__(self, img_folder, label_folder, label_ext=".txt", img_ext=None, images=None, labels=None):
+
+        # images/labels can be given as already built {stem: [paths]} indexes (ex. from manifest.py)
+        self.img_folder = img_folder
+        self.label_folder = label_folder
+        self.label_ext = label_ext
+        self.images = images if images is not None else index_folder(img_folder, img_ext)
+        self.labels = labels if labels is not None else index_folder(label_folder, label_ext)
+
+    def image(self, stem):
+        # first image path for a stem, or None
+        paths = self.images.get(stem)
+        return paths[0] if paths else None
+
+    def label(self, stem):
+        # first label path for a stem, or None
+        paths = self.labels.get(stem)
+        return paths[0] if paths else None
+
+    def pairs(self):
+        # sorted list of (stem, image path, label path) for every stem with both an image and a label
+        return [(stem, self.images[stem][0], self.labels[stem][0])
+                for stem in sorted(self.images) if stem in self.labels]
+
+    def orphan_images(self):
+        # stems of images with no label file
+        return sorted(stem for stem in self.images if stem not in self.labels)
+
+    def orphan_labels(self):
+        # stems of labels with no image
+        return sorted(stem for stem in self.labels if stem not in self.images)
+
+    def duplicate_images(self):
+        # {stem: [paths]} for stems shared by more than one image
+        return {stem: paths for stem, paths in sorted(self.images.items()) if len(paths) > 1}
+
+    def duplicate_labels(self):
+        # {stem: [paths]} for stems shared by more than one label
+        return {stem: paths for stem, paths in sorted(self.labels.items()) if len(paths) > 1}
+
+    def add_label(self, stem, path):
+        # register a label created after indexing (ex. an empty label for an orphan image)
+        self.labels.setdefault(stem, []).append(path)
+
+    def create_empty_labels(self, verbose=True):
+        # write an empty label for every image with no label (assumes those images have no objects)
+        # returns the list of stems that were given empty labels
+        created = self.orphan_images()
+        ext = self.label_ext if self.label_ext is not None else ".txt"
+        for stem in created:
+            empty_label = os.path.join(self.label_folder, stem + ext)
+            if verbose:
+                print("Label file does not exist for %s, creating empty label"%stem)
+            open(empty_label, 'a').close()
+            self.add_label(stem, empty_label)
+        return created
+
+    def report(self, orphans=True, duplicates=True):
+        # print counts, duplicate stems and orphans found while indexing
+        print("Number of images: ", len(self.images))
+        print("Number of labels: ", len(self.labels))
+
+        if duplicates:
+            for stem, paths in self.duplicate_images().items():
+                print("WARNING: image name %s matched to more than one img: %s"%(stem, ", ".join(paths)))
+            for stem, paths in self.duplicate_labels().items():
+                print("WARNING: label name %s matched to more than one label: %s"%(stem, ", ".join(paths)))
+
+        if orphans:
+            for stem in self.orphan_labels():
+                print("WARNING: Label file %s exists with no matching image..."%stem)
+            for stem in self.orphan_images():
+                print("WARNING: image %s has no matching label file..."%stem)
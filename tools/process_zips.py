@@ -1,6 +1,7 @@
 '''
 For processing lots of zip files downloaded from CVAT in COCO 1.0 format.
 Takes all zip files in a folder, unzip and process the files into a useable format
+With --zip, only that zip file is processed (used by run_pipeline.py to redo only a new or changed zip)
 
 Written by: Serena Mou
 Date:       30/11/24
@@ -16,31 +17,43 @@ parser = argparse.ArgumentParser(description='Unzip all COCO 1.0 files in a fold
  
 parser.add_argument("--root", dest = "root",
         help = "Path to folder where all zip files reside", default = None, type = str)
+parser.add_argument("--zip", dest = "zip",
+        help = "Process only this zip file. Default is all zip files in --root", default = None, type = str)
+parser.add_argument("--images", dest = "images",
+        help = "Folder to move the images to. Default is <root>/images", default = None, type = str)
 
 args = parser.parse_args()
 
 
 root_path = args.root
-zips_path = glob.glob(os.path.join(root_path,"*.zip"))
-img_path = os.path.join(root_path,"images")
+zips_path = [args.zip] if args.zip is not None else sorted(glob.glob(os.path.join(root_path,"*.zip")))
+img_path = args.images if args.images is not None else os.path.join(root_path,"images")
 annot_path = os.path.join(root_path,"labels")
+# one temp folder per zip, so several zips can be processed at once
 temp = os.path.join(root_path,"temp")
 
-os.makedirs(temp, exist_ok=True)
+os.makedirs(img_path, exist_ok=True)
 
 
 for zip in zips_path:
-    zip_name = zip.split('/')[-1]
-    zip_name = zip_name.split('.')[0]
+    # name without the .zip only, CVAT names zips "task_...-coco 1.0.zip"
+    zip_name = os.path.splitext(os.path.basename(zip))[0]
     # extract all to a temp folder
-    shutil.unpack_archive(zip, temp)
+    zip_temp = os.path.join(temp, zip_name)
+    if os.path.isdir(zip_temp):
+        shutil.rmtree(zip_temp)
+    shutil.unpack_archive(zip, zip_temp)
 
     # move the annotaions/xxx.json file to RAW/labels/zip_name/annotations/xxx.json
+    # annotations from an earlier version of the zip are replaced
     os.makedirs(os.path.join(annot_path,zip_name), exist_ok=True)
-    shutil.move(os.path.join(temp,"annotations"),os.path.join(annot_path,zip_name))
+    if os.path.isdir(os.path.join(annot_path,zip_name,"annotations")):
+        shutil.rmtree(os.path.join(annot_path,zip_name,"annotations"))
+    shutil.move(os.path.join(zip_temp,"annotations"),os.path.join(annot_path,zip_name))
 
-    # move the images/default/xyz to RAW/images/xyz
-    ims = glob.glob(os.path.join(temp,"images/default/**"))
+    # move the images/default/xyz to RAW/images/xyz, replacing existing images of the same name
+    ims = glob.glob(os.path.join(zip_temp,"images/default/**"))
     print(len(ims))
     for im in ims:
-        shutil.move(im,img_path)
+        shutil.move(im,os.path.join(img_path,os.path.basename(im)))
+    shutil.rmtree(zip_temp)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Runs the CVAT -> YOLO -> merge -> split -> train workflow from a pipeline yaml (see examples/pipeline.yaml), without prompts.
+For each stage, a hash of its command and the contents of its input files is kept in pipeline_state.sqlite.
+A stage is skipped if its command and inputs are unchanged since it last ran and all its outputs exist.
+Stages with "foreach" run once per matching file (ex. once per CVAT zip), so adding a zip only unzips that zip
+and then redoes the stages that read its output.
+
+Example use:
+python tools/run_pipeline.py --pipeline examples/pipeline.yaml
+===
+
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shlex
+import sqlite3
+import argparse
+import subprocess
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from manifest import hash_bytes, hash_file
+
+STATE_NAME = "pipeline_state.sqlite"
+
+
+class Vars(dict):
+    def __missing__(self, key):
+        sys.exit("ERROR: {%s} is not defined in the pipeline vars"%key)
+
+
+def substitute(text, variables):
+    # fill in {name} with the pipeline vars
+    return str(text).format_map(variables)
+
+
+def resolve_vars(raw):
+    # vars may use other vars, ex. raw: "{root}/Raw"
+    variables = Vars({k: str(v) for k, v in (raw or {}).items()})
+    for i in range(len(variables)):
+        variables = Vars({k: v.format_map(variables) for k, v in variables.items()})
+    return variables
+
+
+def input_files(patterns):
+    # every file matched by the input patterns, folders are included recursively (hidden files are skipped)
+    # patterns that match nothing are returned in missing
+    files = []
+    missing = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if len(matches) == 0:
+            missing.append(pattern)
+        for match in matches:
+            if os.path.isdir(match):
+                for folder, dirs, names in os.walk(match):
+                    dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                    files += [os.path.join(folder, name) for name in sorted(names) if not name.startswith('.')]
+            elif os.path.isfile(match):
+                files.append(match)
+    return files, missing
+
+
+class PipelineState():
+    def __init__(self, db_path, workers=8):
+
+        self.db_path = db_path
+        self.workers = workers
+        self.db = sqlite3.connect(db_path)
+        # content hash of every input file, re-read only when its size or mtime changes
+        self.db.execute("""CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL)""")
+        # fingerprint of each stage (or foreach item) when it last ran successfully
+        self.db.execute("""CREATE TABLE IF NOT EXISTS stages (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                finished REAL NOT NULL)""")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def hash_files(self, paths):
+        # {path: content hash}, only new or modified files are read
+        hashes = {}
+        changed = []
+        for path in paths:
+            st = os.stat(path)
+            row = self.db.execute("SELECT size, mtime_ns, hash FROM files WHERE path=?", (path,)).fetchone()
+            if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                hashes[path] = row[2]
+            else:
+                changed.append((path, st.st_size, st.st_mtime_ns))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            updates = []
+            for (path, size, mtime_ns), h in zip(changed, pool.map(lambda c: hash_file(c[0]), changed)):
+                hashes[path] = h
+                updates.append((path, size, mtime_ns, h))
+        self.db.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?)", updates)
+        self.db.commit()
+        return hashes
+
+    def fingerprint(self, cmd, inputs):
+        # hash of the command and of the contents of every input file
+        files, missing = input_files(inputs)
+        hashes = self.hash_files(files)
+        record = {"cmd": cmd, "inputs": [[os.path.abspath(path), hashes[path]] for path in files], "missing": missing}
+        return hash_bytes(json.dumps(record).encode())
+
+    def last(self, key):
+        row = self.db.execute("SELECT fingerprint FROM stages WHERE key=?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def record(self, key, fingerprint):
+        self.db.execute("INSERT OR REPLACE INTO stages VALUES (?,?,?)", (key, fingerprint, time.time()))
+        self.db.commit()
+
+
+class Pipeline():
+    def __init__(self, pipeline_file, force=None, dry_run=False, workers=8):
+
+        with open(pipeline_file, 'r') as stream:
+            config = yaml.safe_load(stream)
+        try:
+            self.stages = config["stages"]
+        except (KeyError, TypeError):
+            sys.exit("ERROR: %s has no \"stages\" section. See examples/pipeline.yaml"%pipeline_file)
+
+        self.vars = resolve_vars(config.get("vars"))
+        # commands run from workdir, default is the folder run_pipeline.py is started in
+        self.workdir = substitute(config.get("workdir", os.getcwd()), self.vars)
+        state = config.get("state", os.path.join(os.path.dirname(os.path.abspath(pipeline_file)), STATE_NAME))
+        self.state = PipelineState(substitute(state, self.vars), workers)
+        # stage names to run even if they are up to date, or "all"
+        self.force = force or []
+        self.dry_run = dry_run
+
+    def jobs(self, stage):
+        # (state key, variables) for each run of a stage, one per file matched by foreach
+        if "foreach" not in stage:
+            return [(stage["name"], self.vars)]
+        jobs = []
+        for item in sorted(glob.glob(substitute(stage["foreach"], self.vars))):
+            name = os.path.basename(item)
+            variables = Vars(self.vars, item=item, item_name=name, item_stem=os.path.splitext(name)[0])
+            jobs.append(("%s:%s"%(stage["name"], name), variables))
+        return jobs
+
+    def command(self, cmd):
+        # argument list for a command, "python" is the interpreter running the pipeline (ex. the conda environment)
+        args = shlex.split(cmd)
+        if len(args) > 0 and args[0] == "python":
+            args[0] = sys.executable
+        return args
+
+    def run_job(self, stage, key, variables):
+        # returns True if the job ran
+        cmd = substitute(stage["cmd"], variables)
+        inputs = [substitute(p, variables) for p in stage.get("inputs", [])]
+        outputs = [substitute(p, variables) for p in stage.get("outputs", [])]
+
+        with_cwd = lambda path: os.path.join(self.workdir, path)
+        inputs = [with_cwd(p) for p in inputs]
+        missing_outputs = [p for p in outputs if len(glob.glob(with_cwd(p))) == 0]
+
+        fingerprint = self.state.fingerprint(cmd, inputs)
+        forced = "all" in self.force or stage["name"] in self.force
+        if not forced and len(missing_outputs) == 0 and self.state.last(key) == fingerprint:
+            print("[skip] %s"%key)
+            return False
+
+        reason = "forced" if forced else ("missing %s"%missing_outputs[0] if len(missing_outputs) > 0 else "changed")
+        print("[run]  %s (%s)\n       %s"%(key, reason, cmd))
+        if self.dry_run:
+            return True
+
+        start = time.perf_counter()
+        result = subprocess.run(self.command(cmd), cwd=self.workdir)
+        if result.returncode != 0:
+            sys.exit("ERROR: stage %s failed with exit code %i"%(key, result.returncode))
+        missing_outputs = [p for p in outputs if len(glob.glob(with_cwd(p))) == 0]
+        if len(missing_outputs) > 0:
+            sys.exit("ERROR: stage %s did not write %s"%(key, missing_outputs[0]))
+
+        # recorded after the run, so stages that add to their inputs (ex. the split scripts writing empty labels) are not redone next time
+        self.state.record(key, self.state.fingerprint(cmd, inputs))
+        print("[done] %s in %.1fs"%(key, time.perf_counter()-start))
+        return True
+
+    def run(self):
+        ran = 0
+        for stage in self.stages:
+            if "name" not in stage or "cmd" not in stage:
+                sys.exit("ERROR: every stage needs a name and a cmd, see examples/pipeline.yaml")
+            jobs = self.jobs(stage)
+            if len(jobs) == 0:
+                print("[skip] %s (foreach matched no files)"%stage["name"])
+            for key, variables in jobs:
+                ran += self.run_job(stage, key, variables)
+        self.state.close()
+        if self.dry_run:
+            # stages are checked against the files as they are now, stages after one that would run may also run
+            print("\n%i stage runs needed, stages after them may also run once their inputs change"%ran)
+        else:
+            print("\n%i stage runs, everything else up to date"%ran)
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(description='Run the dataset and training pipeline in a pipeline yaml, skipping stages that are up to date')
+
+    parser.add_argument("--pipeline", dest = "pipeline",
+            help = "Path to pipeline yaml. See examples/pipeline.yaml", default = None, type = str, required=True)
+    parser.add_argument("--force", dest = "force",
+            help = "Stage names to run even if up to date, separated by commas, or all", default = None, type = str)
+    parser.add_argument("--dry_run", dest = "dry_run",
+            help = "Only print which stages would run", action = "store_true")
+    parser.add_argument("--workers", dest = "workers",
+            help = "Number of threads hashing new or changed input files. Default 8", default = 8, type = int)
+
+    return parser.parse_args()
+
+
+def main():
+    args = arg_parse()
+    force = args.force.split(',') if args.force is not None else None
+    pipeline = Pipeline(args.pipeline, force, args.dry_run, args.workers)
+    pipeline.run()
+    print("DONE")
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Shared output stage for train_test_split.py and bal_train_test_split.py.
+Splits are written to /src/<split>/images, /src/<split>/labels by copying (in a bounded thread pool), hard linking,
+symbolic linking or reflinking (copy-on-write clone) the files from all_images/all_labels,
+or as Ultralytics list files /src/train.txt, /src/valid.txt, /src/test.txt with data.yaml/test.yaml pointed at them.
+K-fold cross validation splits are written as list files /src/fold<k>_train.txt, /src/fold<k>_valid.txt and /src/data_fold<k>.yaml.
+===
+
+"""
+
+import os
+import sys
+import shutil
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = ["copy", "hardlink", "symlink", "reflink", "listfile"]
+SPLITS = ["train", "valid", "test"]
+
+# linux FICLONE ioctl, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+CHUNK = 4096
+
+_reflink_warned = False
+
+
+def add_mode_args(parser):
+    # --mode, --workers, --yes and --folds options shared by the split scripts
+    parser.add_argument("--mode", dest = "mode",
+            help = "How to write the splits: copy, hardlink, symlink, reflink or listfile. Default copy",
+            default = "copy", choices = MODES, type = str)
+    parser.add_argument("--workers", dest = "workers",
+            help = "Number of threads for copying/linking files. Default 8", default = 8, type = int)
+    parser.add_argument("--yes", dest = "yes",
+            help = "Overwrite existing split folders without asking", action = "store_true")
+    parser.add_argument("--folds", dest = "folds",
+            help = "Write K cross validation folds as list files and data_fold<k>.yaml instead of one split. --valid is not used", default = None, type = int)
+
+
+def split_dirs(src_dir, split):
+    # (images dir, labels dir) for a split
+    return os.path.join(src_dir, split, "images"), os.path.join(src_dir, split, "labels")
+
+
+def make_split_dirs(src_dir, test, yes=False):
+    # Prompt to overwrite if output dirs exist, otherwise create /src/<split>/images and /src/<split>/labels
+    out_dirs = [os.path.join(src_dir, split) for split in SPLITS]
+    if any(os.path.exists(out_dir) for out_dir in out_dirs):
+        print("WARNING: Output Directory Exists, data will be overwritten ", end="")
+
+        if not yes and input("Y/N?:").lower() != "y":
+            print("EXITING...\n")
+            sys.exit()
+        else:
+            print("CONTINUING...\n")
+            # Delete existing output dir
+            try:
+                for out_dir in out_dirs:
+                    if os.path.exists(out_dir): shutil.rmtree(out_dir)
+            except OSError as error:
+                print(error)
+                sys.exit()
+
+    print("#################### Creating output directories ####################")
+    print("TRAIN: {}\nVALID: {}".format(out_dirs[0], out_dirs[1]))
+    if test:
+        print("TEST: {}\n".format(out_dirs[2]))
+    else:
+        print("")
+
+    try:
+        for split in SPLITS[:3 if test else 2]:
+            for folder in split_dirs(src_dir, split):
+                os.makedirs(folder)
+    except OSError as error:
+        print(error)
+        sys.exit()
+
+
+def reflink(src, dst):
+    # copy-on-write clone of src to dst (btrfs, xfs, ...), falls back to a normal copy if not supported
+    global _reflink_warned
+    try:
+        import fcntl
+        with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        shutil.copymode(src, dst)
+    except (ImportError, OSError):
+        if not _reflink_warned:
+            _reflink_warned = True
+            print("WARNING: reflink not supported on this filesystem, copying instead")
+        shutil.copy(src, dst)
+
+
+def place_file(src, dst, mode):
+    if mode == "copy":
+        shutil.copy(src, dst)
+    elif mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == "reflink":
+        reflink(src, dst)
+    else:
+        raise ValueError("Unknown mode %s"%mode)
+
+
+def place_files(jobs, mode, workers):
+    # copy/link a list of (src, dst) in a bounded thread pool, exit on the first failure
+    def run(job):
+        try:
+            place_file(job[0], job[1], mode)
+            return None
+        except OSError as error:
+            return (job, error)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # submit in chunks so the number of queued jobs stays bounded
+        chunk = max(1, workers) * CHUNK
+        for i in range(0, len(jobs), chunk):
+            for failed in pool.map(run, jobs[i:i+chunk]):
+                if failed is not None:
+                    (src, dst), error = failed
+                    print(error)
+                    print("\nFailed to {} {} to {}".format(mode, src, dst))
+                    sys.exit()
+
+
+def link_dataset_dirs(src_dir, image_source_dir, label_source_dir):
+    # Ultralytics finds the label of <path>/images/x.jpg at <path>/labels/x.txt
+    # so list files point at /src/images and /src/labels, which are symlinks to all_images and all_labels
+    for name, target in (("images", image_source_dir), ("labels", label_source_dir)):
+        link = os.path.join(src_dir, name)
+        if os.path.islink(link):
+            if os.path.realpath(link) == os.path.realpath(target):
+                continue
+            os.remove(link)
+        elif os.path.exists(link):
+            sys.exit("ERROR: %s exists and is not a link to %s. Remove it to use --mode listfile"%(link, target))
+        os.symlink(os.path.relpath(target, src_dir), link)
+    return os.path.join(os.path.abspath(src_dir), "images")
+
+
+def write_list_file(path, image_dir, images):
+    with open(path, 'w') as f:
+        f.write("".join("%s\n"%os.path.join(image_dir, img_name) for img_name in images))
+
+
+def point_yaml(yaml_path, val_list, train_list="train.txt"):
+    # point the train/val entries of an existing data.yaml/test.yaml at list files
+    if not os.path.isfile(yaml_path):
+        print("WARNING: %s not found, not updated"%yaml_path)
+        return
+    with open(yaml_path, 'r') as stream:
+        data = yaml.safe_load(stream)
+    data["train"] = train_list
+    data["val"] = val_list
+    with open(yaml_path, 'w') as outfile:
+        yaml.dump(data, outfile, sort_keys=False)
+
+
+def write_list_files(src_dir, image_source_dir, label_source_dir, splits):
+    # write /src/<split>.txt for each split and point data.yaml/test.yaml at them
+    image_dir = link_dataset_dirs(src_dir, image_source_dir, label_source_dir)
+    for split, (images, labels) in splits.items():
+        list_path = os.path.join(src_dir, split + ".txt")
+        print("%s: %s (%i images)"%(split.upper(), list_path, len(images)))
+        write_list_file(list_path, image_dir, images)
+
+    point_yaml(os.path.join(src_dir, "data.yaml"), "valid.txt")
+    if "test" in splits:
+        point_yaml(os.path.join(src_dir, "test.yaml"), "test.txt")
+
+
+def write_splits(src_dir, image_source_dir, label_source_dir, splits, mode, workers):
+    # splits: {split name: (image names, label names)}
+    if mode == "listfile":
+        write_list_files(src_dir, image_source_dir, label_source_dir, splits)
+        return
+
+    jobs = []
+    for split, (images, labels) in splits.items():
+        image_dir, label_dir = split_dirs(src_dir, split)
+        jobs += [(os.path.join(image_source_dir, name), os.path.join(image_dir, name)) for name in images]
+        jobs += [(os.path.join(label_source_dir, name), os.path.join(label_dir, name)) for name in labels]
+    place_files(jobs, mode, workers)
+
+
+def write_fold_files(src_dir, image_source_dir, label_source_dir, folds, test_images=None):
+    # folds: list of K lists of image names, fold k is validated on folds[k] and trained on the others
+    # every fold points at the same all_images (through /src/images), nothing is copied
+    data_path = os.path.join(src_dir, "data.yaml")
+    if not os.path.isfile(data_path):
+        sys.exit("ERROR: %s not found, it is needed for the class names of data_fold<k>.yaml"%data_path)
+    with open(data_path, 'r') as stream:
+        data = yaml.safe_load(stream)
+
+    image_dir = link_dataset_dirs(src_dir, image_source_dir, label_source_dir)
+    for k, valid in enumerate(folds):
+        train = [img_name for j, fold in enumerate(folds) if j != k for img_name in fold]
+        write_list_file(os.path.join(src_dir, "fold%i_train.txt"%k), image_dir, train)
+        write_list_file(os.path.join(src_dir, "fold%i_valid.txt"%k), image_dir, valid)
+
+        fold_data = dict(data)
+        # list files are relative to path, which has to be this dataset
+        fold_data["path"] = os.path.abspath(src_dir)
+        fold_data["train"] = "fold%i_train.txt"%k
+        fold_data["val"] = "fold%i_valid.txt"%k
+        fold_path = os.path.join(src_dir, "data_fold%i.yaml"%k)
+        with open(fold_path, 'w') as outfile:
+            yaml.dump(fold_data, outfile, sort_keys=False)
+        print("FOLD %i: %s (train %i, valid %i images)"%(k, fold_path, len(train), len(valid)))
+
+    if test_images is not None:
+        list_path = os.path.join(src_dir, "test.txt")
+        print("TEST: %s (%i images)"%(list_path, len(test_images)))
+        write_list_file(list_path, image_dir, test_images)
+        point_yaml(os.path.join(src_dir, "test.yaml"), "test.txt")
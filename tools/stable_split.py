@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Incremental split assignment for train_test_split.py and bal_train_test_split.py (--assign hash).
+Each image keeps the split it was given on earlier runs (kept in manifest.sqlite). New images are placed by a
+stable hash of their file stem, or with --strat iterative by the classes each split is missing.
+Only files of added, removed or changed images are copied/linked/deleted, the split folders are never rebuilt.
+===
+
+"""
+
+import os
+import hashlib
+import numpy as np
+from pairing import get_stem
+from split_output import SPLITS, split_dirs, make_split_dirs, place_files, write_list_files
+from stratify import iterative_split
+
+ASSIGN = ["random", "hash"]
+
+
+def add_assign_args(parser):
+    # --assign option shared by the split scripts
+    parser.add_argument("--assign", dest = "assign",
+            help = "random: split every image again on each run. hash: keep earlier splits and only place new images. Default random",
+            default = "random", choices = ASSIGN, type = str)
+
+
+def hash_fraction(stem):
+    # stable number in [0, 1) from a file stem, the same on every machine and run
+    digest = hashlib.blake2b(stem.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / float(1 << 64)
+
+
+def hash_split(stems, ratios):
+    # split index of each stem from its hash, in proportion to ratios
+    bounds = np.cumsum(ratios) / np.sum(ratios)
+    fractions = np.fromiter((hash_fraction(stem) for stem in stems), dtype=np.float64, count=len(stems))
+    return np.minimum(np.searchsorted(bounds, fractions, side='right'), len(ratios)-1)
+
+
+def placed(src_dir, split, image, label):
+    # the copy/link of an image and its label are still in a split folder
+    return all(os.path.lexists(os.path.join(folder, name)) for folder, name in zip(split_dirs(src_dir, split), (image, label)))
+
+
+def remove_placed(src_dir, split, image, label):
+    # delete the copy/link of an image and its label from a split folder
+    for folder, name in zip(split_dirs(src_dir, split), (image, label)):
+        path = os.path.join(folder, name)
+        if os.path.lexists(path):
+            os.remove(path)
+
+
+def sync_splits(manifest, src_dir, image_source_dir, label_source_dir, images, labels, ratios, mode, workers,
+                class_matrix=None, seed=1, yes=False):
+    # bring the splits up to date with images/labels (pairs, same order), keeping earlier assignments
+    # class_matrix (images x classes) places new images by the classes each split is missing, otherwise by hash
+    # returns {split name: (images, labels)}
+    split_names = SPLITS[:len(ratios)]
+    stems = [get_stem(image) for image in images]
+    previous = manifest.split_rows()
+
+    # what each image would be placed as now
+    current = {}
+    for stem, image, label in zip(stems, images, labels):
+        current[stem] = (image, label, manifest.file_hash("images", image), manifest.file_hash("labels", label), mode)
+
+    kept = {}
+    changed = {}
+    for stem, row in previous.items():
+        if stem not in current or row[0] not in split_names:
+            continue
+        if row[1:] == current[stem] and (mode == "listfile" or placed(src_dir, row[0], row[1], row[2])):
+            kept[stem] = row[0]
+        else:
+            # same image, new content/name or written with another --mode: placed again in the same split
+            changed[stem] = row[0]
+    removed = [stem for stem in previous if stem not in kept and stem not in changed]
+    new = [i for i, stem in enumerate(stems) if stem not in kept and stem not in changed]
+
+    # place the new images
+    if len(new) > 0:
+        if class_matrix is not None:
+            held = [i for i, stem in enumerate(stems) if stem in kept or stem in changed]
+            held_split = np.array([split_names.index(kept.get(stems[i], changed.get(stems[i]))) for i in held], dtype=np.int64)
+            onehot = np.zeros((len(split_names), len(held)))
+            onehot[held_split, np.arange(len(held))] = 1
+            placed_counts = onehot @ class_matrix[held].toarray() if len(held) > 0 else None
+            placed_images = onehot.sum(axis=1) if len(held) > 0 else None
+            # new images in hash order, so the assignment does not depend on the order files were found in
+            order = sorted(new, key=lambda i: hash_fraction(stems[i]))
+            assigned = iterative_split(class_matrix[order], ratios, seed, placed_counts, placed_images)
+            new_split = dict(zip(order, assigned))
+        else:
+            new_split = dict(zip(new, hash_split([stems[i] for i in new], ratios)))
+    else:
+        new_split = {}
+
+    assignment = dict(kept)
+    assignment.update(changed)
+    for i, j in new_split.items():
+        assignment[stems[i]] = split_names[j]
+
+    print("Splits (--assign hash): %i kept, %i added, %i changed, %i removed"%(len(kept), len(new), len(changed), len(removed)))
+
+    splits = {name: ([], []) for name in split_names}
+    for stem, image, label in zip(stems, images, labels):
+        splits[assignment[stem]][0].append(image)
+        splits[assignment[stem]][1].append(label)
+
+    if mode == "listfile":
+        write_list_files(src_dir, image_source_dir, label_source_dir, splits)
+    else:
+        if len(previous) == 0:
+            # first run with --assign hash, folders from a random split are replaced
+            make_split_dirs(src_dir, len(split_names) > 2, yes)
+        for split in split_names:
+            for folder in split_dirs(src_dir, split):
+                os.makedirs(folder, exist_ok=True)
+
+        # remove what is gone or about to be placed again, then place only new and changed images
+        for stem in removed + list(changed):
+            row = previous[stem]
+            remove_placed(src_dir, row[0], row[1], row[2])
+        jobs = []
+        for stem in list(changed) + [stems[i] for i in new]:
+            image, label = current[stem][0:2]
+            image_dir, label_dir = split_dirs(src_dir, assignment[stem])
+            jobs.append((os.path.join(image_source_dir, image), os.path.join(image_dir, image)))
+            jobs.append((os.path.join(label_source_dir, label), os.path.join(label_dir, label)))
+        place_files(jobs, mode, workers)
+
+    manifest.update_splits({stem: (assignment[stem],) + current[stem] for stem in list(changed) + [stems[i] for i in new]}, removed)
+    return splits
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Multi-label iterative stratification (Sechidis et al. 2011) for bal_train_test_split.py.
+Works on a sparse image x class matrix of instance counts, so every class of an image is balanced and not only
+its most common class. Instead of placing one image at a time, all remaining images of the rarest remaining class
+are placed in one vectorised step, split between train/valid/test in proportion to how many instances of that class
+each split still needs. There is one step per class, so a million images take seconds.
+===
+
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def count_matrix(hists):
+    # CSR matrix (images x classes) of instance counts and the class id of each column
+    # hists is a class histogram {class id: count} per image, None or {} for empty images
+    class_ids = sorted({cls for hist in hists if hist for cls in hist})
+    column = {cls: j for j, cls in enumerate(class_ids)}
+    rows = []
+    cols = []
+    data = []
+    for i, hist in enumerate(hists):
+        if not hist:
+            continue
+        for cls, n in hist.items():
+            rows.append(i)
+            cols.append(column[cls])
+            data.append(n)
+    X = sp.csr_matrix((np.asarray(data, dtype=np.int64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+                      shape=(len(hists), len(class_ids)))
+    return X, class_ids
+
+
+def allocate(n, weights):
+    # split n items in proportion to weights (largest remainder), weights <= 0 get nothing unless all are
+    weights = np.clip(np.asarray(weights, dtype=np.float64), 0, None)
+    if weights.sum() <= 0:
+        weights = np.ones(len(weights))
+    quota = n * weights / weights.sum()
+    counts = np.floor(quota).astype(np.int64)
+    rest = n - counts.sum()
+    if rest > 0:
+        counts[np.argsort(-(quota - counts), kind='stable')[:rest]] += 1
+    return counts
+
+
+def iterative_split(X, ratios, seed=1, placed=None, placed_images=None):
+    # split index (0..len(ratios)-1) of every image, X is an images x classes count matrix
+    # placed (splits x classes) instances and placed_images (splits,) images already in each split (ex. from an earlier
+    # run), the images in X then make up what each split is missing
+    rng = np.random.default_rng(seed)
+    X = sp.csr_matrix(X)
+    n_images, n_classes = X.shape
+    ratios = np.asarray(ratios, dtype=np.float64)
+    ratios = ratios / ratios.sum()
+
+    presence = X.copy()
+    presence.data = (presence.data > 0).astype(np.int64)
+    presence_csc = presence.tocsc()
+
+    # instances of each class and images still wanted by each split
+    if placed is None:
+        placed = np.zeros((len(ratios), n_classes))
+        placed_images = np.zeros(len(ratios))
+    placed = np.asarray(placed, dtype=np.float64)
+    placed_images = np.asarray(placed_images, dtype=np.float64)
+    needed = np.outer(ratios, np.asarray(X.sum(axis=0)).ravel() + placed.sum(axis=0)) - placed
+    needed_images = ratios * (n_images + placed_images.sum()) - placed_images
+    # images of each class not placed yet
+    remaining = np.asarray(presence.sum(axis=0)).ravel()
+
+    split = np.full(n_images, -1, dtype=np.int64)
+    for step in range(n_classes):
+        # rarest class that still has images to place
+        open_classes = np.flatnonzero(remaining > 0)
+        if len(open_classes) == 0:
+            break
+        cls = open_classes[np.argmin(remaining[open_classes])]
+
+        col = presence_csc.indices[presence_csc.indptr[cls]:presence_csc.indptr[cls+1]]
+        rows = col[split[col] < 0]
+        rows = rows[rng.permutation(len(rows))]
+
+        # split these images by how many instances of the class each split still needs, then by images needed
+        weights = needed[:, cls] if needed[:, cls].max() > 0 else needed_images
+        counts = allocate(len(rows), weights)
+        ends = np.cumsum(counts)
+        for j in range(len(ratios)):
+            chosen = rows[ends[j]-counts[j]:ends[j]]
+            split[chosen] = j
+            needed[j] -= np.asarray(X[chosen].sum(axis=0)).ravel()
+            needed_images[j] -= len(chosen)
+        remaining -= np.asarray(presence[rows].sum(axis=0)).ravel()
+
+    # images with no labels fill the splits up to their sizes
+    empty = np.flatnonzero(split < 0)
+    empty = empty[rng.permutation(len(empty))]
+    counts = allocate(len(empty), needed_images)
+    split[empty] = np.repeat(np.arange(len(ratios)), counts)
+    return split
+
+
+def distribution(X, split, n_splits):
+    # (images per split, instances of each class per split (splits x classes), images of each class per split)
+    X = sp.csr_matrix(X)
+    onehot = sp.csr_matrix((np.ones(len(split)), (split, np.arange(len(split)))), shape=(n_splits, len(split)))
+    presence = X.copy()
+    presence.data = (presence.data > 0).astype(np.float64)
+    images = np.bincount(split, minlength=n_splits)
+    return images, np.asarray((onehot @ X).todense()), np.asarray((onehot @ presence).todense())
+
+
+def report(X, split, split_names, class_ids, class_names=None):
+    # print the share of each class (instances and images) that went to each split
+    images, instances, class_images = distribution(X, split, len(split_names))
+    total = max(images.sum(), 1)
+    print("\n#################### Split distribution ####################")
+    print("images, " + ", ".join("%s %i (%.1f%%)"%(name, n, 100*n/total) for name, n in zip(split_names, images)))
+    print("\nclass, instances, images, " + ", ".join("%s instances %%, %s images %%"%(name, name) for name in split_names))
+    for j, cls in enumerate(class_ids):
+        name = class_names.get(cls, cls) if class_names else cls
+        n = instances[:, j].sum()
+        n_ims = class_images[:, j].sum()
+        shares = ", ".join("%.1f, %.1f"%(100*instances[s, j]/max(n, 1), 100*class_images[s, j]/max(n_ims, 1))
+                           for s in range(len(split_names)))
+        print("%s, %i, %i, %s"%(name, n, n_ims, shares))
+    print("")
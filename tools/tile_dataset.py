@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+===
+Slices a dataset of high resolution images (/src/all_images, /src/all_labels) into overlapping tiles at the training
+size, so training at imgsz 640 sees objects at full resolution instead of shrunk images.
+Boxes and segmentation polygons are clipped to each tile and renormalised, objects with less than --min_area of their
+area inside a tile are dropped from it. Images are tiled in a process pool.
+Writes /dst/all_images, /dst/all_labels, /dst/data.yaml and /dst/tiles.csv (tile -> source image and window),
+ready for the split scripts.
+===
+
+"""
+
+import os
+import sys
+import csv
+import yaml
+import shutil
+import argparse
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pairing import PairIndex, get_stem
+from coco_masks import polygon_area
+from coco_to_yolo_format import LABEL_LINE, SEG_CLASS, SEG_POINT
+
+# tiles are laid out as in tiled inference, so training tiles match the tiles the model later sees
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples"))
+from tiling import tile_windows
+
+PROVENANCE = ["tile", "source", "x0", "y0", "x1", "y1", "source_width", "source_height"]
+
+def arg_parse():
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(description='Slice a dataset into overlapping tiles')
+
+    parser.add_argument("--src", dest = "src_dir",
+            help = "Dataset folder with all_images, all_labels and data.yaml", default = None, type = str)
+    parser.add_argument("--dst", dest = "dst_dir",
+            help = "Folder to write the tiled dataset to", default = None, type = str)
+    parser.add_argument("--tile", dest = "tile",
+            help = "Tile size in pixels. Default 640", default = 640, type = int)
+    parser.add_argument("--overlap", dest = "overlap",
+            help = "Overlap between tiles as a fraction of --tile. Default 0.2", default = 0.2, type = float)
+    parser.add_argument("--min_area", dest = "min_area",
+            help = "Fraction of an object's area that must be inside a tile to label it there. Default 0.25", default = 0.25, type = float)
+    parser.add_argument("--drop_empty", dest = "drop_empty",
+            help = "Do not write tiles with no objects", action = "store_true")
+    parser.add_argument("--quality", dest = "quality",
+            help = "JPEG quality of jpg tiles. Default 95", default = 95, type = int)
+    parser.add_argument("--workers", dest = "workers",
+            help = "Number of processes tiling images. Default 8", default = 8, type = int)
+    parser.add_argument("--yes", dest = "yes",
+            help = "Overwrite an existing --dst without asking", action = "store_true")
+
+    return parser.parse_args()
+
+
+def read_label(path, width, height):
+    # (box classes, (N,4) xyxy pixel boxes, polygon classes, [(K,2) pixel polygons]) of a YOLO label file
+    box_cls = []
+    boxes = []
+    poly_cls = []
+    polys = []
+    with open(path, 'r') as f:
+        for line in f:
+            values = line.split()
+            if len(values) == 5:
+                box_cls.append(int(values[0]))
+                boxes.append([float(v) for v in values[1:]])
+            elif len(values) >= 7 and len(values) % 2 == 1:
+                poly_cls.append(int(values[0]))
+                polys.append(np.array(values[1:], dtype=np.float64).reshape(-1, 2) * [width, height])
+    boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4) * [width, height, width, height]
+    xyxy = np.concatenate([boxes[:, 0:2] - boxes[:, 2:4]/2, boxes[:, 0:2] + boxes[:, 2:4]/2], axis=1)
+    return np.array(box_cls, dtype=np.int64), xyxy, np.array(poly_cls, dtype=np.int64), polys
+
+
+def clip_boxes(boxes, windows):
+    # every box clipped to every tile at once: ((T,N,4) clipped xyxy, (T,N) fraction of each box inside each tile)
+    lo = np.maximum(boxes[None, :, 0:2], windows[:, None, 0:2])
+    hi = np.minimum(boxes[None, :, 2:4], windows[:, None, 2:4])
+    size = np.clip(hi - lo, 0, None)
+    area = np.prod(boxes[:, 2:4] - boxes[:, 0:2], axis=1)
+    return np.concatenate([lo, hi], axis=2), size[..., 0] * size[..., 1] / np.maximum(area, 1e-9)[None]
+
+
+def clip_edge(points, axis, value, keep_above):
+    # one Sutherland-Hodgman step: the part of a polygon on one side of x (axis 0) or y (axis 1) = value
+    if len(points) == 0:
+        return points
+    following = np.roll(points, -1, axis=0)
+    inside = points[:, axis] >= value if keep_above else points[:, axis] <= value
+    crossing = inside != np.roll(inside, -1)
+    delta = following[:, axis] - points[:, axis]
+    t = (value - points[:, axis]) / np.where(crossing, delta, 1)
+    cross = points + t[:, None] * (following - points)
+    cross[:, axis] = value
+    # each edge gives its start point if inside, then the crossing point if it crosses the line
+    return np.stack([points, cross], axis=1)[np.stack([inside, crossing], axis=1)]
+
+
+def clip_polygon(points, window):
+    # polygon clipped to a tile window x0, y0, x1, y1
+    x0, y0, x1, y1 = window
+    for axis, value, keep_above in ((0, x0, True), (0, x1, False), (1, y0, True), (1, y1, False)):
+        points = clip_edge(points, axis, value, keep_above)
+    return points
+
+
+def tile_labels(box_cls, boxes, poly_cls, polys, windows, min_area):
+    # label text of each tile, objects with less than min_area of their area inside a tile are dropped from it
+    # returns ([text of each tile], objects kept, objects dropped as slivers)
+    sizes = windows[:, 2:4] - windows[:, 0:2]
+    texts = [[] for i in range(len(windows))]
+    kept = 0
+    dropped = 0
+
+    if len(boxes) > 0:
+        clipped, inside = clip_boxes(boxes, windows)
+        keep = inside >= min_area
+        dropped += int(np.count_nonzero((inside > 0) & ~keep))
+        for t in np.flatnonzero(keep.any(axis=1)):
+            idx = np.flatnonzero(keep[t])
+            xy = (clipped[t, idx] - np.tile(windows[t, 0:2], 2)) / np.tile(sizes[t], 2)
+            rows = np.column_stack([box_cls[idx], (xy[:, 0:2] + xy[:, 2:4])/2, xy[:, 2:4] - xy[:, 0:2]])
+            texts[t].append((LABEL_LINE * len(rows)) % tuple(rows.ravel().tolist()))
+            kept += len(idx)
+
+    if len(polys) > 0:
+        # only tiles the bounding box of a polygon reaches are clipped
+        bounds = np.array([np.concatenate([poly.min(axis=0), poly.max(axis=0)]) for poly in polys])
+        reach = np.all(bounds[None, :, 0:2] < windows[:, None, 2:4], axis=2) & np.all(bounds[None, :, 2:4] > windows[:, None, 0:2], axis=2)
+        for t, i in zip(*np.nonzero(reach)):
+            part = clip_polygon(polys[i], windows[t])
+            # the bounding box can reach a tile the polygon itself does not, that is not a sliver
+            area = polygon_area(part) if len(part) >= 3 else 0
+            if area <= 0:
+                continue
+            if area < min_area * polygon_area(polys[i]):
+                dropped += 1
+                continue
+            norm = ((part - windows[t, 0:2]) / sizes[t]).ravel()
+            texts[t].append((SEG_CLASS + SEG_POINT*len(norm) + "\n") % ((poly_cls[i],) + tuple(norm.tolist())))
+            kept += 1
+
+    return ["".join(text) for text in texts], kept, dropped
+
+
+def tile_image(job):
+    # write the tiles of one image and their labels, returns (provenance rows, objects kept, objects dropped)
+    image_path, label_path, image_dir, label_dir, size, overlap, min_area, drop_empty, quality = job
+    image = cv2.imread(image_path)
+    if image is None:
+        return None, 0, 0
+    height, width = image.shape[0:2]
+    windows = tile_windows(width, height, size, overlap).astype(np.float64)
+    if label_path is not None:
+        box_cls, boxes, poly_cls, polys = read_label(label_path, width, height)
+    else:
+        box_cls, boxes, poly_cls, polys = np.zeros(0, dtype=np.int64), np.zeros((0, 4)), np.zeros(0, dtype=np.int64), []
+    texts, kept, dropped = tile_labels(box_cls, boxes, poly_cls, polys, windows, min_area)
+
+    name = os.path.basename(image_path)
+    stem = get_stem(name)
+    ext = name[len(stem):]
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if ext.lower() in (".jpg", ".jpeg") else []
+    rows = []
+    for window, text in zip(windows.astype(np.int64), texts):
+        if drop_empty and len(text) == 0:
+            continue
+        x0, y0, x1, y1 = window.tolist()
+        tile_stem = "%s_%i_%i"%(stem, x0, y0)
+        cv2.imwrite(os.path.join(image_dir, tile_stem + ext), image[y0:y1, x0:x1], params)
+        with open(os.path.join(label_dir, tile_stem + ".txt"), 'w') as f:
+            f.write(text)
+        rows.append([tile_stem + ext, name, x0, y0, x1, y1, width, height])
+    return rows, kept, dropped
+
+
+def main():
+    args = arg_parse()
+
+    # Check src and dst
+    if args.src_dir is None or args.dst_dir is None:
+        sys.exit("ERROR: --src and --dst must be provided")
+    image_source_dir = os.path.join(args.src_dir, "all_images")
+    label_source_dir = os.path.join(args.src_dir, "all_labels")
+    if not os.path.isdir(image_source_dir):
+        sys.exit("ERROR: %s does not exist"%image_source_dir)
+    if os.path.abspath(args.src_dir) == os.path.abspath(args.dst_dir):
+        sys.exit("ERROR: --dst must be a different folder to --src")
+
+    image_dir = os.path.join(args.dst_dir, "all_images")
+    label_dir = os.path.join(args.dst_dir, "all_labels")
+    if os.path.exists(image_dir) or os.path.exists(label_dir):
+        print("WARNING: %s already has tiles, they will be overwritten "%args.dst_dir, end="")
+        if not args.yes and input("Y/N?:").lower() != "y":
+            print("EXITING...\n")
+            sys.exit()
+        print("CONTINUING...\n")
+        for folder in (image_dir, label_dir):
+            if os.path.exists(folder):
+                shutil.rmtree(folder)
+    os.makedirs(image_dir)
+    os.makedirs(label_dir)
+
+    # Images with no label file are tiled as empty images
+    index = PairIndex(image_source_dir, label_source_dir)
+    jobs = [(index.image(stem), index.label(stem), image_dir, label_dir, args.tile, args.overlap, args.min_area,
+             args.drop_empty, args.quality) for stem in sorted(index.images)]
+
+    n_tiles = 0
+    kept = 0
+    dropped = 0
+    with open(os.path.join(args.dst_dir, "tiles.csv"), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(PROVENANCE)
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            for job, (rows, n_kept, n_dropped) in zip(jobs, pool.map(tile_image, jobs, chunksize=4)):
+                if rows is None:
+                    print("WARNING: could not read %s, skipping"%job[0])
+                    continue
+                writer.writerows(rows)
+                n_tiles += len(rows)
+                kept += n_kept
+                dropped += n_dropped
+
+    # data.yaml for the tiled dataset, with the class names of the source
+    data_path = os.path.join(args.src_dir, "data.yaml")
+    if os.path.isfile(data_path):
+        with open(data_path, 'r') as stream:
+            data = yaml.safe_load(stream)
+        data["path"] = os.path.abspath(args.dst_dir)
+        with open(os.path.join(args.dst_dir, "data.yaml"), 'w') as outfile:
+            yaml.dump(data, outfile, sort_keys=False)
+    else:
+        print("WARNING: %s not found, add a data.yaml to %s before training"%(data_path, args.dst_dir))
+
+    print("Wrote %i tiles from %i images to %s"%(n_tiles, len(jobs), args.dst_dir))
+    print("%i objects labelled in tiles, %i slivers under --min_area %.2f dropped"%(kept, dropped, args.min_area))
+
+if __name__ == '__main__':
+    main()
@@ -10,11 +10,12 @@ Optionally trim n images with empty labels
 
 import os
 import sys
-import shutil
 import random
 import argparse
-from sklearn.model_selection import train_test_split
-import glob
+from sklearn.model_selection import train_test_split, KFold
+from manifest import DatasetManifest
+from split_output import add_mode_args, make_split_dirs, write_splits, write_fold_files
+from stable_split import add_assign_args, sync_splits
 
 random.seed(1)
 
@@ -32,6 +33,8 @@ def arg_parse():
             help = "Fraction to split for testing, 0-1", default = None, type = float)
     parser.add_argument("--dump", dest = "n_dump",
             help = "Number of empty images to drop", default = None, type = int)
+    add_mode_args(parser)
+    add_assign_args(parser)
 
     return parser.parse_args()
 
@@ -53,104 +56,22 @@ def main():
         raise FileNotFoundError("Source directory {} does not exist".format(label_source_dir))
 
     # Check labels and images match - if an image has no label file, generate an empty one. If a label has no image, throw a warning
-    all_images = glob.glob(os.path.join(image_source_dir,"*"))
-    all_labels = glob.glob(os.path.join(label_source_dir,"*"))
-
-    # remove extensions
-    all_ims = []
-    all_labs = []
- 
-    for img in all_images:
-        img_name = img.split('/')[-1]
-        idx = img_name.rfind('.')
-        img_name = img_name[0:idx]
-        all_ims.append(img_name)
-
-
-    for label in all_labels:
-        label_name = label.split('/')[-1]
-        idx = label_name.rfind('.') 
-        label_name = label_name[0:idx]
-        all_labs.append(label_name)      
-   
-    # all_ims = [im.split("/")[-1].split('.')[0] for im in all_ims]
-    # all_labs = [lab.split("/")[-1].split('.')[0] for lab in all_labs]
-    # print(all_ims)
-    # print(all_labs)
-    for im in all_ims:
-        if im not in all_labs:
-            print("Label file does not exist for %s, creating empty label"%im)
-            empty_label = os.path.join(label_source_dir,im+".txt")
-            open(empty_label, 'a').close()
-    
-    for lab in all_labs:
-        if lab not in all_ims:
-            print("WARNING: Label file %s exists with no matching image..."%lab)
-
-    # lab_in_ims = [lab in all_ims for lab in all_labs]
-
-    # Create output directory paths
-    train_out_dir = os.path.join(args.src_dir, "train")
-    valid_out_dir = os.path.join(args.src_dir, "valid")
-    test_out_dir = os.path.join(args.src_dir, "test")
-    train_image_dir = os.path.join(train_out_dir, "images")
-    train_label_dir = os.path.join(train_out_dir, "labels")
-    valid_image_dir = os.path.join(valid_out_dir, "images")
-    valid_label_dir = os.path.join(valid_out_dir, "labels")
-    test_image_dir = os.path.join(test_out_dir, "images")
-    test_label_dir = os.path.join(test_out_dir, "labels")
-
-    # Prompt to overwrite if output dir exists, otherwise attempt to create it
-    if os.path.exists(train_out_dir) or os.path.exists(valid_out_dir) or os.path.exists(test_out_dir):
-        print("WARNING: Output Directory Exists, data will be overwritten ", end="")
-
-        if input("Y/N?:").lower() != "y":
-            print("EXITING...\n")
-            exit()
-        else:
-            print("CONTINUING...\n")
-            # Delete existing output dir
-            try:
-                shutil.rmtree(train_out_dir)
-                shutil.rmtree(valid_out_dir)
-                shutil.rmtree(test_out_dir)
-            except OSError as error:
-                print(error)
-                sys.exit()
-
-    print("#################### Creating output directories ####################")
-    print("TRAIN: {}\nVALID: {}".format(train_out_dir, valid_out_dir))
-
-    try:
-        os.mkdir(train_out_dir)
-        os.mkdir(valid_out_dir)
-        os.mkdir(train_image_dir)
-        os.mkdir(train_label_dir)
-        os.mkdir(valid_image_dir)
-        os.mkdir(valid_label_dir)
-    except OSError as error:
-        print(error)
-        sys.exit()
-
-    if args.test is not None:
-        print("TEST: {}\n".format(test_out_dir))
-        try:
-            os.mkdir(test_out_dir)
-            os.mkdir(test_image_dir)
-            os.mkdir(test_label_dir)
-        except OSError as error:
-            print(error)
-            sys.exit()
-    else:
-        print("")
-
-    # Get image paths
-    images = os.listdir(image_source_dir)
-    images.sort()
-
-    # Get label paths
-    labels = os.listdir(label_source_dir)
-    labels.sort()
+    # Refresh the dataset manifest (only new or changed files are read) and index both folders by file stem
+    manifest = DatasetManifest(args.src_dir)
+    manifest.refresh()
+    index = manifest.pair_index()
+    created = index.create_empty_labels()
+    manifest.update_files("labels", [index.label(stem) for stem in created])
+    index.report(orphans=True)
+
+    # Prompt to overwrite and create output directories (list files need none, --assign hash updates them in place)
+    if args.mode != "listfile" and args.assign != "hash" and args.folds is None:
+        make_split_dirs(args.src_dir, args.test is not None, args.yes)
+
+    # Get matched image/label names, sorted by stem so images[i] and labels[i] are a pair
+    pairs = index.pairs()
+    images = [os.path.basename(img) for stem, img, label in pairs]
+    labels = [os.path.basename(label) for stem, img, label in pairs]
     
     # If dumping empty images
     if args.n_dump is not None:
@@ -158,7 +79,7 @@ def main():
         # Parse labels looking for empty sets to dump
         empty = []
         for i, label in enumerate(labels):
-            if os.stat(os.path.join(label_source_dir, label)).st_size == 0:
+            if manifest.is_empty(label):
                 empty.append(i)
         
         # Check numbers
@@ -174,6 +95,23 @@ def main():
             del images[i]
             del labels[i]
 
+    # K-fold cross validation list files instead of one split, the test set is held out first
+    if args.folds is not None:
+        test_images = None
+        if args.test is not None:
+            images, test_images = train_test_split(images, test_size = args.test, random_state = 1)
+        folds = [[images[i] for i in valid_index] for train_index, valid_index in
+                 KFold(n_splits = args.folds, shuffle = True, random_state = 1).split(images)]
+        write_fold_files(args.src_dir, image_source_dir, label_source_dir, folds, test_images)
+        return
+
+    # With --assign hash, keep the splits of earlier runs and only place new images
+    if args.assign == "hash":
+        # new images are placed by a hash of their name
+        ratios = [1 - args.valid - (args.test or 0), args.valid] + ([args.test] if args.test is not None else [])
+        sync_splits(manifest, args.src_dir, image_source_dir, label_source_dir, images, labels, ratios, args.mode, args.workers, yes=args.yes)
+        return
+
     # Get train test splits
     if args.test is None:
         train_images, valid_images, train_labels, valid_labels = train_test_split(images, labels, test_size = args.valid, random_state = 1)
@@ -183,72 +121,13 @@ def main():
         train_images, temp_images, train_labels, temp_labels = train_test_split(images, labels, test_size = total_per, random_state = 1)
         valid_images, test_images, valid_labels, test_labels = train_test_split(temp_images, temp_labels, test_size = test_per, random_state = 1)
     
-    # Copy splits to output folders
-    
-    # Train images
-    for img_name in train_images:
-        # Make paths
-        temp_src_dir = os.path.join(image_source_dir, img_name)
-        temp_dst_dir = os.path.join(train_image_dir, img_name)
-
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
-        
-    # Train labels
-    for label_name in train_labels:
-        # Make paths
-        temp_src_dir = os.path.join(label_source_dir, label_name)
-        temp_dst_dir = os.path.join(train_label_dir, label_name)
-
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
-    
-    # Valid images
-    for img_name in valid_images:
-        # Make paths
-        temp_src_dir = os.path.join(image_source_dir, img_name)
-        temp_dst_dir = os.path.join(valid_image_dir, img_name)
-
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
-        
-    # Valid labels
-    for label_name in valid_labels:
-        # Make paths
-        temp_src_dir = os.path.join(label_source_dir, label_name)
-        temp_dst_dir = os.path.join(valid_label_dir, label_name)
-
-        # Copy
-        copy_file(temp_src_dir, temp_dst_dir)
-    
-    # Test set
+    # Copy/link splits to output folders or write list files
+    splits = {"train": (train_images, train_labels), "valid": (valid_images, valid_labels)}
     if args.test is not None:
-        # Test images
-        for img_name in test_images:
-            # Make paths
-            temp_src_dir = os.path.join(image_source_dir, img_name)
-            temp_dst_dir = os.path.join(test_image_dir, img_name)
-
-            # Copy
-            copy_file(temp_src_dir, temp_dst_dir)
-            
-        # Test labels
-        for label_name in test_labels:
-            # Make paths
-            temp_src_dir = os.path.join(label_source_dir, label_name)
-            temp_dst_dir = os.path.join(test_label_dir, label_name)
-
-            # Copy
-            copy_file(temp_src_dir, temp_dst_dir)
-    
-# Helper function to copy files
-def copy_file(src_dir, dst_dir):
-    try:
-        shutil.copy(src_dir, dst_dir)
-    except OSError as error:
-        print(error)
-        print("\nFailed to copy {} to {}".format(src_dir, dst_dir))
-        sys.exit()
+        splits["test"] = (test_images, test_labels)
+    write_splits(args.src_dir, image_source_dir, label_source_dir, splits, args.mode, args.workers)
+    # the splits were rebuilt, a later --assign hash run must not keep the placements it recorded
+    manifest.clear_splits()
 
 if __name__=="__main__":
     main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+Benchmark trained weights on each inference backend (pytorch, onnx, openvino) on a test set
+Each backend runs model.val on test.yaml with batch 1 and reports latency per image, throughput and mAP,
+with the mAP drift from the first backend listed. Results are saved to <name>_backends.csv
+"""
+
+import os
+import sys
+import csv
+import argparse
+from ultralytics import YOLO
+from export import export_weights
+
+BACKENDS = ["pytorch", "onnx", "openvino"]
+
+def arg_parse():
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(description='Benchmark YOLO weights on inference backends')
+
+    parser.add_argument("--src", dest = "src",
+            help = "Test yaml describing test set", default = None, type = str)
+    parser.add_argument("--weights", dest = "weights",
+            help = "Model weights (.pt) to benchmark, exported for each backend if needed", default = None, type = str)
+    parser.add_argument("--backends", dest = "backends",
+            help = "Backends to compare, separated by commas. The first is the mAP reference. Default pytorch,onnx,openvino", default = "pytorch,onnx,openvino", type = str)
+    parser.add_argument("--device", dest = "device",
+            help = "Device to run on, ex. cpu or 0. Default cpu", default = "cpu", type = str)
+    parser.add_argument("--imgsz", dest = "imgsz",
+            help = "Image size. Default 640", default = 640, type = int)
+    parser.add_argument("--name", dest = "name",
+            help = "Name for outputs. Default benchmark", default = "benchmark", type = str)
+
+    return parser.parse_args()
+
+def validate(path, src, imgsz, device, name):
+    # [preprocess, inference, postprocess, latency (ms per image), images/s, mAP50, mAP50-95] of model.val with batch 1
+    model = YOLO(path)
+    metrics = model.val(data = src,
+            imgsz = imgsz,
+            batch = 1,
+            device = device,
+            project = 'OK_CV',
+            name = name,
+            plots = False
+    )
+    latency = sum(metrics.speed.values())
+    return [metrics.speed["preprocess"], metrics.speed["inference"], metrics.speed["postprocess"],
+            latency, 1000/max(latency, 1e-9), metrics.box.map50, metrics.box.map]
+
+def write_summary(rows, summary_path):
+    # print and save [model, validate() values] rows, with the mAP drift of each row from the first row
+    header = ["model", "preprocess ms", "inference ms", "postprocess ms", "latency ms", "images/s",
+              "mAP50", "mAP50-95", "mAP50 drift", "mAP50-95 drift", "speed up"]
+    print("\n" + ", ".join(header))
+    with open(summary_path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        for row in rows:
+            row = row + [row[6] - rows[0][6], row[7] - rows[0][7], rows[0][4]/max(row[4], 1e-9)]
+            text = [row[0]] + ["%.2f"%v for v in row[1:6]] + ["%.4f"%v for v in row[6:10]] + ["%.2f"%row[10]]
+            writer.writerow(text)
+            print(", ".join(text))
+    print("Summary saved to %s"%summary_path)
+
+def main():
+    # Get args
+    args = arg_parse()
+
+    # Check yaml and weights
+    if args.src is None:
+        print("ERROR: Test yaml must be provided with --src! Exiting...\n")
+        sys.exit()
+
+    if args.weights is None or not args.weights.endswith(".pt"):
+        print("ERROR: Model weights (.pt) must be provided with --weights! Exiting...\n")
+        sys.exit()
+
+    backends = args.backends.split(',')
+    for backend in backends:
+        if backend not in BACKENDS:
+            sys.exit("ERROR: unknown backend %s, choose from %s"%(backend, ", ".join(BACKENDS)))
+
+    rows = []
+    for backend in backends:
+        path = export_weights(args.weights, backend, args.imgsz)
+        rows.append([backend] + validate(path, args.src, args.imgsz, args.device, "%s_%s"%(args.name, backend)))
+
+    write_summary(rows, "%s_backends.csv"%args.name)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+Export trained weights (ex. OK_CV/<name>/weights/best.pt) for the CPU inference backends
+onnx runs with ONNX Runtime, openvino with Intel OpenVINO. Exports are written next to the weights, where the
+example scripts look for them with --backend (best.onnx, best_openvino_model/)
+"""
+
+import os
+import sys
+import argparse
+from ultralytics import YOLO
+
+# export names and checks are shared with the example scripts that load the exports
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples"))
+from backends import EXPORTS, exported_path, needs_export
+
+BACKENDS = list(EXPORTS)
+
+def arg_parse():
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(description='Export YOLO weights for CPU inference backends')
+
+    parser.add_argument("--weights", dest = "weights",
+            help = "Model weights to export", default = None, type = str)
+    parser.add_argument("--backends", dest = "backends",
+            help = "Backends to export for, separated by commas. Default onnx,openvino", default = "onnx,openvino", type = str)
+    parser.add_argument("--imgsz", dest = "imgsz",
+            help = "Input image size of the export. Default 640", default = 640, type = int)
+    parser.add_argument("--dynamic", dest = "dynamic",
+            help = "Export with dynamic batch and image size (onnx)", action = "store_true")
+    parser.add_argument("--force", dest = "force",
+            help = "Export again even if an export exists", action = "store_true")
+
+    return parser.parse_args()
+
+def export_weights(weights, backend, imgsz=640, dynamic=False, force=False):
+    # export weights for a backend unless already exported at imgsz, returns the path of the export
+    path = exported_path(weights, backend)
+    if backend == "pytorch" or not (force or needs_export(path, imgsz)):
+        return path
+    return YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=dynamic)
+
+def main():
+    # Get args
+    args = arg_parse()
+
+    # Check weights
+    if args.weights is None or not os.path.isfile(args.weights):
+        print("ERROR: Model weights must be provided with --weights! Exiting...\n")
+        sys.exit()
+
+    for backend in args.backends.split(','):
+        if backend not in BACKENDS:
+            sys.exit("ERROR: unknown backend %s, choose from %s"%(backend, ", ".join(BACKENDS)))
+        path = export_weights(args.weights, backend, args.imgsz, args.dynamic, args.force)
+        print("%s: %s"%(backend, path))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+INT8 post-training quantisation of trained weights for CPU inference
+Calibration images are sampled from a split of the dataset's data.yaml (train by default, so the test set is not seen).
+openvino is quantised by Ultralytics (NNCF), onnx with ONNX Runtime static quantisation. The FP32 export and the INT8
+model are then both validated on test.yaml, as test.py, and their accuracy and speed saved side by side to <name>_int8.csv
+"""
+
+import os
+import sys
+import glob
+import random
+import argparse
+import tempfile
+import cv2
+import numpy as np
+import yaml
+from export import export_weights
+from benchmark_backends import validate, write_summary
+
+BACKENDS = ["onnx", "openvino"]
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+def arg_parse():
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(description='INT8 quantisation of YOLO weights')
+
+    parser.add_argument("--weights", dest = "weights",
+            help = "Model weights (.pt) to quantise", default = None, type = str)
+    parser.add_argument("--data", dest = "data",
+            help = "Dataset data.yaml to take calibration images from", default = None, type = str)
+    parser.add_argument("--test", dest = "test",
+            help = "Test yaml to validate the FP32 and INT8 models on. Default no validation", default = None, type = str)
+    parser.add_argument("--backend", dest = "backend",
+            help = "Backend to quantise for: onnx or openvino. Default openvino", default = "openvino", choices = BACKENDS, type = str)
+    parser.add_argument("--split", dest = "split",
+            help = "Split of data.yaml to calibrate on. Default train", default = "train", type = str)
+    parser.add_argument("--calib", dest = "calib",
+            help = "Number of calibration images. Default 300", default = 300, type = int)
+    parser.add_argument("--imgsz", dest = "imgsz",
+            help = "Image size. Default 640", default = 640, type = int)
+    parser.add_argument("--device", dest = "device",
+            help = "Device to validate on. Default cpu", default = "cpu", type = str)
+    parser.add_argument("--name", dest = "name",
+            help = "Name for outputs. Default quantise", default = "quantise", type = str)
+
+    return parser.parse_args()
+
+def yaml_images(yaml_path, split):
+    # image paths of a split of a data.yaml: folders (searched recursively), list files or lists of either
+    with open(yaml_path, 'r') as stream:
+        data = yaml.safe_load(stream)
+    if split not in data:
+        sys.exit("ERROR: %s has no %s entry"%(yaml_path, split))
+    root = data.get("path") or os.path.dirname(os.path.abspath(yaml_path))
+    if not os.path.isabs(root):
+        root = os.path.join(os.path.dirname(os.path.abspath(yaml_path)), root)
+    entries = data[split] if isinstance(data[split], list) else [data[split]]
+
+    images = []
+    for entry in entries:
+        path = entry if os.path.isabs(entry) else os.path.join(root, entry)
+        if os.path.isdir(path):
+            images += sorted(f for f in glob.glob(os.path.join(path, "**", "*"), recursive=True) if f.lower().endswith(IMAGE_EXTS))
+        elif os.path.isfile(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        images.append(line if os.path.isabs(line) else os.path.join(os.path.dirname(path), line))
+        else:
+            print("WARNING: %s in %s not found"%(path, yaml_path))
+    return images
+
+def letterbox(image, imgsz):
+    # resize keeping the aspect ratio and pad to imgsz x imgsz with grey, as Ultralytics does before inference
+    h, w = image.shape[0:2]
+    scale = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    image = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top = (imgsz - nh) // 2
+    left = (imgsz - nw) // 2
+    return cv2.copyMakeBorder(image, top, imgsz - nh - top, left, imgsz - nw - left, cv2.BORDER_CONSTANT, value=(114,114,114))
+
+def model_input(path, imgsz):
+    # (1,3,imgsz,imgsz) float32 RGB input of an image, None if it can not be read
+    image = cv2.imread(path)
+    if image is None:
+        print("WARNING: could not read %s, skipping"%path)
+        return None
+    image = letterbox(image, imgsz)
+    return np.ascontiguousarray(image[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+def quantise_onnx(weights, images, imgsz):
+    # static INT8 quantisation of the FP32 ONNX export, returns the path of <weights>_int8.onnx
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    fp32 = export_weights(weights, "onnx", imgsz)
+    int8 = os.path.splitext(weights)[0] + "_int8.onnx"
+    input_name = onnx.load(fp32, load_external_data=False).graph.input[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(images)
+
+        def get_next(self):
+            # next readable image, None when they are all used
+            for path in self.paths:
+                x = model_input(path, imgsz)
+                if x is not None:
+                    return {input_name: x}
+            return None
+
+    quantize_static(fp32, int8, Reader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+    # keep the class names, stride and image size Ultralytics reads from the export
+    source = onnx.load(fp32)
+    model = onnx.load(int8)
+    del model.metadata_props[:]
+    model.metadata_props.extend(source.metadata_props)
+    onnx.save(model, int8)
+    return fp32, int8
+
+def quantise_openvino(weights, images, imgsz):
+    # INT8 OpenVINO export by Ultralytics, calibrated on the sampled images through a temporary data yaml
+    from ultralytics import YOLO
+
+    fp32 = export_weights(weights, "openvino", imgsz)
+    with tempfile.TemporaryDirectory() as tmp:
+        list_path = os.path.join(tmp, "calibration.txt")
+        with open(list_path, 'w') as f:
+            f.write("".join("%s\n"%os.path.abspath(image) for image in images))
+        model = YOLO(weights)
+        calib_yaml = os.path.join(tmp, "calibration.yaml")
+        with open(calib_yaml, 'w') as outfile:
+            yaml.dump({"path": tmp, "train": list_path, "val": list_path, "names": model.names}, outfile, sort_keys=False)
+        int8 = model.export(format="openvino", int8=True, data=calib_yaml, imgsz=imgsz)
+    return fp32, int8
+
+def main():
+    # Get args
+    args = arg_parse()
+
+    # Check weights and yaml
+    if args.weights is None or not args.weights.endswith(".pt"):
+        print("ERROR: Model weights (.pt) must be provided with --weights! Exiting...\n")
+        sys.exit()
+
+    if args.data is None:
+        print("ERROR: Dataset yaml must be provided with --data! Exiting...\n")
+        sys.exit()
+
+    # Sample calibration images from the dataset
+    images = yaml_images(args.data, args.split)
+    if len(images) == 0:
+        sys.exit("ERROR: no images found for %s in %s"%(args.split, args.data))
+    random.seed(1)
+    images = sorted(random.sample(images, min(args.calib, len(images))))
+    print("Calibrating on %i %s images from %s"%(len(images), args.split, args.data))
+
+    if args.backend == "onnx":
+        fp32, int8 = quantise_onnx(args.weights, images, args.imgsz)
+    else:
+        fp32, int8 = quantise_openvino(args.weights, images, args.imgsz)
+    print("INT8 model saved to %s"%int8)
+
+    # Accuracy loss and speed up of the INT8 model against the FP32 export
+    if args.test is not None:
+        rows = [["%s fp32"%args.backend] + validate(fp32, args.test, args.imgsz, args.device, "%s_fp32"%args.name),
+                ["%s int8"%args.backend] + validate(int8, args.test, args.imgsz, args.device, "%s_int8"%args.name)]
+        write_summary(rows, "%s_int8.csv"%args.name)
+
+if __name__ == '__main__':
+    main()
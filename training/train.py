@@ -25,6 +25,14 @@ def arg_parse():
             help = "List of classes to train as numbers listed in data.yaml. Separate with commas ex 0,1,2", default = None, type = str)
     parser.add_argument("--pretrain", dest = "pretrain",
             help = "Pretrained model to load. Can load a different model structure or a previously trained model. Default is yolo11m.", default = "yolo11m.pt", type = str)
+    parser.add_argument("--workers", dest = "workers",
+            help = "Number of dataloader worker processes. Default 12", default = 12, type = int)
+    parser.add_argument("--device", dest = "device",
+            help = "Device to train on, ex. 0, 0,1 or cpu. Default 0", default = "0", type = str)
+    parser.add_argument("--batch", dest = "batch",
+            help = "Batch size, -1 picks the largest that fits in GPU memory. Default -1", default = -1, type = int)
+    parser.add_argument("--run_file", dest = "run_file",
+            help = "Write the folder the run was saved to into this file, ex. for scripts running train.py", default = None, type = str)
 
     return parser.parse_args()
 
@@ -53,11 +61,11 @@ def main():
             epochs = 500,
             classes = arg_cls,
             patience = 50,
-            batch = -1,
+            batch = args.batch,
             imgsz = 640,
             save = True,
-            device = 0,
-            workers = 12,
+            device = args.device,
+            workers = args.workers,
             project = 'OK_CV',
             name = args.name,
             val = True,
@@ -93,5 +101,10 @@ def main():
             crop_fraction = 1.0			# (float) image crop fraction for classification evaluation/inference (0-1)
     )
 
+    # Ultralytics adds a number to the name if it was used before, so the actual folder is written out
+    if args.run_file is not None:
+        with open(args.run_file, 'w') as f:
+            f.write(str(model.trainer.save_dir) + "\n")
+
 if __name__ == '__main__':
     main()
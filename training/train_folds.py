@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+"""
+Author: Serena Mou
+Created: 18 October 2026
+
+Train and evaluate every cross validation fold written by the split scripts with --folds K (data_fold<k>.yaml)
+Folds run one after another, or --concurrent at a time with the --workers dataloader processes shared between them
+Each fold is a train.py run named <name>_fold<k>, the best epoch of every fold is summarised in <name>_folds.csv
+"""
+
+import os
+import sys
+import csv
+import glob
+import queue
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+TRAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train.py")
+TEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.py")
+METRICS = ["metrics/precision(B)", "metrics/recall(B)", "metrics/mAP50(B)", "metrics/mAP50-95(B)"]
+
+def arg_parse():
+    """
+    Parse command line arguments
+    """
+    parser = argparse.ArgumentParser(description='Train YOLO models on cross validation folds')
+
+    parser.add_argument("--src", dest = "src",
+            help = "Dataset folder with data_fold<k>.yaml files", default = None, type = str)
+    parser.add_argument("--name", dest = "name",
+            help = "Name for training outputs, each fold is saved as <name>_fold<k>", default = None, type = str)
+    parser.add_argument("--folds", dest = "folds",
+            help = "Folds to run, separated by commas ex 0,2. Default all", default = None, type = str)
+    parser.add_argument("--concurrent", dest = "concurrent",
+            help = "Number of folds training at the same time. Default 1", default = 1, type = int)
+    parser.add_argument("--workers", dest = "workers",
+            help = "Total dataloader worker processes, shared between concurrent folds. Default 12", default = 12, type = int)
+    parser.add_argument("--device", dest = "device",
+            help = "Devices separated by commas, concurrent folds take one each ex 0,1. Default 0", default = "0", type = str)
+    parser.add_argument("--batch", dest = "batch",
+            help = "Batch size of each fold, -1 picks the largest that fits in GPU memory. Default -1, or 16 when concurrent folds share a device", default = None, type = int)
+    parser.add_argument("--classes", dest = "classes",
+            help = "List of classes to train as numbers listed in data.yaml. Separate with commas ex 0,1,2", default = None, type = str)
+    parser.add_argument("--pretrain", dest = "pretrain",
+            help = "Pretrained model to load. Default is yolo11m.", default = "yolo11m.pt", type = str)
+    parser.add_argument("--test", dest = "test",
+            help = "Also evaluate the best weights of each fold on test.yaml with test.py", action = "store_true")
+
+    return parser.parse_args()
+
+def fold_yamls(src, folds):
+    # {fold: data_fold<k>.yaml path}
+    found = {}
+    for path in glob.glob(os.path.join(src, "data_fold*.yaml")):
+        k = os.path.basename(path)[len("data_fold"):-len(".yaml")]
+        if k.isdigit():
+            found[int(k)] = path
+    if folds is not None:
+        missing = [k for k in folds if k not in found]
+        if len(missing) > 0:
+            sys.exit("ERROR: data_fold%i.yaml not found in %s"%(missing[0], src))
+        found = {k: found[k] for k in folds}
+    return dict(sorted(found.items()))
+
+def run_dir(cmd):
+    # run train.py, returns (exit code, folder the run was saved to as train.py reports it, or None)
+    fd, run_file = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        result = subprocess.run(cmd + ["--run_file", run_file])
+        with open(run_file, 'r') as f:
+            out_dir = f.read().strip()
+        return result.returncode, out_dir or None
+    finally:
+        os.remove(run_file)
+
+def best_epoch(results_csv):
+    # metrics of the epoch best.pt was saved from (highest 0.1 mAP50 + 0.9 mAP50-95, as Ultralytics)
+    with open(results_csv, 'r') as f:
+        rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+    if len(rows) == 0 or METRICS[3] not in rows[0]:
+        return None
+    best = max(rows, key=lambda row: 0.1*float(row[METRICS[2]]) + 0.9*float(row[METRICS[3]]))
+    return [float(best[m]) for m in METRICS]
+
+def main():
+    # Get args
+    args = arg_parse()
+
+    # Check src and name
+    if args.src is None:
+        print("ERROR: Dataset folder must be provided with --src! Exiting...\n")
+        sys.exit()
+
+    if args.name is None:
+        print("ERROR: Output name must be provided with --name! Exiting...\n")
+        sys.exit()
+
+    folds = fold_yamls(args.src, [int(k) for k in args.folds.split(',')] if args.folds is not None else None)
+    if len(folds) == 0:
+        sys.exit("ERROR: no data_fold<k>.yaml in %s, write them with the split scripts and --folds K"%args.src)
+
+    # Share the worker cap between the folds running at once, each takes a device while it runs
+    concurrent = max(1, min(args.concurrent, len(folds)))
+    workers = max(1, args.workers // concurrent)
+    devices = args.device.split(',')
+    # the automatic batch size measures free GPU memory, which folds sharing a device would both claim
+    batch = args.batch
+    if batch is None:
+        batch = 16 if concurrent > len(devices) else -1
+    elif batch == -1 and concurrent > len(devices):
+        sys.exit("ERROR: --batch -1 can not be used with more --concurrent folds than devices, give a fixed batch size")
+    free = queue.Queue()
+    for i in range(concurrent):
+        free.put(devices[i % len(devices)])
+
+    def train_fold(item):
+        k, data = item
+        device = free.get()
+        try:
+            cmd = [sys.executable, TRAIN, "--src", data, "--name", "%s_fold%i"%(args.name, k),
+                   "--pretrain", args.pretrain, "--workers", str(workers), "--device", device, "--batch", str(batch)]
+            if args.classes is not None:
+                cmd += ["--classes", args.classes]
+            print("FOLD %i: training on device %s with %i workers, batch %i"%(k, device, workers, batch))
+            returncode, out_dir = run_dir(cmd)
+            if returncode != 0:
+                return k, None, "train.py failed with exit code %i"%returncode
+            if out_dir is None or not os.path.isfile(os.path.join(out_dir, "results.csv")):
+                return k, None, "no results.csv for fold %i"%k
+            if args.test:
+                subprocess.run([sys.executable, TEST, "--src", os.path.join(args.src, "test.yaml"),
+                                "--weights", os.path.join(out_dir, "weights", "best.pt"), "--name", "%s_fold%i_test"%(args.name, k)])
+            return k, best_epoch(os.path.join(out_dir, "results.csv")), out_dir
+        finally:
+            free.put(device)
+
+    with ThreadPoolExecutor(max_workers=concurrent) as pool:
+        results = list(pool.map(train_fold, folds.items()))
+
+    # Summary of the best epoch of every fold, with the mean and standard deviation over folds
+    summary_path = "%s_folds.csv"%args.name
+    scores = []
+    with open(summary_path, 'w') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["fold"] + METRICS + ["run"])
+        for k, metrics, info in results:
+            if metrics is None:
+                print("WARNING: fold %i: %s"%(k, info))
+                continue
+            scores.append(metrics)
+            writer.writerow([k] + ["%.4f"%m for m in metrics] + [info])
+        if len(scores) > 0:
+            n = len(scores)
+            mean = [sum(col)/n for col in zip(*scores)]
+            std = [(sum((v - m)**2 for v in col)/n)**0.5 for col, m in zip(zip(*scores), mean)]
+            writer.writerow(["mean"] + ["%.4f"%m for m in mean] + [""])
+            writer.writerow(["std"] + ["%.4f"%s for s in std] + [""])
+            print("\n" + ", ".join("%s %.4f +- %.4f"%(name, m, s) for name, m, s in zip(METRICS, mean, std)))
+    print("Fold summary saved to %s"%summary_path)
+
+if __name__ == '__main__':
+    main()